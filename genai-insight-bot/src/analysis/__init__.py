@@ -1,7 +1,17 @@
 from .comparator import PeopleComparator, comparator
 from .recommender import ExpertRecommender, recommender
+from .semantic_search import SemanticSearch, semantic_search
+from .scoring import ExpertScorer, expert_scorer
+from .graph import ExpertGraph, GraphAnalytics, graph_analytics
+from .enrichment import PublicationEnricher, publication_enricher
+from .trends import TrendEngine, trend_engine
 
 __all__ = [
     'PeopleComparator', 'comparator',
-    'ExpertRecommender', 'recommender'
+    'ExpertRecommender', 'recommender',
+    'SemanticSearch', 'semantic_search',
+    'ExpertScorer', 'expert_scorer',
+    'ExpertGraph', 'GraphAnalytics', 'graph_analytics',
+    'PublicationEnricher', 'publication_enricher',
+    'TrendEngine', 'trend_engine'
 ]
\ No newline at end of file
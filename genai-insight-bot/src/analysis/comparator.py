@@ -1,16 +1,169 @@
 from database.operations import db
+from typing import Dict, List, Tuple
 import logging
+import math
+import zlib
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
+def _terms(values) -> List[str]:
+    """Навыки или проекты как строки: в импортированном JSON/Parquet встречаются числа и null"""
+    return [str(value).strip() for value in values or [] if value is not None and str(value).strip()]
+
+class SkillIndex:
+    """Кэшируемая нормализованная разреженная матрица эксперт × (навыки, проекты)"""
+    
+    # С этого размера базы кандидаты отбираются через MinHash-LSH, а не по инвертированному индексу
+    LSH_MIN_ROWS = 5000
+    NUM_PERM = 64
+    BANDS = 32
+    _PRIME = (1 << 61) - 1
+    
+    def __init__(self, people: list, version: str):
+        self.version = version
+        self.people = []
+        self.features: List[frozenset] = []
+        seen_names = set()
+        
+        for person in people:
+            normalized_name = person.name.lower().strip()
+            if normalized_name in seen_names:
+                continue
+            seen_names.add(normalized_name)
+            feature_set = frozenset(
+                [f"s:{skill.lower()}" for skill in _terms(person.skills)] +
+                [f"p:{project.lower()}" for project in _terms(person.projects)]
+            )
+            self.people.append(person)
+            self.features.append(feature_set)
+        
+        self.row_by_id = {person.id: row for row, person in enumerate(self.people)}
+        self._build_vectors()
+        self.buckets = self._build_lsh() if len(self.people) >= self.LSH_MIN_ROWS else None
+    
+    def _build_vectors(self):
+        """TF-IDF веса признаков, L2-нормализация строк и инвертированные списки (CSC-представление)"""
+        n_rows = len(self.people)
+        document_frequency: Dict[str, int] = {}
+        for feature_set in self.features:
+            for feature in feature_set:
+                document_frequency[feature] = document_frequency.get(feature, 0) + 1
+        
+        self.rows: List[Dict[str, float]] = []
+        self.postings: Dict[str, List[Tuple[int, float]]] = {}
+        for row, feature_set in enumerate(self.features):
+            weights = {feature: math.log((1 + n_rows) / (1 + document_frequency[feature])) + 1 for feature in feature_set}
+            norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+            weights = {feature: w / norm for feature, w in weights.items()}
+            self.rows.append(weights)
+            for feature, weight in weights.items():
+                self.postings.setdefault(feature, []).append((row, weight))
+    
+    def _signature(self, feature_set: frozenset) -> np.ndarray:
+        hashes = np.array([zlib.crc32(f.encode('utf-8')) for f in feature_set], dtype=np.uint64)
+        permuted = (self._coef_a[:, None] * hashes[None, :] + self._coef_b[:, None]) % self._PRIME
+        return permuted.min(axis=1)
+    
+    def _build_lsh(self) -> List[Dict[tuple, List[int]]]:
+        """MinHash-сигнатуры, разбитые на полосы: совпадение полосы делает строку кандидатом"""
+        rng = np.random.default_rng(42)
+        self._coef_a = rng.integers(1, 1 << 31, self.NUM_PERM, dtype=np.uint64)
+        self._coef_b = rng.integers(0, 1 << 31, self.NUM_PERM, dtype=np.uint64)
+        rows_per_band = self.NUM_PERM // self.BANDS
+        
+        self.signatures = {}
+        buckets = [{} for _ in range(self.BANDS)]
+        for row, feature_set in enumerate(self.features):
+            if not feature_set:
+                continue
+            signature = self._signature(feature_set)
+            self.signatures[row] = signature
+            for band in range(self.BANDS):
+                key = tuple(signature[band * rows_per_band:(band + 1) * rows_per_band].tolist())
+                buckets[band].setdefault(key, []).append(row)
+        return buckets
+    
+    def _candidates(self, row: int) -> set:
+        if self.buckets is None:
+            # Инвертированный индекс: перебираем только экспертов с общими признаками
+            return {other for feature in self.rows[row] for other, _ in self.postings[feature]}
+        
+        signature = self.signatures.get(row)
+        if signature is None:
+            return set()
+        rows_per_band = self.NUM_PERM // self.BANDS
+        candidates = set()
+        for band in range(self.BANDS):
+            key = tuple(signature[band * rows_per_band:(band + 1) * rows_per_band].tolist())
+            candidates.update(self.buckets[band].get(key, []))
+        return candidates
+    
+    def similar(self, row: int, k: int, metric: str = 'cosine') -> List[Tuple[int, float]]:
+        query = self.rows[row]
+        scores = []
+        for other in self._candidates(row):
+            if other == row:
+                continue
+            if metric == 'jaccard':
+                union = len(self.features[row] | self.features[other])
+                score = len(self.features[row] & self.features[other]) / union if union else 0.0
+            else:
+                other_weights = self.rows[other]
+                score = sum(weight * other_weights.get(feature, 0.0) for feature, weight in query.items())
+            if score > 0:
+                scores.append((other, score))
+        
+        scores.sort(key=lambda x: x[1], reverse=True)
+        return scores[:k]
+
 class PeopleComparator:
     def __init__(self):
         self.db = db
+        self._skill_indexes: Dict[str, SkillIndex] = {}
+    
+    def _get_skill_index(self, telegram_id: str) -> SkillIndex:
+        """Возвращает индекс навыков пользователя, перестраивая его при изменении данных"""
+        version = self.db.get_dataset_version(telegram_id)
+        index = self._skill_indexes.get(telegram_id)
+        if index is None or index.version != version:
+            index = SkillIndex(self.db.get_all_people(telegram_id), version)
+            self._skill_indexes[telegram_id] = index
+        return index
+    
+    async def find_similar(self, telegram_id: str, name: str, k: int = 5, metric: str = 'cosine'):
+        """Находит k экспертов, наиболее похожих на заданного по навыкам и проектам"""
+        person = self.db.get_person_by_name(telegram_id, name)
+        if not person:
+            return {'error': f'Эксперт "{name}" не найден'}
+        
+        index = self._get_skill_index(telegram_id)
+        row = index.row_by_id.get(person.id)
+        if row is None:
+            # Найденная запись - дубликат по имени, берем каноническую
+            normalized_name = person.name.lower().strip()
+            row = next((i for i, p in enumerate(index.people) if p.name.lower().strip() == normalized_name), None)
+            if row is None:
+                return {'error': f'Эксперт "{name}" не найден в индексе навыков'}
+        
+        person = index.people[row]
+        similar = []
+        for other, score in index.similar(row, k, metric):
+            shared = index.features[row] & index.features[other]
+            similar.append({
+                'person': index.people[other],
+                'score': score,
+                'shared_skills': [s for s in _terms(person.skills) if f"s:{s.lower()}" in shared],
+                'shared_projects': [p for p in _terms(person.projects) if f"p:{p.lower()}" in shared]
+            })
+        
+        return {'person': person, 'similar': similar, 'metric': metric}
     
-    async def compare_people(self, person_x_name: str, person_y_name: str):
+    async def compare_people(self, telegram_id: str, person_x_name: str, person_y_name: str):
         """Сравнивает двух людей"""
-        person_x = self.db.get_person_by_name(person_x_name)
-        person_y = self.db.get_person_by_name(person_y_name)
+        found = self.db.get_people_by_names(telegram_id, [person_x_name, person_y_name])
+        person_x = found[person_x_name]
+        person_y = found[person_y_name]
         
         if not person_x:
             return {'error': f'Эксперт "{person_x_name}" не найден'}
@@ -23,9 +176,38 @@ class PeopleComparator:
             'comparison': self._generate_comparison_insights(person_x, person_y)
         }
     
-    async def generate_comparison_report(self, person_x_name: str, person_y_name: str) -> str:
+    async def compare_many(self, telegram_id: str, names: List[str]):
+        """Сравнивает N экспертов: одна выборка из базы и матрица N×N попарных пересечений"""
+        found = self.db.get_people_by_names(telegram_id, names)
+        missing = [name for name in names if not found[name]]
+        if missing:
+            return {'error': f'Эксперты не найдены: {", ".join(missing)}'}
+        
+        people = [found[name] for name in names]
+        skills = [set(_terms(person.skills)) for person in people]
+        projects = [set(_terms(person.projects)) for person in people]
+        
+        matrix = []
+        for i, person_i in enumerate(people):
+            row = []
+            for j, person_j in enumerate(people):
+                row.append({
+                    'shared_skills': sorted(skills[i] & skills[j]),
+                    'shared_projects': sorted(projects[i] & projects[j]),
+                    'same_company': bool(person_i.company) and person_i.company == person_j.company
+                })
+            matrix.append(row)
+        
+        return {
+            'people': people,
+            'matrix': matrix,
+            'skills_counts': [len(s) for s in skills],
+            'project_counts': [len(p) for p in projects]
+        }
+    
+    async def generate_comparison_report(self, telegram_id: str, person_x_name: str, person_y_name: str) -> str:
         """Генерирует отчет сравнения"""
-        result = await self.compare_people(person_x_name, person_y_name)
+        result = await self.compare_people(telegram_id, person_x_name, person_y_name)
         
         if 'error' in result:
             return f"❌ {result['error']}"
@@ -34,10 +216,10 @@ class PeopleComparator:
         person_y = result['person_y']
         
         # Форматируем навыки и проекты
-        x_skills = ', '.join(person_x.skills) if person_x.skills else 'не указаны'
-        y_skills = ', '.join(person_y.skills) if person_y.skills else 'не указаны'
-        x_projects = ', '.join(person_x.projects) if person_x.projects else 'не указаны'
-        y_projects = ', '.join(person_y.projects) if person_y.projects else 'не указаны'
+        x_skills = ', '.join(_terms(person_x.skills)) or 'не указаны'
+        y_skills = ', '.join(_terms(person_y.skills)) or 'не указаны'
+        x_projects = ', '.join(_terms(person_x.projects)) or 'не указаны'
+        y_projects = ', '.join(_terms(person_y.projects)) or 'не указаны'
         
         report = f"""
 🆚 **СРАВНЕНИЕ: {person_x.name} vs {person_y.name}**
@@ -67,8 +249,8 @@ class PeopleComparator:
         insights = []
         
         # Сравнение навыков
-        x_skills = set(person_x.skills) if person_x.skills else set()
-        y_skills = set(person_y.skills) if person_y.skills else set()
+        x_skills = set(_terms(person_x.skills))
+        y_skills = set(_terms(person_y.skills))
         
         common_skills = x_skills.intersection(y_skills)
         unique_x_skills = x_skills - y_skills
@@ -91,8 +273,8 @@ class PeopleComparator:
                 insights.append("🏢 Работают в разных компаниях")
         
         # Сравнение опыта (на основе количества проектов)
-        x_projects_count = len(person_x.projects) if person_x.projects else 0
-        y_projects_count = len(person_y.projects) if person_y.projects else 0
+        x_projects_count = len(_terms(person_x.projects))
+        y_projects_count = len(_terms(person_y.projects))
         
         if x_projects_count > y_projects_count:
             insights.append(f"📊 **{person_x.name}** имеет больше проектов ({x_projects_count} vs {y_projects_count})")
@@ -1,23 +1,48 @@
 from typing import Dict, List, Any
 from database.operations import db
+from config.settings import settings
 from .g4f_analyzer import analyzer
+from .task_graph import TaskGraph
 
 class CompetitionAdapter:
     """Adapter to align our solution with competition criteria"""
     
     async def generate_competition_submission(self, team_data: Dict) -> Dict[str, Any]:
-        """Generate competition submission package according to criteria"""
+        """Generate competition submission package according to criteria
         
-        submission = {
-            'concept': await self._generate_concept_description(team_data),
-            'prototype': await self._evaluate_prototype_quality(team_data),
-            'business_model': await self._analyze_business_model(team_data),
-            'technical_implementation': await self._assess_technical_implementation(team_data),
-            'presentation_materials': await self._generate_presentation_materials(team_data)
+        Sections are independent, so they run concurrently in a TaskGraph: the
+        submission takes about as long as its slowest section. A failed or timed
+        out section is reported as {'error': ...} without dropping the others;
+        per-section timings are returned under 'timings'.
+        """
+        sections = {
+            'concept': lambda: self._llm_section(self._generate_concept_description(team_data)),
+            'prototype': lambda: self._evaluate_prototype_quality(team_data),
+            'business_model': lambda: self._llm_section(self._analyze_business_model(team_data)),
+            'technical_implementation': lambda: self._assess_technical_implementation(team_data),
+            'presentation_materials': lambda: self._llm_section(self._generate_presentation_materials(team_data))
         }
+        graph = TaskGraph(concurrency=settings.COMPETITION_CONCURRENCY,
+                          default_timeout=settings.COMPETITION_SECTION_TIMEOUT)
+        for name, section in sections.items():
+            graph.add(name, lambda _, section=section: section())
+        run = await graph.run()
         
+        submission = {
+            name: run['results'][name] if name in run['results'] else {'error': run['errors'][name]}
+            for name in sections
+        }
+        submission['timings'] = {**run['timings'], 'total': run['total']}
         return submission
     
+    @staticmethod
+    async def _llm_section(call) -> Dict:
+        """analyze_text reports failures in the result; the graph needs them raised"""
+        result = await call
+        if isinstance(result, dict) and 'error' in result:
+            raise RuntimeError(result['error'])
+        return result
+    
     async def _generate_concept_description(self, team_data: Dict) -> Dict:
         """Generate concept description according to competition criteria"""
         
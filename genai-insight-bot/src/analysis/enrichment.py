@@ -0,0 +1,148 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from database.operations import db
+from config.settings import settings
+
+from .g4f_analyzer import analyzer
+from .local_extractor import local_extractor
+
+logger = logging.getLogger(__name__)
+
+# Тип анализа G4FAnalyzer -> ключ в Publication.g4f_analysis
+ANALYSES = {
+    'sentiment_analysis': 'sentiment',
+    'skill_extraction': 'skills',
+    'insight_classification': 'insight'
+}
+ENRICH_MAX_ATTEMPTS = 5
+
+class PublicationEnricher:
+    """Фоновый анализ публикаций через G4FAnalyzer.batch_analyze вне пути загрузки файла
+
+    Очередь - сами публикации с пустым analyzed_at, поэтому после перезапуска
+    анализ продолжается без отдельного хранилища задач. Результаты пачки
+    записываются одним пакетным UPDATE.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._attempts: Dict[int, int] = {}
+
+    @property
+    def enabled(self) -> bool:
+        return settings.ENRICH_PUBLICATIONS and analyzer.available
+
+    async def start(self):
+        if not self.enabled:
+            if settings.ENRICH_PUBLICATIONS:
+                logger.warning(f"LLM backends are unavailable ({analyzer.backend_names}), publication enrichment is disabled")
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._worker())
+
+    async def stop(self):
+        """Дожидается текущей пачки; необработанные публикации останутся в очереди"""
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=settings.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    def notify(self):
+        """Сообщает воркеру о новых публикациях (вызывается после сохранения блока импорта)"""
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _worker(self):
+        failures = 0
+        while not self._stopping:
+            try:
+                pending = await asyncio.to_thread(db.get_pending_publications, settings.ENRICH_BATCH_SIZE)
+                if not pending:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                if settings.LOCAL_EXTRACTION:
+                    # Навыки и имена новых экспертов попадают в словарь локального извлечения их владельца
+                    for telegram_id in {owner for _, _, owner in pending}:
+                        await asyncio.to_thread(local_extractor.refresh, telegram_id)
+                analyses = await self.analyze_batch(pending)
+                succeeded = len(analyses)
+                for publication_id, _, _ in pending:
+                    if publication_id in analyses:
+                        self._attempts.pop(publication_id, None)
+                        continue
+                    # После нескольких неудач сохраняем ошибку, чтобы публикация не блокировала очередь
+                    attempts = self._attempts.get(publication_id, 0) + 1
+                    self._attempts[publication_id] = attempts
+                    if attempts >= ENRICH_MAX_ATTEMPTS:
+                        analyses[publication_id] = {'error': 'analysis failed'}
+                        del self._attempts[publication_id]
+
+                await asyncio.to_thread(db.save_publication_analyses, analyses)
+                failures = 0 if succeeded else failures + 1
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Error enriching publications: {e}")
+                failures += 1
+
+            if failures:
+                # LLM недоступна или отвечает ошибками - экспоненциальная пауза перед повтором
+                delay = settings.ENRICH_RETRY_DELAY * 2 ** min(failures - 1, 6)
+                logger.warning(f"Publication enrichment failed, retrying in {delay:.0f}s")
+                await self._sleep(delay)
+
+    async def _sleep(self, delay: float):
+        # Пауза прерывается остановкой бота
+        self._wakeup.clear()
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+        except asyncio.TimeoutError:
+            pass
+
+    async def analyze_batch(self, publications: List[Tuple[int, str, str]]) -> Dict[int, Dict[str, Any]]:
+        """Анализирует пачку публикаций всеми типами анализа параллельно
+
+        Публикации группируются по владельцу: локальное извлечение сверяет текст только со
+        словарем его базы. Возвращает анализ по id публикации. Публикации, для которых не удался
+        ни один анализ, в результат не попадают и остаются в очереди.
+        """
+        analyses = {publication_id: {} for publication_id, content, _ in publications if not (content or '').strip()}
+        by_owner: Dict[str, List[Tuple[int, str]]] = {}
+        for publication_id, content, telegram_id in publications:
+            if publication_id not in analyses:
+                by_owner.setdefault(telegram_id, []).append((publication_id, content))
+        if not by_owner:
+            return analyses
+
+        groups = list(by_owner.items())
+        results = await asyncio.gather(*(
+            asyncio.gather(*(
+                analyzer.batch_analyze([content for _, content in texts], analysis_type, telegram_id=telegram_id)
+                for analysis_type in ANALYSES
+            ))
+            for telegram_id, texts in groups
+        ))
+        for (_, texts), group_results in zip(groups, results):
+            for index, (publication_id, _) in enumerate(texts):
+                analysis = {}
+                for key, type_results in zip(ANALYSES.values(), group_results):
+                    result = type_results[index]
+                    if isinstance(result, dict) and 'error' not in result:
+                        analysis[key] = result
+                if analysis:
+                    analyses[publication_id] = analysis
+        return analyses
+
+publication_enricher = PublicationEnricher()
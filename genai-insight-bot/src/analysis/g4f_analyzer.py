@@ -1,36 +1,212 @@
-import g4f
 import json
 import asyncio
-from typing import Dict, List, Any
+import copy
+import hashlib
+import logging
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Hashable, List, Optional
 from config.settings import settings
+from monitoring.metrics import registry
+from monitoring.tracing import span
+from .tokens import chunk_text, estimate_tokens, truncate_text
+from .merging import merge_results
+from .llm_backends import LLMBackend, create_backends
+from .routing import LatencyRouter
+from .partial_json import parse_partial_json
+from .local_extractor import local_extractor
 
-class G4FAnalyzer:
+logger = logging.getLogger(__name__)
+
+LLM_SECONDS = registry.histogram(
+    'llm_request_duration_seconds', 'Время вызова LLM по типу анализа с учетом маршрутизации и хеджирования',
+    ['analysis_type', 'status'])
+
+class SingleFlight:
+    """Registry of in-flight calls: concurrent calls with the same key share one awaited task"""
+    
     def __init__(self):
-        self.provider = g4f.Provider.OpenaiChat
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
     
-    async def analyze_text(self, text: str, analysis_type: str) -> Dict[str, Any]:
-        """Analyze text using G4F based on analysis type"""
-        
-        prompts = {
-            'entity_extraction': self._entity_extraction_prompt(text),
-            'insight_classification': self._insight_classification_prompt(text),
-            'sentiment_analysis': self._sentiment_analysis_prompt(text),
-            'skill_extraction': self._skill_extraction_prompt(text),
-            'trend_detection': self._trend_detection_prompt(text)
-        }
-        
-        prompt = prompts.get(analysis_type, self._default_analysis_prompt(text))
+    async def run(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            self.executed += 1
+            task = asyncio.ensure_future(factory())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+        # shield: a cancelled caller must not cancel the call shared with the others
+        result = await asyncio.shield(task)
+        # Callers get their own copy, so one of them mutating the result does not affect the rest
+        return copy.deepcopy(result)
+    
+    @property
+    def in_flight(self) -> int:
+        return len(self._in_flight)
+    
+    def stats(self) -> Dict[str, int]:
+        return {'calls': self.calls, 'provider_calls': self.executed,
+                'coalesced': self.coalesced, 'in_flight': self.in_flight}
+
+# Key that must be present in a valid result of each analysis type
+REQUIRED_KEYS = {
+    'entity_extraction': 'technologies',
+    'insight_classification': 'category',
+    'sentiment_analysis': 'sentiment',
+    'skill_extraction': 'technical_skills',
+    'trend_detection': 'emerging_trends'
+}
+
+class G4FAnalyzer:
+    def __init__(self, backends: List[LLMBackend] = None):
+        # Backends are listed in LLM_BACKEND: g4f providers and/or OpenAI-compatible endpoints
+        if backends is None:
+            try:
+                backends = create_backends()
+            except Exception as e:
+                # A bad LLM_BACKEND must not stop the bot: LLM features report themselves unavailable
+                logger.error(f"Invalid LLM_BACKEND '{settings.LLM_BACKEND}', LLM analysis is disabled: {e}")
+                backends = []
+        self.backends = backends
+        self.router = LatencyRouter(self.backends, hedge_delay=settings.LLM_HEDGE_DELAY)
+        self.single_flight = SingleFlight()
+        self.pack_stats = {'packed_calls': 0, 'packed_items': 0, 'fallback_items': 0}
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+    
+    async def analyze_text(self, text: str, analysis_type: str, hedge: bool = False, local: bool = True,
+                           telegram_id: str = None) -> Dict[str, Any]:
+        """Analyze text using G4F based on analysis type
         
+        hedge marks latency-critical calls: a duplicate request goes to the next backend
+        if the first one is slower than its p95 (see LatencyRouter). Skill and entity
+        extraction are answered by the local extractor when it is confident (local=False skips it);
+        telegram_id is the owner of the text, whose experts extend the local vocabulary.
+        """
+        result = self._local(text, analysis_type, telegram_id) if local else None
+        if result is not None:
+            return result
+        hedge = hedge and settings.LLM_HEDGING
+        chunks = chunk_text(text, self.input_budget(analysis_type))
+        if len(chunks) == 1:
+            return await self._analyze_single(text, analysis_type, hedge)
+        return await self._analyze_chunks(chunks, analysis_type, hedge)
+    
+    async def _analyze_single(self, text: str, analysis_type: str, hedge: bool = False) -> Dict[str, Any]:
+        prompt = self._prompt(text, analysis_type)
         try:
-            response = await g4f.ChatCompletion.create_async(
-                model=g4f.models.gpt_4,
-                messages=[{"role": "user", "content": prompt}],
-                provider=self.provider
-            )
+            response = await self._complete(prompt, analysis_type, hedge)
             return self._parse_response(response, analysis_type)
         except Exception as e:
             return {'error': str(e), 'analysis_type': analysis_type}
     
+    async def _analyze_chunks(self, chunks: List[str], analysis_type: str, hedge: bool = False) -> Dict[str, Any]:
+        """Long text: sentence-aligned chunks are analyzed concurrently and merged per analysis type
+        
+        At most LLM_MAX_CHUNKS chunks are sent, so the cost of one document stays bounded.
+        """
+        chunks = chunks[:settings.LLM_MAX_CHUNKS]
+        usage = self._usage(analysis_type)
+        usage['chunked_texts'] += 1
+        usage['chunks'] += len(chunks)
+        results = await asyncio.gather(*(self._analyze_single(chunk, analysis_type, hedge) for chunk in chunks))
+        succeeded = [(result, estimate_tokens(chunk)) for result, chunk in zip(results, chunks)
+                     if 'error' not in result and 'raw_response' not in result]
+        if not succeeded:
+            return results[0]
+        merged = merge_results(analysis_type, [result for result, _ in succeeded], [weight for _, weight in succeeded])
+        merged['chunks'] = len(chunks)
+        return merged
+    
+    def input_budget(self, analysis_type: str) -> int:
+        """Tokens left for the text after the prompt template within LLM_MAX_PROMPT_TOKENS"""
+        return max(settings.LLM_MAX_PROMPT_TOKENS - estimate_tokens(self._prompt('', analysis_type)), 100)
+    
+    def _usage(self, analysis_type: str) -> Dict[str, int]:
+        if analysis_type not in self.token_usage:
+            self.token_usage[analysis_type] = {'calls': 0, 'prompt_tokens': 0, 'completion_tokens': 0,
+                                               'chunked_texts': 0, 'chunks': 0}
+        return self.token_usage[analysis_type]
+    
+    def _record_usage(self, analysis_type: str, prompt: str, response: str):
+        """Estimated tokens of one provider call (coalesced calls are counted once)"""
+        usage = self._usage(analysis_type)
+        usage['calls'] += 1
+        usage['prompt_tokens'] += estimate_tokens(prompt)
+        usage['completion_tokens'] += estimate_tokens(response or '')
+    
+    async def analyze_stream(self, text: str, analysis_type: str) -> AsyncIterator[Dict[str, Any]]:
+        """Streaming analysis: yields the partially parsed JSON each time it grows
+        
+        The last yielded value is the final result in the same shape as analyze_text.
+        """
+        # One streamed answer cannot be merged from chunks, so a long text is cut on a sentence boundary
+        prompt = self._prompt(truncate_text(text, self.input_budget(analysis_type)), analysis_type)
+        response = ''
+        last = None
+        try:
+            async for chunk in self.router.stream(prompt, analysis_type):
+                response += chunk
+                partial = parse_partial_json(response)
+                if partial and partial != last:
+                    last = partial
+                    yield partial
+        except Exception as e:
+            yield {'error': str(e), 'analysis_type': analysis_type}
+            return
+        self._record_usage(analysis_type, prompt, response)
+        yield self._parse_response(response, analysis_type)
+    
+    def _local(self, text: str, analysis_type: str, telegram_id: str = None) -> Optional[Dict[str, Any]]:
+        """Dictionary-based result for skill/entity extraction when it is confident enough"""
+        if not settings.LOCAL_EXTRACTION:
+            return None
+        return local_extractor.extract(text, analysis_type, telegram_id)
+    
+    def _prompt(self, text: str, analysis_type: str) -> str:
+        prompts = {
+            'entity_extraction': self._entity_extraction_prompt,
+            'insight_classification': self._insight_classification_prompt,
+            'sentiment_analysis': self._sentiment_analysis_prompt,
+            'skill_extraction': self._skill_extraction_prompt,
+            'trend_detection': self._trend_detection_prompt
+        }
+        return prompts.get(analysis_type, self._default_analysis_prompt)(text)
+    
+    @property
+    def available(self) -> bool:
+        return any(backend.available for backend in self.backends)
+    
+    @property
+    def backend_names(self) -> str:
+        return ', '.join(backend.label for backend in self.backends) or 'none'
+    
+    async def close(self):
+        for backend in self.backends:
+            await backend.close()
+    
+    async def _complete(self, prompt: str, analysis_type: str, hedge: bool = False) -> str:
+        """Raw response of the backend chosen by the router; identical concurrent prompts are coalesced into one call"""
+        key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        
+        async def call() -> str:
+            started = time.perf_counter()
+            try:
+                response = await self.router.complete(prompt, analysis_type, hedge)
+            except Exception:
+                LLM_SECONDS.observe(time.perf_counter() - started, analysis_type=analysis_type, status='error')
+                raise
+            LLM_SECONDS.observe(time.perf_counter() - started, analysis_type=analysis_type, status='ok')
+            self._record_usage(analysis_type, prompt, response)
+            return response
+        
+        with span('llm.complete', analysis_type=analysis_type, prompt_chars=len(prompt)):
+            return await self.single_flight.run(key, call)
+    
     def _entity_extraction_prompt(self, text: str) -> str:
         return f"""
         Извлеки сущности из текста ниже. Верни В ТОЛЬКО JSON формате:
@@ -90,8 +266,8 @@ class G4FAnalyzer:
         Текст: {text}
         """
     
-    def _trend_detection_prompt(self, texts: List[str]) -> str:
-        combined_text = "\n".join(texts[:5])  # Analyze first 5 texts
+    def _trend_detection_prompt(self, text: str) -> str:
+        # Текст - уже собранный блок публикаций; размер блока ограничивает TrendEngine
         return f"""
         Выяви emerging тренды из следующих текстов. Верни В ТОЛЬКО JSON:
         
@@ -108,7 +284,7 @@ class G4FAnalyzer:
             "predictions": ["prediction1", "prediction2"]
         }}
         
-        Тексты: {combined_text}
+        Тексты: {text}
         """
     
     def _default_analysis_prompt(self, text: str) -> str:
@@ -136,10 +312,131 @@ class G4FAnalyzer:
         except json.JSONDecodeError:
             return {'raw_response': response, 'analysis_type': analysis_type}
     
-    async def batch_analyze(self, texts: List[str], analysis_type: str) -> List[Dict[str, Any]]:
-        """Analyze multiple texts concurrently"""
-        tasks = [self.analyze_text(text, analysis_type) for text in texts]
-        return await asyncio.gather(*tasks, return_exceptions=True)
+    def _packed_prompt(self, texts: List[str], analysis_type: str) -> str:
+        # The single-item prompt with a placeholder is the shared header for all items
+        header = self._prompt('<текст элемента>', analysis_type)
+        items = "\n\n".join(f"[{number}] {text}" for number, text in enumerate(texts, 1))
+        return f"""
+        Ниже {len(texts)} пронумерованных текстов. Выполни задание для КАЖДОГО текста отдельно.
+        
+        Задание для одного текста:
+        {header}
+        
+        Верни ТОЛЬКО JSON-массив из {len(texts)} объектов в порядке текстов. В каждый объект
+        добавь поле "item" с номером текста.
+        
+        Тексты:
+        {items}
+        """
+    
+    def _parse_packed_response(self, response: str, count: int, analysis_type: str) -> List[Optional[Dict[str, Any]]]:
+        """Demultiplex a JSON array answer into per-item results; invalid items are None"""
+        results: List[Optional[Dict[str, Any]]] = [None] * count
+        try:
+            start = response.find('[')
+            end = response.rfind(']') + 1
+            items = json.loads(response[start:end])
+        except (json.JSONDecodeError, AttributeError):
+            return results
+        if not isinstance(items, list):
+            return results
+        
+        required = REQUIRED_KEYS.get(analysis_type, 'summary')
+        for position, item in enumerate(items):
+            if not isinstance(item, dict) or required not in item:
+                continue
+            number = item.pop('item', None)
+            # Without a usable number the position is trusted only if the array is complete
+            if isinstance(number, int) and 1 <= number <= count:
+                index = number - 1
+            elif len(items) == count:
+                index = position
+            else:
+                continue
+            if results[index] is None:
+                results[index] = item
+        return results
+    
+    def _packs(self, texts: List[str]) -> List[List[int]]:
+        """Greedy packing of text indices under the token budget and item limit"""
+        packs: List[List[int]] = []
+        current: List[int] = []
+        used = 0
+        for index, text in enumerate(texts):
+            tokens = estimate_tokens(text)
+            if current and (used + tokens > settings.LLM_PACK_TOKENS or len(current) >= settings.LLM_PACK_MAX_ITEMS):
+                packs.append(current)
+                current, used = [], 0
+            current.append(index)
+            used += tokens
+        if current:
+            packs.append(current)
+        return packs
+    
+    async def _analyze_pack(self, texts: List[str], analysis_type: str) -> List[Optional[Dict[str, Any]]]:
+        self.pack_stats['packed_calls'] += 1
+        self.pack_stats['packed_items'] += len(texts)
+        try:
+            response = await self._complete(self._packed_prompt(texts, analysis_type), analysis_type)
+        except Exception:
+            return [None] * len(texts)
+        return self._parse_packed_response(response, len(texts), analysis_type)
+    
+    async def batch_analyze(self, texts: List[str], analysis_type: str, packed: bool = None,
+                            telegram_id: str = None) -> List[Dict[str, Any]]:
+        """Analyze multiple texts concurrently
+        
+        In packing mode texts share one prompt (common header, numbered items) under
+        LLM_PACK_TOKENS, and the model answers with a JSON array. Items that are missing
+        or invalid in the answer fall back to single-item calls. All texts belong to telegram_id,
+        whose vocabulary is used by the local extractor.
+        """
+        if packed is None:
+            packed = settings.LLM_PACKING
+        if not packed or len(texts) < 2:
+            tasks = [self.analyze_text(text, analysis_type, telegram_id=telegram_id) for text in texts]
+            return await asyncio.gather(*tasks, return_exceptions=True)
+        
+        # Texts the local extractor handles confidently do not reach the LLM at all
+        results: List[Optional[Dict[str, Any]]] = [self._local(text, analysis_type, telegram_id) for text in texts]
+        remaining = [index for index, result in enumerate(results) if result is None]
+        
+        async def run_pack(indices: List[int]):
+            if len(indices) == 1:
+                results[indices[0]] = await self.analyze_text(texts[indices[0]], analysis_type, local=False)
+                return
+            for index, result in zip(indices, await self._analyze_pack([texts[i] for i in indices], analysis_type)):
+                results[index] = result
+        
+        packs = [[remaining[i] for i in pack] for pack in self._packs([texts[index] for index in remaining])]
+        await asyncio.gather(*(run_pack(indices) for indices in packs))
+        
+        failed = [index for index, result in enumerate(results) if result is None]
+        if failed:
+            self.pack_stats['fallback_items'] += len(failed)
+            fallback = await asyncio.gather(*(self.analyze_text(texts[index], analysis_type, local=False) for index in failed))
+            for index, result in zip(failed, fallback):
+                results[index] = result
+        return results
 
 # Global analyzer instance
-analyzer = G4FAnalyzer()
\ No newline at end of file
+analyzer = G4FAnalyzer()
+
+registry.gauge(
+    'llm_tokens_estimated_total', 'Оценка токенов промптов и ответов по типу анализа',
+    ['analysis_type', 'kind'], kind='counter',
+    collect=lambda: {(analysis_type, kind): value for analysis_type, usage in analyzer.token_usage.items()
+                     for kind, value in usage.items() if kind.endswith('_tokens')}
+)
+registry.gauge(
+    'llm_single_flight_calls_total', 'Вызовы анализатора: все, отправленные провайдеру, объединенные', ['kind'], kind='counter',
+    collect=lambda: {(kind,): value for kind, value in analyzer.single_flight.stats().items() if kind != 'in_flight'}
+)
+registry.gauge(
+    'llm_hedged_requests_total', 'Хедж-дубли запросов: отправленные и выигравшие', ['kind'], kind='counter',
+    collect=lambda: {('sent',): analyzer.router.hedges_sent, ('won',): analyzer.router.hedges_won}
+)
+registry.gauge(
+    'llm_local_extractions_total', 'Извлечение навыков и сущностей: локально или через LLM', ['path'],
+    kind='counter', collect=lambda: {('local',): local_extractor.hits, ('llm',): local_extractor.misses}
+)
\ No newline at end of file
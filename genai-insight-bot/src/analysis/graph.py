@@ -0,0 +1,280 @@
+from database.operations import db
+from database.models import normalize_name
+from typing import Dict, List, Tuple
+import logging
+import re
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+class ExpertGraph:
+    """Разреженный взвешенный граф экспертов в формате CSR"""
+
+    # Навыки и компании, встречающиеся слишком часто, дают почти полный граф и не несут сигнала
+    HUB_LIMIT = 1000
+    SKILL_WEIGHT = 1.0
+    COMPANY_WEIGHT = 0.5
+    MENTION_WEIGHT = 1.0
+
+    def __init__(self, people: list, publications: list):
+        self.names: List[str] = []
+        self.display_names: List[str] = []
+        node_by_name: Dict[str, int] = {}
+        skills_by_node: List[set] = []
+        company_by_node: List[str] = []
+
+        # Узел - уникальное имя: дубликаты записей объединяются
+        for person in people:
+            key = normalize_name(person.name)
+            if not key:
+                continue
+            if key not in node_by_name:
+                node_by_name[key] = len(self.names)
+                self.names.append(key)
+                self.display_names.append(person.name)
+                skills_by_node.append(set())
+                company_by_node.append('')
+            node = node_by_name[key]
+            skills_by_node[node].update(s.lower().strip() for s in (person.skills or []) if s.strip())
+            if person.company and not company_by_node[node]:
+                company_by_node[node] = person.company.lower().strip()
+
+        self.node_by_name = node_by_name
+        self.n = len(self.names)
+
+        weights: Dict[Tuple[int, int], float] = {}
+
+        def add_clique(members: List[int], weight: float):
+            if len(members) > self.HUB_LIMIT:
+                return
+            for i in range(len(members)):
+                for j in range(i + 1, len(members)):
+                    edge = (members[i], members[j])
+                    weights[edge] = weights.get(edge, 0.0) + weight
+
+        # 1. Общие навыки
+        skill_postings: Dict[str, List[int]] = {}
+        for node, skills in enumerate(skills_by_node):
+            for skill in skills:
+                skill_postings.setdefault(skill, []).append(node)
+        for members in skill_postings.values():
+            add_clique(members, self.SKILL_WEIGHT)
+
+        # 2. Общая компания
+        company_postings: Dict[str, List[int]] = {}
+        for node, company in enumerate(company_by_node):
+            if company:
+                company_postings.setdefault(company, []).append(node)
+        for members in company_postings.values():
+            add_clique(members, self.COMPANY_WEIGHT)
+
+        # 3. Упоминания экспертов в публикациях друг друга
+        for author, mentioned in self._co_mentions(publications):
+            edge = (min(author, mentioned), max(author, mentioned))
+            weights[edge] = weights.get(edge, 0.0) + self.MENTION_WEIGHT
+
+        self.edge_count = len(weights)
+        self._build_csr(weights)
+
+    def _co_mentions(self, publications: list):
+        """Находит упоминания имен экспертов в публикациях за один проход по словам текста"""
+        names_by_token: Dict[str, List[str]] = {}
+        for name in self.names:
+            tokens = _WORD_RE.findall(name)
+            if len(tokens) >= 2:
+                # Фамилия как ключ-кандидат, полное имя проверяется подстрокой
+                names_by_token.setdefault(tokens[-1], []).append(name)
+
+        for publication in publications:
+            author = self.node_by_name.get(normalize_name(publication.expert_name))
+            if author is None or not publication.content:
+                continue
+            content = publication.content.lower()
+            for token in set(_WORD_RE.findall(content)):
+                for name in names_by_token.get(token, ()):
+                    mentioned = self.node_by_name[name]
+                    if mentioned != author and name in content:
+                        yield author, mentioned
+
+    def _build_csr(self, weights: Dict[Tuple[int, int], float]):
+        if weights:
+            pairs = np.array(list(weights.keys()), dtype=np.int64)
+            values = np.array(list(weights.values()), dtype=np.float64)
+            rows = np.concatenate([pairs[:, 0], pairs[:, 1]])
+            cols = np.concatenate([pairs[:, 1], pairs[:, 0]])
+            data = np.concatenate([values, values])
+        else:
+            rows = cols = np.array([], dtype=np.int64)
+            data = np.array([], dtype=np.float64)
+
+        order = np.lexsort((cols, rows))
+        self.rows = rows[order]
+        self.indices = cols[order]
+        self.data = data[order]
+        self.indptr = np.concatenate([[0], np.cumsum(np.bincount(self.rows, minlength=self.n))])
+        self.strength = np.bincount(self.rows, weights=self.data, minlength=self.n)
+
+    def neighbors(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def matvec(self, vector: np.ndarray) -> np.ndarray:
+        """Умножение разреженной матрицы смежности на вектор"""
+        return np.bincount(self.rows, weights=self.data * vector[self.indices], minlength=self.n)
+
+    def pagerank(self, damping: float = 0.85, tol: float = 1e-8, max_iter: int = 100) -> np.ndarray:
+        if self.n == 0:
+            return np.array([])
+
+        rank = np.full(self.n, 1.0 / self.n)
+        dangling = self.strength == 0
+        inverse_strength = np.where(dangling, 0.0, 1.0 / np.where(dangling, 1.0, self.strength))
+
+        for _ in range(max_iter):
+            spread = self.matvec(rank * inverse_strength)
+            new_rank = damping * (spread + rank[dangling].sum() / self.n) + (1 - damping) / self.n
+            if np.abs(new_rank - rank).sum() < tol:
+                return new_rank
+            rank = new_rank
+        return rank
+
+    def _expand(self, frontier: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Все ребра (источник, сосед) для узлов фронтира одной векторной операцией"""
+        starts = self.indptr[frontier]
+        lengths = self.indptr[frontier + 1] - starts
+        total = int(lengths.sum())
+        if total == 0:
+            return frontier[:0], frontier[:0]
+        offsets = np.repeat(starts - np.concatenate([[0], np.cumsum(lengths)[:-1]]), lengths)
+        return np.repeat(frontier, lengths), self.indices[offsets + np.arange(total)]
+
+    def betweenness(self, samples: int = 64, seed: int = 42) -> np.ndarray:
+        """Приближенная центральность по посредничеству: алгоритм Брандеса по выборке источников"""
+        centrality = np.zeros(self.n)
+        if self.n < 3:
+            return centrality
+
+        rng = np.random.default_rng(seed)
+        sources = rng.choice(self.n, min(samples, self.n), replace=False)
+
+        for source in sources:
+            # Поуровневый BFS: на каждом уровне сразу весь фронтир
+            distance = np.full(self.n, -1)
+            distance[source] = 0
+            paths = np.zeros(self.n)
+            paths[source] = 1
+            levels = []
+            frontier = np.array([source])
+            depth = 0
+            while len(frontier):
+                src, dst = self._expand(frontier)
+                unseen = dst[distance[dst] < 0]
+                distance[unseen] = depth + 1
+                on_shortest = distance[dst] == depth + 1
+                src, dst = src[on_shortest], dst[on_shortest]
+                np.add.at(paths, dst, paths[src])
+                levels.append((src, dst))
+                frontier = np.unique(dst)
+                depth += 1
+
+            # Обратный проход: накопление зависимостей от дальних уровней к ближним
+            dependency = np.zeros(self.n)
+            for src, dst in reversed(levels):
+                np.add.at(dependency, src, paths[src] / paths[dst] * (1 + dependency[dst]))
+            dependency[source] = 0
+            centrality += dependency
+
+        # Масштабируем выборку на все источники и нормируем для неориентированного графа
+        centrality *= self.n / len(sources) / 2
+        return centrality / ((self.n - 1) * (self.n - 2) / 2)
+
+    def _vote(self, labels: np.ndarray) -> np.ndarray:
+        """Метка с наибольшим суммарным весом соседей для каждого узла (CSR × one-hot меток)
+
+        При равенстве голосов остается текущая метка, иначе берется наименьшая; изолированные
+        узлы сохраняют свою.
+        """
+        if not len(self.data):
+            return labels.copy()
+        # Ненулевые элементы произведения - пары (узел, метка соседа), отсортированные по узлу и метке
+        pairs, inverse = np.unique(self.rows * self.n + labels[self.indices], return_inverse=True)
+        totals = np.bincount(inverse, weights=self.data)
+        pair_rows, pair_labels = pairs // self.n, pairs % self.n
+
+        voted_rows, starts = np.unique(pair_rows, return_index=True)
+        best = np.maximum.reduceat(totals, starts)
+        is_best = np.isclose(totals, np.repeat(best, np.diff(np.append(starts, len(pairs)))))
+        smallest = np.minimum.reduceat(np.where(is_best, pair_labels, self.n), starts)
+        keeps = np.maximum.reduceat(is_best & (pair_labels == labels[pair_rows]), starts)
+
+        proposal = labels.copy()
+        proposal[voted_rows] = np.where(keeps, labels[voted_rows], smallest)
+        return proposal
+
+    def communities(self, max_iter: int = 40, seed: int = 42) -> np.ndarray:
+        """Сообщества взвешенным распространением меток
+
+        Голосование векторизовано произведением разреженной матрицы на one-hot меток.
+        Обновление полусинхронное: на каждой итерации новую метку получает случайная половина
+        узлов, иначе синхронный шаг зацикливается на двудольных фрагментах графа.
+        """
+        labels = np.arange(self.n)
+        rng = np.random.default_rng(seed)
+
+        for _ in range(max_iter):
+            proposal = self._vote(labels)
+            changed = proposal != labels
+            if not changed.any():
+                break
+            update = changed & (rng.random(self.n) < 0.5)
+            labels = np.where(update, proposal, labels)
+
+        # Перенумеровываем сообщества по убыванию размера: 0 - самое большое
+        unique, counts = np.unique(labels, return_counts=True)
+        ranking = {label: rank for rank, label in enumerate(unique[np.argsort(-counts, kind='stable')])}
+        return np.array([ranking[label] for label in labels], dtype=np.int64)
+
+class GraphAnalytics:
+    """Аналитика сети экспертов пользователя с кэшем по версии данных"""
+
+    def __init__(self):
+        self.db = db
+        self._cache: Dict[str, Tuple[str, Dict]] = {}
+
+    def analyze(self, telegram_id: str) -> Dict:
+        version = self.db.get_dataset_version(telegram_id)
+        cached = self._cache.get(telegram_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        graph = ExpertGraph(self.db.get_all_people(telegram_id), self.db.get_user_publications(telegram_id))
+        pagerank = graph.pagerank()
+        betweenness = graph.betweenness()
+        communities = graph.communities()
+
+        metrics = {
+            name: {
+                'pagerank': float(pagerank[node]),
+                'betweenness': float(betweenness[node]),
+                'community': int(communities[node])
+            }
+            for node, name in enumerate(graph.names)
+        }
+
+        result = {
+            'nodes': graph.n,
+            'edges': graph.edge_count,
+            'communities_count': int(len(np.unique(communities[graph.strength > 0]))) if graph.n else 0,
+            'top_pagerank': [graph.display_names[i] for i in np.argsort(-pagerank)[:5]] if graph.n else [],
+            'top_betweenness': [graph.display_names[i] for i in np.argsort(-betweenness)[:5] if betweenness[i] > 0],
+            'metrics': metrics
+        }
+        self._cache[telegram_id] = (version, result)
+        logger.info(f"Graph analytics for user {telegram_id}: {graph.n} nodes, {graph.edge_count} edges")
+        return result
+
+    def node_metrics(self, telegram_id: str, name: str) -> Dict:
+        return self.analyze(telegram_id)['metrics'].get(normalize_name(name), {})
+
+graph_analytics = GraphAnalytics()
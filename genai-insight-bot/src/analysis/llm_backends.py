@@ -0,0 +1,186 @@
+import asyncio
+import importlib
+import json
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator, List, Optional
+import httpx
+from config.settings import settings
+
+try:
+    import h2  # noqa: F401  HTTP/2 для httpx включается, только если установлен пакет h2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+class LLMBackend(ABC):
+    """Interface of a chat completion backend used by G4FAnalyzer"""
+
+    name = 'base'
+    model = ''
+
+    @property
+    def label(self) -> str:
+        """Unique backend name for routing statistics and logs"""
+        return f"{self.name}/{self.model}"
+
+    @property
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def complete(self, prompt: str) -> str:
+        """Return the model answer to a single user message"""
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        """Yield the answer in chunks as the model generates it; by default it is yielded whole"""
+        yield await self.complete(prompt)
+
+    async def close(self):
+        pass
+
+class G4FBackend(LLMBackend):
+    """g4f provider and model taken from settings (G4F_PROVIDER, G4F_MODEL)"""
+
+    name = 'g4f'
+
+    def __init__(self, provider: str = None, model: str = None):
+        self.provider_path = provider or settings.G4F_PROVIDER
+        self.model = model or settings.G4F_MODEL
+        self._g4f = None
+        try:
+            self._g4f = importlib.import_module('g4f')
+        except ImportError:
+            logger.warning("g4f is not installed, g4f backend is unavailable")
+
+    @property
+    def label(self) -> str:
+        return f"g4f/{self.provider_path.rsplit('.', 1)[-1]}/{self.model}"
+
+    @property
+    def available(self) -> bool:
+        return self._g4f is not None
+
+    def _provider(self):
+        # 'g4f.Provider.Bing' -> объект провайдера; неизвестное имя - ошибка конфигурации
+        target = self._g4f
+        for part in self.provider_path.split('.')[1:]:
+            target = getattr(target, part)
+        return target
+
+    def _model(self):
+        return getattr(self._g4f.models, self.model.replace('-', '_').replace('.', '_'), self.model)
+
+    async def complete(self, prompt: str) -> str:
+        if not self.available:
+            raise RuntimeError('g4f is not installed')
+        return await self._g4f.ChatCompletion.create_async(
+            model=self._model(),
+            messages=[{"role": "user", "content": prompt}],
+            provider=self._provider()
+        )
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        if not self.available:
+            raise RuntimeError('g4f is not installed')
+        # Потоковый ответ g4f - синхронный генератор, поэтому каждый фрагмент читается в потоке
+        chunks = iter(self._g4f.ChatCompletion.create(
+            model=self._model(),
+            messages=[{"role": "user", "content": prompt}],
+            provider=self._provider(),
+            stream=True
+        ))
+        while True:
+            chunk = await asyncio.to_thread(next, chunks, None)
+            if chunk is None:
+                break
+            yield str(chunk)
+
+class OpenAICompatibleBackend(LLMBackend):
+    """Any OpenAI-compatible /chat/completions endpoint: OpenAI, vLLM, llama.cpp server
+
+    One long-lived pooled client is reused for all requests: keep-alive connections,
+    HTTP/2 when h2 is installed, separate connect and read timeouts.
+    """
+
+    name = 'openai'
+
+    def __init__(self, base_url: str = None, model: str = None, api_key: str = None):
+        self.base_url = (base_url or settings.LLM_BASE_URL).rstrip('/')
+        self.model = model or settings.LLM_MODEL
+        self.api_key = api_key or settings.LLM_API_KEY
+        self._client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def label(self) -> str:
+        return f"openai/{httpx.URL(self.base_url).host}/{self.model}"
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            headers = {'Authorization': f'Bearer {self.api_key}'} if self.api_key else {}
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=headers,
+                http2=HTTP2_AVAILABLE,
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                    keepalive_expiry=settings.LLM_KEEPALIVE
+                )
+            )
+        return self._client
+
+    async def complete(self, prompt: str) -> str:
+        response = await self.client.post('/chat/completions', json={
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': settings.LLM_TEMPERATURE
+        })
+        response.raise_for_status()
+        return response.json()['choices'][0]['message']['content']
+
+    async def stream(self, prompt: str) -> AsyncIterator[str]:
+        # Server-sent events: строки 'data: {...}' с приращениями текста, в конце 'data: [DONE]'
+        async with self.client.stream('POST', '/chat/completions', json={
+            'model': self.model,
+            'messages': [{'role': 'user', 'content': prompt}],
+            'temperature': settings.LLM_TEMPERATURE,
+            'stream': True
+        }) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.startswith('data:'):
+                    continue
+                data = line[5:].strip()
+                if data == '[DONE]':
+                    break
+                choices = json.loads(data).get('choices') or [{}]
+                delta = (choices[0].get('delta') or {}).get('content')
+                if delta:
+                    yield delta
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+BACKENDS = {
+    'g4f': G4FBackend,
+    'openai': OpenAICompatibleBackend
+}
+
+def create_backend(name: str = None) -> LLMBackend:
+    """Backend by spec 'name' or 'name:target': g4f:g4f.Provider.Bing, openai:http://host:8000/v1"""
+    name, _, target = (name or settings.LLM_BACKEND).strip().partition(':')
+    name = name.lower()
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown LLM_BACKEND '{name}', expected one of: {', '.join(BACKENDS)}")
+    return BACKENDS[name](target) if target else BACKENDS[name]()
+
+def create_backends(spec: str = None) -> List[LLMBackend]:
+    """Comma-separated LLM_BACKEND list; requests are routed between the backends"""
+    return [create_backend(item) for item in (spec or settings.LLM_BACKEND).split(',') if item.strip()]
@@ -0,0 +1,336 @@
+import logging
+import re
+import threading
+from collections import Counter, deque
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from database.operations import db
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Каноническое название -> (область, варианты написания). Короткие неоднозначные слова (go, r, c) не включены
+TECH_DICTIONARY = {
+    'Python': ('programming', ['python']),
+    'Java': ('programming', ['java']),
+    'JavaScript': ('web', ['javascript', 'js']),
+    'TypeScript': ('web', ['typescript']),
+    'C++': ('programming', ['c++', 'cpp']),
+    'C#': ('programming', ['c#']),
+    'Rust': ('programming', ['rust']),
+    'Golang': ('programming', ['golang']),
+    'Kotlin': ('programming', ['kotlin']),
+    'SQL': ('data', ['sql', 'postgresql', 'postgres', 'mysql', 'sqlite']),
+    'React': ('web', ['react', 'react.js', 'reactjs']),
+    'Node.js': ('web', ['node.js', 'nodejs']),
+    'Docker': ('cloud', ['docker']),
+    'Kubernetes': ('cloud', ['kubernetes', 'k8s']),
+    'AWS': ('cloud', ['aws', 'amazon web services']),
+    'Azure': ('cloud', ['azure']),
+    'GCP': ('cloud', ['gcp', 'google cloud']),
+    'Spark': ('data', ['spark', 'apache spark', 'pyspark']),
+    'Kafka': ('data', ['kafka', 'apache kafka']),
+    'Airflow': ('data', ['airflow']),
+    'Pandas': ('data', ['pandas']),
+    'NumPy': ('data', ['numpy']),
+    'Data Science': ('data', ['data science', 'наука о данных']),
+    'Big Data': ('data', ['big data', 'большие данные']),
+    'Machine Learning': ('machine learning', ['machine learning', 'машинное обучение', 'ml']),
+    'Deep Learning': ('deep learning', ['deep learning', 'глубокое обучение', 'нейронные сети', 'neural networks']),
+    'Artificial Intelligence': ('ai', ['artificial intelligence', 'искусственный интеллект', 'ai', 'ии']),
+    'Generative AI': ('ai', ['generative ai', 'genai', 'генеративный ии', 'генеративный искусственный интеллект']),
+    'NLP': ('nlp', ['nlp', 'natural language processing', 'обработка естественного языка']),
+    'Computer Vision': ('computer vision', ['computer vision', 'компьютерное зрение', 'cv']),
+    'Reinforcement Learning': ('machine learning', ['reinforcement learning', 'обучение с подкреплением', 'rlhf']),
+    'LLM': ('nlp', ['llm', 'llms', 'large language model', 'large language models', 'большие языковые модели',
+                    'языковые модели', 'языковая модель']),
+    'Transformers': ('deep learning', ['transformer', 'transformers', 'трансформеры', 'трансформер']),
+    'Diffusion Models': ('computer vision', ['diffusion', 'diffusion models', 'stable diffusion', 'диффузионные модели']),
+    'RAG': ('nlp', ['rag', 'retrieval-augmented generation', 'retrieval augmented generation']),
+    'Prompt Engineering': ('nlp', ['prompt engineering', 'промпт-инжиниринг', 'промпт инжиниринг']),
+    'Fine-tuning': ('machine learning', ['fine-tuning', 'fine tuning', 'finetuning', 'дообучение', 'файнтюнинг', 'lora']),
+    'AI Agents': ('ai', ['ai agents', 'ai agent', 'llm agents', 'ии-агенты', 'ии-агент']),
+    'Vector Databases': ('data', ['vector database', 'vector databases', 'векторные базы', 'векторная база']),
+    'MLOps': ('machine learning', ['mlops']),
+    'PyTorch': ('deep learning', ['pytorch', 'torch']),
+    'TensorFlow': ('deep learning', ['tensorflow', 'keras']),
+    'JAX': ('deep learning', ['jax']),
+    'scikit-learn': ('machine learning', ['scikit-learn', 'sklearn']),
+    'Hugging Face': ('nlp', ['hugging face', 'huggingface']),
+    'LangChain': ('nlp', ['langchain']),
+    'LlamaIndex': ('nlp', ['llamaindex', 'llama index']),
+    'GPT': ('nlp', ['gpt', 'gpt-3', 'gpt-3.5', 'gpt-4', 'gpt-4o', 'chatgpt']),
+    'LLaMA': ('nlp', ['llama', 'llama 2', 'llama 3']),
+    'BERT': ('nlp', ['bert']),
+    'CUDA': ('deep learning', ['cuda']),
+    'Robotics': ('robotics', ['robotics', 'робототехника']),
+}
+
+# Известные компании, которые часто встречаются в публикациях о GenAI
+KNOWN_COMPANIES = ['OpenAI', 'Anthropic', 'Google', 'DeepMind', 'Google DeepMind', 'Microsoft', 'Meta', 'Apple',
+                   'Amazon', 'NVIDIA', 'Hugging Face', 'Mistral AI', 'Stability AI', 'Cohere', 'xAI', 'Tesla',
+                   'IBM', 'Intel', 'AMD', 'Яндекс', 'Yandex', 'Сбер', 'Sber', 'VK', 'Тинькофф', 'Т-Банк', 'Касперский']
+
+ROLES = (r'CEO|CTO|CPO|COO|CSO|founder|co-founder|cofounder|head of [\w ]+?|lead|researcher|scientist|engineer|'
+         r'основатель|сооснователь|директор|руководитель|исследователь|инженер|профессор|professor')
+NAME = r'[A-ZА-ЯЁ][a-zа-яё]+(?:-[A-ZА-ЯЁ][a-zа-яё]+)?\s+[A-ZА-ЯЁ][a-zа-яё]+(?:-[A-ZА-ЯЁ][a-zа-яё]+)?'
+ORGANIZATION = r'[A-ZА-ЯЁ][\w&.-]*(?:\s+[A-ZА-ЯЁ][\w&.-]*){0,2}'
+
+PERSON_ROLE_RE = re.compile(
+    rf'(?P<name>{NAME})\s*(?:,|\(|-|–|—)?\s*(?P<role>(?i:{ROLES}))'
+    rf'(?:\s+(?i:of|at|в|из|компании)\s+(?P<company>{ORGANIZATION}))?'
+)
+ROLE_PERSON_RE = re.compile(
+    rf'(?P<role>(?i:{ROLES}))(?:\s+(?i:of|at|в|из|компании)\s+(?P<company>{ORGANIZATION}))?\s*(?:,|-|–|—)?\s*(?P<name>{NAME})'
+)
+COMPANY_RES = [
+    re.compile(r'(?:ООО|АО|ПАО|ЗАО|НКО)\s+[«"“](?P<company>[^»"”]{2,60})[»"”]'),
+    re.compile(rf'(?P<company>{ORGANIZATION})\s+(?:Inc|LLC|Ltd|Corp|GmbH|Labs)\b\.?')
+]
+PROJECT_RE = re.compile(r'(?i:проект[а-я]*|project)\s+[«"“](?P<name>[^»"”]{2,80})[»"”]')
+
+LEVEL_KEYWORDS = [
+    ('EXPERT', ['principal', 'distinguished', 'chief', 'head of', 'professor', 'профессор', 'эксперт', 'руководител']),
+    ('SENIOR', ['senior', 'lead', 'staff', 'старш', 'ведущ', 'тимлид']),
+    ('JUNIOR', ['junior', 'intern', 'стажер', 'стажёр', 'младш', 'начинающ'])
+]
+
+# Разбор считается уверенным, если совпадений не меньше LOCAL_MIN_MATCHES и не меньше одного на столько слов
+WORDS_PER_MATCH = 50
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+class AhoCorasick:
+    """Автомат Ахо-Корасик: все вхождения словаря за один проход по тексту
+
+    Совпадение засчитывается только по границам слов, из пересекающихся выбирается самое длинное.
+    """
+
+    def __init__(self, patterns: Dict[str, Any]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        for pattern, value in patterns.items():
+            self._add(pattern, value)
+        self._build()
+
+    def _add(self, pattern: str, value: Any):
+        state = 0
+        for char in pattern:
+            if char not in self._goto[state]:
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = len(self._goto) - 1
+            state = self._goto[state][char]
+        self._output[state].append((len(pattern), value))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, child in self._goto[state].items():
+                queue.append(child)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(char, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def find(self, text: str) -> List[Tuple[int, int, Any]]:
+        """(начало, конец, значение) найденных слов; text должен быть в нижнем регистре"""
+        matches = []
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self._goto[state]:
+                state = self._fail[state]
+            state = self._goto[state].get(char, 0)
+            for length, value in self._output[state]:
+                start, end = index - length + 1, index + 1
+                if (start == 0 or not _is_word_char(text[start - 1])) and \
+                        (end == len(text) or not _is_word_char(text[end])):
+                    matches.append((start, end, value))
+
+        matches.sort(key=lambda match: (match[0], match[0] - match[1]))
+        selected, covered = [], 0
+        for start, end, value in matches:
+            if start >= covered:
+                selected.append((start, end, value))
+                covered = end
+        return selected
+
+class UserVocabulary:
+    """Словарь одного пользователя: базовые термины плюс навыки, имена и компании его экспертов"""
+
+    def __init__(self, base_terms: Dict[str, Tuple[str, str, Optional[str]]], base_automaton: AhoCorasick):
+        self._base_terms = base_terms
+        self.terms: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        self.automaton = base_automaton
+        self.last_person_id = 0
+
+    def add(self, term: str, kind: str) -> bool:
+        term = ' '.join(str(term or '').split())
+        key = term.lower()
+        # Словарные термины важнее пользовательских; слишком короткие и числовые не берем
+        if len(key) < 2 or len(key) > 60 or key.isdigit() or key in self._base_terms or key in self.terms:
+            return False
+        self.terms[key] = (kind, term, None)
+        return True
+
+    def rebuild(self):
+        self.automaton = AhoCorasick({**self._base_terms, **self.terms})
+
+class LocalExtractor:
+    """Извлечение навыков и сущностей без LLM
+
+    Словарь автомата - курируемый список технологий и компаний, общий для всех, плюс навыки,
+    имена и компании экспертов того пользователя, чей текст анализируется (у каждого
+    пользователя свой автомат, дополняется инкрементально по id). Имена с должностями,
+    юрлица и проекты в кавычках находятся регулярными выражениями. Результат в той же
+    JSON-структуре, что и у промптов G4FAnalyzer; при малом числе совпадений возвращается
+    None, и текст уходит в LLM.
+    """
+
+    SUPPORTED = ('skill_extraction', 'entity_extraction')
+
+    def __init__(self):
+        self._terms: Dict[str, Tuple[str, str, Optional[str]]] = {}
+        for canonical, (domain, aliases) in TECH_DICTIONARY.items():
+            for alias in aliases + [canonical.lower()]:
+                self._terms[alias] = ('technology', canonical, domain)
+        for company in KNOWN_COMPANIES:
+            self._terms.setdefault(company.lower(), ('company', company, None))
+        self._automaton = AhoCorasick(self._terms)
+        self._users: Dict[str, UserVocabulary] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def refresh(self, telegram_id: str, rows: Iterable[List[Tuple[int, str, str, list]]] = None) -> int:
+        """Добавляет в словарь пользователя экспертов, появившихся после прошлого обновления; возвращает число новых терминов"""
+        telegram_id = str(telegram_id)
+        with self._lock:
+            vocabulary = self._users.get(telegram_id)
+            if vocabulary is None:
+                vocabulary = self._users[telegram_id] = UserVocabulary(self._terms, self._automaton)
+            added = 0
+            if rows is None:
+                rows = db.get_vocabulary_since(telegram_id, vocabulary.last_person_id)
+            for batch in rows:
+                for person_id, name, company, skills in batch:
+                    vocabulary.last_person_id = max(vocabulary.last_person_id, person_id)
+                    # Имя без фамилии слишком часто совпадает случайно
+                    if name and len(name.split()) >= 2:
+                        added += vocabulary.add(name, 'person')
+                    added += vocabulary.add(company, 'company')
+                    for skill in skills or []:
+                        added += vocabulary.add(skill, 'technology')
+            if added:
+                vocabulary.rebuild()
+                logger.info(f"Local extraction vocabulary of user {telegram_id}: "
+                            f"{len(self._terms) + len(vocabulary.terms)} terms (+{added})")
+            return added
+
+    def forget(self, telegram_id: str):
+        """Сбрасывает словарь пользователя (после очистки базы он строится заново)"""
+        with self._lock:
+            self._users.pop(str(telegram_id), None)
+
+    def _automaton_for(self, telegram_id: Optional[str]) -> AhoCorasick:
+        vocabulary = self._users.get(str(telegram_id)) if telegram_id is not None else None
+        return vocabulary.automaton if vocabulary else self._automaton
+
+    def _matches(self, text: str, telegram_id: Optional[str]) -> Dict[str, Counter]:
+        found = {'technology': Counter(), 'company': Counter(), 'person': Counter(), 'domain': Counter()}
+        for _, _, (kind, canonical, domain) in self._automaton_for(telegram_id).find(text.lower()):
+            found[kind][canonical] += 1
+            if domain:
+                found['domain'][domain] += 1
+        return found
+
+    @staticmethod
+    def _confident(matches: int, text: str) -> bool:
+        required = max(settings.LOCAL_MIN_MATCHES, len(text.split()) // WORDS_PER_MATCH)
+        return matches >= required
+
+    @staticmethod
+    def _confidence(matches: int) -> float:
+        return round(min(1.0, 0.5 + 0.1 * matches), 2)
+
+    @staticmethod
+    def _experience_level(text: str) -> str:
+        lowered = text.lower()
+        for level, keywords in LEVEL_KEYWORDS:
+            if any(keyword in lowered for keyword in keywords):
+                return level
+        return 'MID'
+
+    def _skills(self, text: str, telegram_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        found = self._matches(text, telegram_id)
+        skills = list(found['technology'])
+        if not self._confident(len(skills), text):
+            return None
+        domains = [domain for domain, _ in found['domain'].most_common()]
+        return {
+            'technical_skills': skills,
+            'domains': domains,
+            'experience_level': self._experience_level(text),
+            'specializations': [domain for domain, count in found['domain'].most_common(3) if count >= 2],
+            'confidence': self._confidence(len(skills)),
+            'source': 'local'
+        }
+
+    def _entities(self, text: str, telegram_id: Optional[str]) -> Optional[Dict[str, Any]]:
+        found = self._matches(text, telegram_id)
+        people: Dict[str, Dict[str, str]] = {name: {'name': name, 'role': '', 'company': ''} for name in found['person']}
+        companies = list(found['company'])
+        for pattern in (PERSON_ROLE_RE, ROLE_PERSON_RE):
+            for match in pattern.finditer(text):
+                person = people.setdefault(match['name'], {'name': match['name'], 'role': '', 'company': ''})
+                person['role'] = person['role'] or match['role'].strip()
+                if match['company']:
+                    person['company'] = person['company'] or match['company'].strip()
+                    if person['company'] not in companies:
+                        companies.append(person['company'])
+        for pattern in COMPANY_RES:
+            for match in pattern.finditer(text):
+                company = match['company'].strip()
+                if company not in companies:
+                    companies.append(company)
+
+        technologies = list(found['technology'])
+        if not self._confident(len(technologies) + len(companies) + len(people), text):
+            return None
+        return {
+            'people': list(people.values()),
+            'projects': [{'name': match['name'].strip(), 'description': ''} for match in PROJECT_RE.finditer(text)],
+            'technologies': technologies,
+            'companies': companies,
+            'key_topics': [domain for domain, _ in found['domain'].most_common(5)],
+            'confidence': self._confidence(len(technologies) + len(companies) + len(people)),
+            'source': 'local'
+        }
+
+    def extract(self, text: str, analysis_type: str, telegram_id: str = None) -> Optional[Dict[str, Any]]:
+        """Результат анализа без LLM или None, если тип не поддерживается или уверенность низкая
+
+        Термины экспертов берутся только из базы владельца текста telegram_id; без него - только общий словарь.
+        """
+        if analysis_type not in self.SUPPORTED or not text:
+            return None
+        if analysis_type == 'skill_extraction':
+            result = self._skills(text, telegram_id)
+        else:
+            result = self._entities(text, telegram_id)
+        if result is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return result
+
+    def stats(self) -> Dict[str, int]:
+        return {'terms': len(self._terms), 'users': len(self._users),
+                'user_terms': sum(len(vocabulary.terms) for vocabulary in self._users.values()),
+                'local': self.hits, 'llm': self.misses}
+
+local_extractor = LocalExtractor()
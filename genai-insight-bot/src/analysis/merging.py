@@ -0,0 +1,81 @@
+from collections import Counter
+from typing import Any, Callable, Dict, List
+
+# Порядок значений шкал: при объединении блоков берется максимум
+LEVELS = {
+    'experience_level': ['JUNIOR', 'MID', 'SENIOR', 'EXPERT'],
+    'potential_impact': ['LOW', 'MEDIUM', 'HIGH'],
+    'urgency': ['LOW', 'MEDIUM', 'HIGH']
+}
+MAX_LIST_ITEMS = 20
+
+def _union(values: List[Any], key: Callable[[Any], Any] = None) -> List[Any]:
+    """Объединение списков без повторов с сохранением порядка появления"""
+    merged, seen = [], {}
+    for items in values:
+        for item in items if isinstance(items, list) else []:
+            marker = key(item) if key else str(item).strip().lower()
+            if not marker:
+                continue
+            if marker not in seen:
+                seen[marker] = dict(item) if isinstance(item, dict) else item
+                merged.append(seen[marker])
+            elif isinstance(item, dict) and isinstance(seen[marker], dict):
+                # Тот же человек или проект из другого блока дополняет пустые поля
+                for field, value in item.items():
+                    if value and not seen[marker].get(field):
+                        seen[marker][field] = value
+    return merged[:MAX_LIST_ITEMS]
+
+def _vote(values: List[Any], weights: List[int]) -> Any:
+    """Значение с наибольшим суммарным весом (весом блока служит число его токенов)"""
+    votes = Counter()
+    for value, weight in zip(values, weights):
+        if isinstance(value, str) and value:
+            votes[value] += weight
+    return votes.most_common(1)[0][0] if votes else ''
+
+def _highest(field: str, values: List[Any]) -> Any:
+    scale = LEVELS[field]
+    ranked = [value for value in values if value in scale]
+    return max(ranked, key=scale.index) if ranked else _vote(values, [1] * len(values))
+
+def _mean(values: List[Any], weights: List[int]) -> Any:
+    pairs = [(float(value), weight) for value, weight in zip(values, weights) if isinstance(value, (int, float))]
+    if not pairs:
+        return None
+    return round(sum(value * weight for value, weight in pairs) / sum(weight for _, weight in pairs), 2)
+
+def _by_name(item: Any) -> Any:
+    return str(item.get('name', '')).strip().lower() if isinstance(item, dict) else str(item).strip().lower()
+
+def merge_results(analysis_type: str, results: List[Dict[str, Any]], weights: List[int]) -> Dict[str, Any]:
+    """Объединяет результаты анализа блоков одного длинного текста в результат той же структуры
+
+    Списки объединяются без повторов, шкалы (уровень, влияние, срочность) - по максимуму,
+    категории - голосованием с весом блока, числа - взвешенным средним (importance_score - максимумом).
+    """
+    if len(results) == 1:
+        return results[0]
+    if analysis_type == 'trend_detection':
+        from .trends import merge_trends
+        return merge_trends(results)
+
+    merged: Dict[str, Any] = {}
+    fields = []
+    for result in results:
+        fields.extend(field for field in result if field not in fields)
+    for field in fields:
+        values = [result.get(field) for result in results]
+        present = [value for value in values if value is not None]
+        if field in LEVELS:
+            merged[field] = _highest(field, present)
+        elif any(isinstance(value, list) for value in present):
+            merged[field] = _union(present, _by_name if field in ('people', 'projects') else None)
+        elif field == 'importance_score':
+            merged[field] = max((value for value in present if isinstance(value, (int, float))), default=None)
+        elif any(isinstance(value, (int, float)) for value in present):
+            merged[field] = _mean(values, weights)
+        else:
+            merged[field] = _vote(values, weights)
+    return merged
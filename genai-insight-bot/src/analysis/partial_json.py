@@ -0,0 +1,59 @@
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+# Сколько точек обрезки пробовать с конца: дальше ответ уже был разобран на предыдущих токенах
+MAX_REPAIRS = 8
+
+def parse_partial_json(text: str) -> Optional[Dict[str, Any]]:
+    """Разбирает первый JSON-объект из недописанного ответа модели
+
+    Недописанная строка закрывается, открытые массивы и объекты - тоже; если хвост не
+    складывается в значение (ключ без значения, 'tru'), он отрезается до последней запятой.
+    Возвращает None, пока в тексте нет ни одного разбираемого префикса объекта.
+    """
+    start = text.find('{')
+    if start < 0:
+        return None
+    text = text[start:]
+
+    stack: List[str] = []
+    cuts: List[Tuple[int, Tuple[str, ...]]] = []
+    in_string = escaped = False
+    for index, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"':
+            in_string = True
+        elif char in '{[':
+            stack.append('}' if char == '{' else ']')
+            cuts.append((index + 1, tuple(stack)))
+        elif char in '}]':
+            if stack:
+                stack.pop()
+            if not stack:
+                # Объект завершен, текст после него не нужен
+                try:
+                    result = json.loads(text[:index + 1])
+                except json.JSONDecodeError:
+                    return None
+                return result if isinstance(result, dict) else None
+        elif char == ',':
+            cuts.append((index, tuple(stack)))
+
+    tail = text[:-1] if escaped else text
+    candidates = [(tail + ('"' if in_string else ''), tuple(stack))]
+    candidates.extend((text[:cut], closing) for cut, closing in reversed(cuts[-MAX_REPAIRS:]))
+    for body, closing in candidates:
+        try:
+            result = json.loads(body + ''.join(reversed(closing)))
+        except json.JSONDecodeError:
+            continue
+        if isinstance(result, dict):
+            return result
+    return None
@@ -0,0 +1,244 @@
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, List, Optional, Tuple
+from monitoring.metrics import registry
+from monitoring.tracing import span
+from .llm_backends import LLMBackend
+
+logger = logging.getLogger(__name__)
+
+BACKEND_SECONDS = registry.histogram(
+    'llm_backend_duration_seconds', 'Время запроса к LLM-бэкенду', ['backend', 'status'])
+
+class BackendStats:
+    """Rolling latency and error statistics of one backend for one analysis type"""
+
+    ALPHA = 0.2  # Вес нового наблюдения в EWMA
+
+    def __init__(self, window: int = 200):
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.samples: Deque[float] = deque(maxlen=window)
+        self.last_attempt = 0.0
+
+    def record(self, latency: float, ok: bool):
+        self.last_attempt = time.monotonic()
+        self.error_rate = (1 - self.ALPHA) * self.error_rate + self.ALPHA * (0.0 if ok else 1.0)
+        if ok:
+            self.latency = latency if self.latency is None else (1 - self.ALPHA) * self.latency + self.ALPHA * latency
+            self.samples.append(latency)
+
+    def p95(self) -> Optional[float]:
+        if len(self.samples) < LatencyRouter.MIN_SAMPLES:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+class LatencyRouter:
+    """Routing of LLM calls to the fastest healthy backend with optional hedging
+
+    Для каждой пары (тип анализа, бэкенд) хранится EWMA задержки и доли ошибок.
+    Запрос идет в бэкенд с наименьшей EWMA среди здоровых; бэкенд с долей ошибок выше
+    порога пропускается, пока не пройдет cooldown - тогда на него уходит пробный запрос.
+    Хеджирование: если ответ не пришел за p95 задержки основного бэкенда, дублирующий
+    запрос уходит в следующий бэкенд; первый успешный ответ побеждает, второй отменяется.
+    """
+
+    ERROR_THRESHOLD = 0.5
+    COOLDOWN = 30.0
+    EXPLORE = 0.05  # Доля запросов в случайный здоровый бэкенд, чтобы статистика не устаревала
+    MIN_SAMPLES = 20
+
+    def __init__(self, backends: List[LLMBackend], hedge_delay: float = 2.0, seed: int = None):
+        self.backends = backends
+        self.hedge_delay = hedge_delay
+        self._stats: Dict[Tuple[str, int], BackendStats] = {}
+        self._random = random.Random(seed)
+        self.hedges_sent = 0
+        self.hedges_won = 0
+
+    def stats(self, analysis_type: str, index: int) -> BackendStats:
+        key = (analysis_type, index)
+        if key not in self._stats:
+            self._stats[key] = BackendStats()
+        return self._stats[key]
+
+    def ranking(self, analysis_type: str) -> List[int]:
+        """Индексы доступных бэкендов от лучшего к худшему"""
+        now = time.monotonic()
+        candidates = [index for index, backend in enumerate(self.backends) if backend.available]
+
+        def score(index: int) -> Tuple[int, float]:
+            stats = self.stats(analysis_type, index)
+            unhealthy = stats.error_rate > self.ERROR_THRESHOLD and now - stats.last_attempt < self.COOLDOWN
+            # Бэкенд без замеров пробуем первым, чтобы получить его задержку
+            return (1 if unhealthy else 0, stats.latency if stats.latency is not None else 0.0)
+
+        ranked = sorted(candidates, key=score)
+        if len(ranked) > 1 and self._random.random() < self.EXPLORE:
+            healthy = [index for index in ranked if score(index)[0] == 0]
+            if len(healthy) > 1:
+                explored = self._random.choice(healthy[1:])
+                ranked.remove(explored)
+                ranked.insert(0, explored)
+        return ranked
+
+    async def _attempt(self, analysis_type: str, index: int, prompt: str) -> str:
+        started = time.monotonic()
+        label = self.backends[index].label
+        try:
+            with span('llm.backend', backend=label):
+                response = await self.backends[index].complete(prompt)
+        except asyncio.CancelledError:
+            # Проигравший хедж-запрос - не ошибка бэкенда
+            BACKEND_SECONDS.observe(time.monotonic() - started, backend=label, status='cancelled')
+            raise
+        except Exception:
+            self.stats(analysis_type, index).record(time.monotonic() - started, ok=False)
+            BACKEND_SECONDS.observe(time.monotonic() - started, backend=label, status='error')
+            raise
+        self.stats(analysis_type, index).record(time.monotonic() - started, ok=True)
+        BACKEND_SECONDS.observe(time.monotonic() - started, backend=label, status='ok')
+        return response
+
+    async def complete(self, prompt: str, analysis_type: str, hedge: bool = False) -> str:
+        ranked = self.ranking(analysis_type)
+        if not ranked:
+            raise RuntimeError('No LLM backend is available')
+
+        if not hedge:
+            last_error = None
+            # Без хеджирования ошибка основного бэкенда переводит запрос на следующий
+            for index in ranked:
+                try:
+                    return await self._attempt(analysis_type, index, prompt)
+                except Exception as e:
+                    last_error = e
+            raise last_error
+
+        primary = ranked[0]
+        # Единственный бэкенд хеджируется повторным запросом в него же
+        secondary = ranked[1] if len(ranked) > 1 else primary
+        delay = self.stats(analysis_type, primary).p95() or self.hedge_delay
+
+        tasks = [asyncio.ensure_future(self._attempt(analysis_type, primary, prompt))]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done or tasks[0].exception() is not None:
+                self.hedges_sent += 1
+                tasks.append(asyncio.ensure_future(self._attempt(analysis_type, secondary, prompt)))
+
+            pending = set(tasks)
+            last_error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if len(tasks) > 1 and task is tasks[1]:
+                            self.hedges_won += 1
+                        return task.result()
+                    last_error = task.exception()
+            raise last_error
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def stream(self, prompt: str, analysis_type: str) -> AsyncIterator[str]:
+        """Потоковый ответ лучшего бэкенда; до первого фрагмента ошибка переводит запрос на следующий"""
+        ranked = self.ranking(analysis_type)
+        if not ranked:
+            raise RuntimeError('No LLM backend is available')
+        last_error = None
+        for index in ranked:
+            started = time.monotonic()
+            received = False
+            try:
+                async for chunk in self.backends[index].stream(prompt):
+                    received = True
+                    yield chunk
+            except Exception as e:
+                self.stats(analysis_type, index).record(time.monotonic() - started, ok=False)
+                if received:
+                    raise
+                last_error = e
+                continue
+            self.stats(analysis_type, index).record(time.monotonic() - started, ok=True)
+            return
+        raise last_error
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        return {
+            f"{analysis_type}/{self.backends[index].label}": {
+                'latency_ewma': stats.latency or 0.0,
+                'error_ewma': stats.error_rate,
+                'p95': stats.p95() or 0.0
+            }
+            for (analysis_type, index), stats in self._stats.items()
+        }
+
+class SimulatedBackend(LLMBackend):
+    """Backend with a lognormal latency distribution and error rate for routing experiments"""
+
+    def __init__(self, name: str, median: float, sigma: float, error_rate: float = 0.0, seed: int = 0):
+        self.name = name
+        self.model = name
+        self.median = median
+        self.sigma = sigma
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self.requests = 0
+
+    async def complete(self, prompt: str) -> str:
+        self.requests += 1
+        latency = self.median * self._random.lognormvariate(0, self.sigma)
+        await asyncio.sleep(latency)
+        if self._random.random() < self.error_rate:
+            raise RuntimeError(f'{self.name} failed')
+        return '{"sentiment": "NEUTRAL"}'
+
+async def simulate(policy: str, requests: int = 400, concurrency: int = 20, seed: int = 1) -> Dict[str, float]:
+    """Прогоняет запросы через симулированные бэкенды: fixed - всегда первый, route - по EWMA,
+    hedge - по EWMA с хеджированием. Задержки в секундах, масштаб уменьшен в 10 раз"""
+    backends = [
+        SimulatedBackend('slow-tail', median=0.05, sigma=1.2, seed=seed),        # быстрый в среднем, тяжелый хвост
+        SimulatedBackend('steady', median=0.08, sigma=0.2, seed=seed + 1),
+        SimulatedBackend('flaky', median=0.03, sigma=0.3, error_rate=0.6, seed=seed + 2)
+    ]
+    router = LatencyRouter(backends, hedge_delay=0.2, seed=seed)
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one():
+        nonlocal errors
+        async with semaphore:
+            started = time.monotonic()
+            try:
+                if policy == 'fixed':
+                    await backends[0].complete('prompt')
+                else:
+                    await router.complete('prompt', 'sentiment_analysis', hedge=policy == 'hedge')
+                latencies.append(time.monotonic() - started)
+            except Exception:
+                errors += 1
+
+    await asyncio.gather(*(one() for _ in range(requests)))
+    ordered = sorted(latencies)
+    return {
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p95_ms': ordered[int(len(ordered) * 0.95)] * 1000,
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        'errors': errors,
+        'backend_requests': sum(backend.requests for backend in backends),
+        'hedges_sent': router.hedges_sent,
+        'hedges_won': router.hedges_won
+    }
+
+if __name__ == '__main__':
+    for policy in ('fixed', 'route', 'hedge'):
+        result = asyncio.run(simulate(policy))
+        print(f"{policy:>6}: " + ' '.join(f"{key}={value:.0f}" for key, value in result.items()))
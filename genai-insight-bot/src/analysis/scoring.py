@@ -0,0 +1,133 @@
+from database.operations import db
+from database.models import normalize_name
+from datetime import datetime
+from typing import Dict, List, Set
+import logging
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class ExpertScorer:
+    """Предрасчитанные оценки экспертов по осям диаграммы сравнения
+
+    Навыки - число уникальных навыков, Проекты - число проектов, Публикации - число
+    записей в Publication, Опыт - проекты и публикации вместе, Влияние - степень узла
+    в графе общих навыков. Все оси - перцентили по базе пользователя на шкале 0-10.
+    """
+
+    AXES = ['skills_score', 'experience_score', 'projects_score', 'publications_score', 'influence_score']
+
+    def __init__(self):
+        self.db = db
+        # Версия данных пользователя, по которой посчитаны сохраненные оценки
+        self._versions: Dict[str, str] = {}
+        # refresh вызывается из потоков (импорт и /compare), пересчет одного и того же не дублируется
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _skill_keys(person) -> Set[str]:
+        return {skill.lower().strip() for skill in (person.skills or []) if skill.strip()}
+
+    @staticmethod
+    def _percentiles(values: np.ndarray) -> np.ndarray:
+        """Перцентильный ранг (с учетом равных значений) на шкале 0-10; нулевые метрики остаются нулем"""
+        if not len(values):
+            return values.astype(float)
+        ordered = np.sort(values)
+        below = np.searchsorted(ordered, values, side='left')
+        equal = np.searchsorted(ordered, values, side='right') - below
+        ranks = (below + 0.5 * equal) / len(values) * 10
+        return np.where(values > 0, np.round(ranks, 1), 0.0)
+
+    def refresh(self, telegram_id: str, full: bool = False) -> int:
+        """Пересчитывает оценки, если данные пользователя изменились; возвращает число новых экспертов
+
+        Степень узла досчитывается инкрементально только для новых экспертов, а счетчики
+        публикаций и перцентили всех осей пересчитываются при любом изменении версии данных -
+        импорт одних публикаций тоже меняет оси Публикации и Опыт.
+        """
+        with self._lock:
+            return self._refresh(telegram_id, full)
+
+    def _refresh(self, telegram_id: str, full: bool) -> int:
+        version = self.db.get_dataset_version(telegram_id)
+        if not full and self._versions.get(telegram_id) == version:
+            return 0
+
+        people = self.db.get_all_people(telegram_id)
+        stored = self.db.get_expert_scores(telegram_id)
+        current_ids = {person.id for person in people}
+
+        # Удаленные эксперты меняют степени соседей - такой случай пересчитываем целиком
+        if full or any(person_id not in current_ids for person_id in stored):
+            stored = {}
+
+        new_people = [person for person in people if person.id not in stored]
+
+        # Инкрементальная степень узла: старые связи не меняются, новые эксперты добавляют ребра
+        degrees = {person_id: score.centrality or 0 for person_id, score in stored.items()}
+        postings: Dict[str, Set[int]] = {}
+        for person in people:
+            if person.id in stored:
+                for skill in self._skill_keys(person):
+                    postings.setdefault(skill, set()).add(person.id)
+
+        for person in new_people:
+            skills = self._skill_keys(person)
+            neighbors = set()
+            for skill in skills:
+                neighbors.update(postings.get(skill, ()))
+            neighbors.discard(person.id)
+
+            degrees[person.id] = len(neighbors)
+            for neighbor in neighbors:
+                degrees[neighbor] += 1
+            for skill in skills:
+                postings.setdefault(skill, set()).add(person.id)
+
+        publication_counts = self.db.get_publication_counts(telegram_id)
+
+        skills_count = np.array([len(self._skill_keys(p)) for p in people])
+        projects_count = np.array([len(p.projects or []) for p in people])
+        publications_count = np.array([publication_counts.get(normalize_name(p.name), 0) for p in people])
+        centrality = np.array([degrees[p.id] for p in people])
+
+        axes = {
+            'skills_score': self._percentiles(skills_count),
+            'experience_score': self._percentiles(projects_count + publications_count),
+            'projects_score': self._percentiles(projects_count),
+            'publications_score': self._percentiles(publications_count),
+            'influence_score': self._percentiles(centrality)
+        }
+
+        now = datetime.utcnow()
+        rows = []
+        for i, person in enumerate(people):
+            row = {
+                'person_id': person.id,
+                'skills_count': int(skills_count[i]),
+                'projects_count': int(projects_count[i]),
+                'publications_count': int(publications_count[i]),
+                'centrality': int(centrality[i]),
+                'updated_at': now
+            }
+            row.update({axis: float(values[i]) for axis, values in axes.items()})
+            rows.append(row)
+
+        self.db.replace_expert_scores(telegram_id, rows)
+        self._versions[telegram_id] = version
+        logger.info(f"Expert scores refreshed for user {telegram_id}: {len(new_people)} new of {len(people)}")
+        return len(new_people)
+
+    def get_scores(self, telegram_id: str, person_ids: List[int]) -> Dict[int, Dict[str, float]]:
+        """Возвращает оценки экспертов по осям, предварительно пересчитав их при изменении данных"""
+        self.refresh(telegram_id)
+        scores = self.db.get_expert_scores(telegram_id, person_ids)
+
+        return {
+            person_id: {axis: getattr(score, axis) or 0 for axis in self.AXES}
+            for person_id, score in scores.items()
+        }
+
+expert_scorer = ExpertScorer()
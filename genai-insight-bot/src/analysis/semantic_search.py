@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import re
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from config.settings import settings
+from database.operations import db
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"[\w+#]+", re.UNICODE)
+_PHRASE_SEPARATORS = re.compile(r"[,;|\n]")
+
+
+class HashedNgramEmbedder:
+    """Офлайн-векторизатор: хешированные слова, символьные n-граммы и аббревиатуры"""
+
+    def __init__(self, dim: int = 1024, ngram_range: Tuple[int, int] = (3, 4)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> Dict[str, float]:
+        """Разбивает текст на взвешенные признаки"""
+        features = {}
+
+        for phrase in _PHRASE_SEPARATORS.split(text.lower()):
+            words = _WORD_RE.findall(phrase)
+            if not words:
+                continue
+
+            for word in words:
+                features[f"w:{word}"] = features.get(f"w:{word}", 0.0) + 1.0
+
+                padded = f"#{word}#"
+                for n in range(self.ngram_range[0], self.ngram_range[1] + 1):
+                    for i in range(len(padded) - n + 1):
+                        key = f"c:{padded[i:i + n]}"
+                        features[key] = features.get(key, 0.0) + 0.35
+
+            # Аббревиатура фразы: "large language models" -> "llm"
+            if len(words) >= 2:
+                # Вес аббревиатуры равен весу всей фразы, иначе короткий запрос тонет в n-граммах
+                acronym = "".join(word[0] for word in words)
+                features[f"w:{acronym}"] = features.get(f"w:{acronym}", 0.0) + len(words)
+                # И форма множественного числа: "large language models" -> "llms"
+                if words[-1].endswith('s'):
+                    features[f"w:{acronym}s"] = features.get(f"w:{acronym}s", 0.0) + len(words) / 2
+
+        return features
+
+    def embed(self, text: str) -> np.ndarray:
+        """Возвращает L2-нормализованный вектор float32"""
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature, weight in self._features(text or "").items():
+            h = zlib.crc32(feature.encode('utf-8'))
+            sign = 1.0 if (h >> 16) & 1 else -1.0
+            vector[h % self.dim] += sign * weight
+
+        norm = np.linalg.norm(vector)
+        if norm > 0:
+            vector /= norm
+        return vector
+
+    def embed_many(self, texts: List[str]) -> np.ndarray:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.embed(text)
+        return matrix
+
+
+class VectorStore:
+    """Хранит эмбеддинги экспертов пользователя в memory-mapped float32 матрице"""
+
+    def __init__(self, base_dir: str):
+        self.base_dir = base_dir
+
+    def _paths(self, telegram_id: str) -> Tuple[str, str]:
+        base = os.path.join(self.base_dir, str(telegram_id))
+        return f"{base}.f32", f"{base}.json"
+
+    def load(self, telegram_id: str) -> Tuple[Optional[np.memmap], Optional[Dict]]:
+        matrix_path, meta_path = self._paths(telegram_id)
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return None, None
+
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+
+        if not meta['ids']:
+            return np.zeros((0, meta['dim']), dtype=np.float32), meta
+
+        matrix = np.memmap(matrix_path, dtype=np.float32, mode='r', shape=(len(meta['ids']), meta['dim']))
+        return matrix, meta
+
+    def save(self, telegram_id: str, matrix: np.ndarray, meta: Dict) -> Optional[np.memmap]:
+        os.makedirs(self.base_dir, exist_ok=True)
+        matrix_path, meta_path = self._paths(telegram_id)
+
+        # Пишем во временные файлы и атомарно подменяем, чтобы не отдать читателю половину матрицы
+        tmp_matrix_path = f"{matrix_path}.tmp"
+        tmp_meta_path = f"{meta_path}.tmp"
+
+        if len(matrix):
+            mm = np.memmap(tmp_matrix_path, dtype=np.float32, mode='w+', shape=matrix.shape)
+            mm[:] = matrix
+            mm.flush()
+            del mm
+        else:
+            open(tmp_matrix_path, 'wb').close()
+
+        with open(tmp_meta_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+
+        os.replace(tmp_matrix_path, matrix_path)
+        os.replace(tmp_meta_path, meta_path)
+
+        return self.load(telegram_id)[0]
+
+
+class IVFIndex:
+    """Приближенный поиск ближайших соседей: инвертированные списки поверх сферического k-means"""
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8, iterations: int = 10, seed: int = 42):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.iterations = iterations
+        self.seed = seed
+        self.centroids = None
+        self.lists: List[np.ndarray] = []
+        self.matrix = None
+
+    def build(self, matrix: np.ndarray) -> 'IVFIndex':
+        self.matrix = matrix
+        n_rows = len(matrix)
+        n_lists = self.n_lists or max(1, int(np.sqrt(n_rows)))
+        n_lists = min(n_lists, n_rows)
+
+        rng = np.random.default_rng(self.seed)
+        # Обучаем квантизатор на подвыборке, чтобы не гонять k-means по всей матрице
+        sample_size = min(n_rows, n_lists * 64)
+        sample = np.asarray(matrix[rng.choice(n_rows, sample_size, replace=False)])
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(self.iterations):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assignment == c]
+                if len(members):
+                    centroid = members.sum(axis=0)
+                    norm = np.linalg.norm(centroid)
+                    if norm > 0:
+                        centroids[c] = centroid / norm
+
+        self.centroids = centroids.astype(np.float32)
+
+        assignment = np.empty(n_rows, dtype=np.int64)
+        batch = 4096
+        for start in range(0, n_rows, batch):
+            block = np.asarray(matrix[start:start + batch])
+            assignment[start:start + batch] = np.argmax(block @ self.centroids.T, axis=1)
+
+        order = np.argsort(assignment, kind='stable')
+        bounds = np.searchsorted(assignment[order], np.arange(n_lists + 1))
+        self.lists = [order[bounds[c]:bounds[c + 1]] for c in range(n_lists)]
+        return self
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        n_probe = min(self.n_probe, len(self.lists))
+        probe = np.argpartition(-(self.centroids @ query), n_probe - 1)[:n_probe]
+        # Сортировка строк делает чтение memmap последовательным
+        candidates = np.sort(np.concatenate([self.lists[c] for c in probe]))
+        if not len(candidates):
+            return candidates, np.array([], dtype=np.float32)
+
+        scores = np.asarray(self.matrix[candidates]) @ query
+        return _top_k(candidates, scores, k)
+
+
+def _top_k(indices: np.ndarray, scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    k = min(k, len(scores))
+    if k == 0:
+        return indices[:0], scores[:0]
+    top = np.argpartition(-scores, k - 1)[:k]
+    top = top[np.argsort(-scores[top])]
+    return indices[top], scores[top]
+
+
+def exact_search(matrix: np.ndarray, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Точный поиск полным перебором (эталон для оценки recall)"""
+    scores = np.asarray(matrix) @ query
+    return _top_k(np.arange(len(scores)), scores, k)
+
+
+class SemanticSearch:
+    """Семантический поиск экспертов по профилю: навыки, проекты, должность, публикации"""
+
+    # Ниже этого размера базы точный перебор быстрее построения индекса
+    ANN_MIN_ROWS = 1000
+
+    def __init__(self, dim: int = 1024, min_similarity: float = 0.12):
+        self.db = db
+        self.embedder = HashedNgramEmbedder(dim=dim)
+        self.store = VectorStore(settings.VECTOR_STORE_DIR)
+        self.min_similarity = min_similarity
+        self._cache: Dict[str, Tuple[str, np.ndarray, List[int], Optional[IVFIndex]]] = {}
+
+    def _profile_text(self, person, publications: List[str]) -> str:
+        parts = [person.position or '']
+        parts.extend(person.skills or [])
+        parts.extend(person.projects or [])
+        parts.extend(publications)
+        return "\n".join(part for part in parts if part)
+
+    def _build_matrix(self, telegram_id: str) -> Tuple[np.ndarray, List[int]]:
+        people = self.db.get_all_people(telegram_id)
+        publications_by_expert: Dict[str, List[str]] = {}
+        for publication in self.db.get_user_publications(telegram_id):
+            if publication.content:
+                publications_by_expert.setdefault(publication.expert_name, []).append(publication.content)
+
+        texts = [self._profile_text(p, publications_by_expert.get(p.name, [])) for p in people]
+        return self.embedder.embed_many(texts), [p.id for p in people]
+
+    def _get_index(self, telegram_id: str) -> Tuple[np.ndarray, List[int], Optional[IVFIndex]]:
+        version = self.db.get_dataset_version(telegram_id)
+        cached = self._cache.get(telegram_id)
+        if cached and cached[0] == version:
+            return cached[1], cached[2], cached[3]
+
+        matrix, meta = self.store.load(telegram_id)
+        if meta is None or meta.get('version') != version or meta.get('dim') != self.embedder.dim:
+            matrix, ids = self._build_matrix(telegram_id)
+            matrix = self.store.save(telegram_id, matrix, {'version': version, 'dim': self.embedder.dim, 'ids': ids})
+            logger.info(f"Rebuilt semantic vectors for user {telegram_id}: {len(ids)} experts")
+        else:
+            ids = meta['ids']
+
+        index = IVFIndex().build(matrix) if len(ids) >= self.ANN_MIN_ROWS else None
+        self._cache[telegram_id] = (version, matrix, ids, index)
+        return matrix, ids, index
+
+    def search(self, telegram_id: str, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Возвращает [(person_id, similarity)] для k ближайших профилей"""
+        matrix, ids, index = self._get_index(telegram_id)
+        if not ids:
+            return []
+
+        query_vector = self.embedder.embed(query)
+        if index is not None:
+            rows, scores = index.search(query_vector, k)
+        else:
+            rows, scores = exact_search(matrix, query_vector, k)
+
+        return [
+            (ids[row], float(score))
+            for row, score in zip(rows, scores)
+            if score >= self.min_similarity
+        ]
+
+    def invalidate(self, telegram_id: str):
+        self._cache.pop(telegram_id, None)
+
+
+def benchmark_recall(n_rows: int = 10000, n_queries: int = 200, k: int = 10, n_probe: int = 8, seed: int = 0) -> Dict[str, float]:
+    """Сравнивает IVF-индекс с точным поиском на синтетических профилях: recall@k и задержка"""
+    rng = np.random.default_rng(seed)
+    # Профили группируются вокруг тематик, как реальные базы экспертов
+    topics = [[f"topic{t} skill{i}" for i in range(30)] for t in range(100)]
+    embedder = HashedNgramEmbedder()
+
+    profiles = []
+    for _ in range(n_rows):
+        topic = topics[rng.integers(len(topics))]
+        profiles.append(", ".join(rng.choice(topic, 6, replace=False)))
+    queries = []
+    for _ in range(n_queries):
+        topic = topics[rng.integers(len(topics))]
+        queries.append(", ".join(rng.choice(topic, 3, replace=False)))
+    matrix = embedder.embed_many(profiles)
+
+    started = time.perf_counter()
+    index = IVFIndex(n_probe=n_probe).build(matrix)
+    build_time = time.perf_counter() - started
+
+    hits = 0
+    exact_time = ann_time = 0.0
+    for query in queries:
+        vector = embedder.embed(query)
+
+        started = time.perf_counter()
+        _, exact_scores = exact_search(matrix, vector, k)
+        exact_time += time.perf_counter() - started
+
+        started = time.perf_counter()
+        _, ann_scores = index.search(vector, k)
+        ann_time += time.perf_counter() - started
+
+        # Совпадения по score, а не по id: при равных score любой из кандидатов корректен
+        hits += int(np.sum(ann_scores >= exact_scores[-1] - 1e-6))
+
+    return {
+        'rows': n_rows,
+        f'recall@{k}': hits / (n_queries * k),
+        'build_seconds': build_time,
+        'exact_ms_per_query': exact_time / n_queries * 1000,
+        'ann_ms_per_query': ann_time / n_queries * 1000,
+    }
+
+
+semantic_search = SemanticSearch()
+
+if __name__ == '__main__':
+    for probe in (4, 8, 16):
+        print(f"n_probe={probe}: {benchmark_recall(n_probe=probe)}")
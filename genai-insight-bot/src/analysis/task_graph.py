@@ -0,0 +1,112 @@
+import asyncio
+import inspect
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class TaskNode:
+    def __init__(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str], timeout: Optional[float]):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.timeout = timeout
+
+class TaskGraph:
+    """Асинхронный граф задач: независимые этапы выполняются параллельно
+
+    Этап стартует, как только завершились все его зависимости, и получает их результаты
+    словарем {имя: результат}. Одновременно выполняется не больше concurrency этапов;
+    тайм-аут ограничивает время самого этапа, без ожидания в очереди. Ошибка или тайм-аут
+    этапа не прерывают граф: зависящие от него этапы пропускаются (статус skipped),
+    остальные доводятся до конца.
+    """
+
+    def __init__(self, concurrency: int = 4, default_timeout: Optional[float] = None):
+        self.concurrency = concurrency
+        self.default_timeout = default_timeout
+        self._nodes: Dict[str, TaskNode] = {}
+
+    def add(self, name: str, func: Callable[[Dict[str, Any]], Any], deps: Iterable[str] = (),
+            timeout: Optional[float] = None) -> 'TaskGraph':
+        if name in self._nodes:
+            raise ValueError(f"Task '{name}' is already in the graph")
+        self._nodes[name] = TaskNode(name, func, deps, timeout if timeout is not None else self.default_timeout)
+        return self
+
+    def _order(self) -> List[str]:
+        """Топологический порядок; неизвестная зависимость или цикл - ошибка построения графа"""
+        order, state = [], {}
+
+        def visit(name: str, path: List[str]):
+            if state.get(name) == 'done':
+                return
+            if state.get(name) == 'visiting':
+                raise ValueError(f"Cycle in task graph: {' -> '.join(path + [name])}")
+            if name not in self._nodes:
+                raise ValueError(f"Unknown dependency '{name}' of task '{path[-1]}'")
+            state[name] = 'visiting'
+            for dep in self._nodes[name].deps:
+                visit(dep, path + [name])
+            state[name] = 'done'
+            order.append(name)
+
+        for name in self._nodes:
+            visit(name, [])
+        return order
+
+    async def run(self) -> Dict[str, Any]:
+        """Возвращает results (успешные этапы), errors и timings по этапам, total - время всего графа"""
+        order = self._order()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results: Dict[str, Any] = {}
+        errors: Dict[str, str] = {}
+        timings: Dict[str, Dict[str, Any]] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+        started = time.monotonic()
+
+        async def run_node(node: TaskNode):
+            if node.deps:
+                await asyncio.gather(*(tasks[dep] for dep in node.deps))
+            failed = [dep for dep in node.deps if dep not in results]
+            if failed:
+                errors[node.name] = f"skipped: failed dependencies {', '.join(failed)}"
+                timings[node.name] = {'status': 'skipped', 'start': round(time.monotonic() - started, 3),
+                                      'duration': 0.0, 'queued': 0.0}
+                return
+
+            ready = time.monotonic()
+            async with semaphore:
+                begin = time.monotonic()
+                status = 'ok'
+                try:
+                    value = node.func({dep: results[dep] for dep in node.deps})
+                    if inspect.isawaitable(value):
+                        value = await asyncio.wait_for(value, timeout=node.timeout)
+                    results[node.name] = value
+                except asyncio.TimeoutError:
+                    status = 'timeout'
+                    errors[node.name] = f'timed out after {node.timeout}s'
+                except Exception as e:
+                    status = 'error'
+                    errors[node.name] = str(e) or e.__class__.__name__
+                    logger.warning(f"Task '{node.name}' failed: {errors[node.name]}")
+                end = time.monotonic()
+            timings[node.name] = {'status': status, 'start': round(begin - started, 3),
+                                  'duration': round(end - begin, 3), 'queued': round(begin - ready, 3)}
+
+        for name in order:
+            tasks[name] = asyncio.ensure_future(run_node(self._nodes[name]))
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                task.cancel()
+
+        return {
+            'results': results,
+            'errors': errors,
+            'timings': {name: timings[name] for name in order},
+            'total': round(time.monotonic() - started, 3)
+        }
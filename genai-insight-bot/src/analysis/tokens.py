@@ -0,0 +1,83 @@
+import math
+import re
+from typing import List
+
+# Грубая оценка без токенизатора: ~4 символа на токен для смеси русского и английского
+CHARS_PER_TOKEN = 4
+
+# Приближение BPE-токенизаторов (cl100k и похожих): английское слово - ~4 символа на токен,
+# кириллица и прочие алфавиты дробятся мельче, цифры - группами по 3, знаки препинания - по одному
+_PIECE_RE = re.compile(r'[A-Za-z]+|\d+|[^\W\d_]+|[^\w\s]', re.UNICODE)
+_SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+|\n+')
+
+def estimate_tokens(text: str) -> int:
+    tokens = 0
+    for piece in _PIECE_RE.findall(text):
+        first = piece[0]
+        if first.isascii() and first.isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        elif first.isalpha():
+            tokens += math.ceil(len(piece) / 2.5)
+        else:
+            tokens += 1
+    return tokens + 1
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence for sentence in _SENTENCE_RE.split(text) if sentence.strip()]
+
+def _split_words(sentence: str, budget_tokens: int) -> List[str]:
+    """Предложение длиннее бюджета режется по словам"""
+    parts, current = [], []
+    used = 0
+    for word in sentence.split():
+        tokens = estimate_tokens(word)
+        if current and used + tokens > budget_tokens:
+            parts.append(' '.join(current))
+            current, used = [], 0
+        # Слово длиннее бюджета (base64, URL) режется по символам
+        while tokens > budget_tokens:
+            parts.append(word[:budget_tokens * 2])
+            word = word[budget_tokens * 2:]
+            tokens = estimate_tokens(word)
+        current.append(word)
+        used += tokens
+    if current:
+        parts.append(' '.join(current))
+    return parts
+
+def chunk_text(text: str, budget_tokens: int) -> List[str]:
+    """Делит текст на блоки не больше budget_tokens по границам предложений"""
+    if estimate_tokens(text) <= budget_tokens:
+        return [text]
+    chunks, current = [], []
+    used = 0
+    for sentence in split_sentences(text):
+        pieces = [sentence] if estimate_tokens(sentence) <= budget_tokens else _split_words(sentence, budget_tokens)
+        for piece in pieces:
+            tokens = estimate_tokens(piece)
+            if current and used + tokens > budget_tokens:
+                chunks.append(' '.join(current))
+                current, used = [], 0
+            current.append(piece)
+            used += tokens
+    if current:
+        chunks.append(' '.join(current))
+    return chunks
+
+def truncate_text(text: str, budget_tokens: int) -> str:
+    """Начало текста в пределах бюджета, обрезанное по границе предложения"""
+    if estimate_tokens(text) <= budget_tokens:
+        return text
+    kept = []
+    used = 0
+    for sentence in split_sentences(text):
+        tokens = estimate_tokens(sentence)
+        if used + tokens > budget_tokens:
+            if not kept:
+                kept.append(_split_words(sentence, budget_tokens)[0])
+            break
+        kept.append(sentence)
+        used += tokens
+    return ' '.join(kept)
@@ -0,0 +1,184 @@
+import asyncio
+import logging
+import random
+import re
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+from database.operations import db
+from config.settings import settings
+from .tokens import estimate_tokens, truncate_text
+
+from .g4f_analyzer import analyzer
+
+logger = logging.getLogger(__name__)
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+_STOP_WORDS = {'and', 'of', 'the', 'in', 'for', 'to', 'on', 'a', 'и', 'в', 'на', 'для', 'с', 'по', 'от'}
+
+def chunk_texts(texts: List[str], budget_tokens: int) -> List[List[str]]:
+    """Жадно упаковывает тексты в блоки не больше budget_tokens; длинный текст обрезается"""
+    chunks: List[List[str]] = []
+    current: List[str] = []
+    used = 0
+    for text in texts:
+        text = truncate_text(text, budget_tokens)
+        tokens = estimate_tokens(text)
+        if current and used + tokens > budget_tokens:
+            chunks.append(current)
+            current, used = [], 0
+        current.append(text)
+        used += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+def _trend_key(name: str) -> frozenset:
+    """Множество основ слов названия: первые 6 букв сглаживают окончания и множественное число"""
+    return frozenset(word[:6] for word in _WORD_RE.findall(name.lower()) if word not in _STOP_WORDS)
+
+def _similar(a: frozenset, b: frozenset) -> bool:
+    if not a or not b:
+        return a == b
+    return len(a & b) / len(a | b) >= 0.5 or a <= b or b <= a
+
+def merge_trends(partials: List[Dict[str, Any]], top_n: int = 10) -> Dict[str, Any]:
+    """Reduce: объединяет списки трендов блоков локальной кластеризацией названий и подсчетом"""
+    clusters: List[Dict[str, Any]] = []
+    declining = Counter()
+    predictions = Counter()
+    display: Dict[str, str] = {}
+
+    for partial in partials:
+        for trend in partial.get('emerging_trends') or []:
+            if not isinstance(trend, dict) or not str(trend.get('trend_name', '')).strip():
+                continue
+            name = str(trend['trend_name']).strip()
+            key = _trend_key(name)
+            cluster = next((c for c in clusters if _similar(c['key'], key)), None)
+            if cluster is None:
+                cluster = {'key': key, 'names': Counter(), 'mentions': 0, 'momentum': [],
+                           'evidence': [], 'key_players': Counter()}
+                clusters.append(cluster)
+            cluster['names'][name] += 1
+            cluster['mentions'] += 1
+            try:
+                cluster['momentum'].append(float(trend.get('momentum')))
+            except (TypeError, ValueError):
+                pass
+            for evidence in trend.get('evidence') or []:
+                if evidence and evidence not in cluster['evidence']:
+                    cluster['evidence'].append(evidence)
+            cluster['key_players'].update(str(player).strip() for player in trend.get('key_players') or [] if player)
+
+        for field, counter in (('declining_trends', declining), ('predictions', predictions)):
+            for item in partial.get(field) or []:
+                item = str(item).strip()
+                if item:
+                    counter[item.lower()] += 1
+                    display.setdefault(item.lower(), item)
+
+    trends = []
+    for cluster in clusters:
+        momentum = sum(cluster['momentum']) / len(cluster['momentum']) if cluster['momentum'] else 5.0
+        trends.append({
+            'trend_name': cluster['names'].most_common(1)[0][0],
+            'mentions': cluster['mentions'],
+            'momentum': round(momentum, 1),
+            'evidence': cluster['evidence'][:3],
+            'key_players': [player for player, _ in cluster['key_players'].most_common(5)]
+        })
+    # Тренд, замеченный в нескольких блоках, важнее единичного с высоким momentum
+    trends.sort(key=lambda trend: (trend['mentions'] * trend['momentum'], trend['mentions']), reverse=True)
+
+    return {
+        'emerging_trends': trends[:top_n],
+        'declining_trends': [display[item] for item, _ in declining.most_common(5)],
+        'predictions': [display[item] for item, _ in predictions.most_common(5)]
+    }
+
+class TrendEngine:
+    """Map-reduce выявление трендов по всем публикациям пользователя
+
+    Map: корпус режется на блоки по бюджету токенов, блоки анализируются LLM параллельно
+    (не больше TREND_CONCURRENCY запросов). Reduce: частичные списки трендов
+    объединяются локально. Число запросов ограничено TREND_MAX_CALLS: если корпус больше,
+    анализируется равномерная выборка публикаций. Результат кэшируется по версии данных.
+    """
+
+    def __init__(self):
+        self.db = db
+        self._cache: Dict[str, Tuple[str, Dict]] = {}
+
+    @property
+    def available(self) -> bool:
+        return analyzer.available
+
+    def _corpus(self, telegram_id: str) -> List[str]:
+        texts = []
+        seen = set()
+        for publication in self.db.get_user_publications(telegram_id):
+            content = (publication.content or '').strip()
+            if not content or content.lower() in seen:
+                continue
+            seen.add(content.lower())
+            texts.append(f"[{publication.expert_name}] {truncate_text(content, settings.TREND_CHUNK_TOKENS)}")
+        return texts
+
+    @staticmethod
+    def _sample(texts: List[str], budget_tokens: int, seed: str) -> List[str]:
+        """Равномерная выборка текстов в пределах бюджета с сохранением исходного порядка"""
+        if sum(estimate_tokens(text) for text in texts) <= budget_tokens:
+            return texts
+        order = list(range(len(texts)))
+        random.Random(seed).shuffle(order)
+        chosen, used = [], 0
+        for index in order:
+            tokens = estimate_tokens(texts[index])
+            if used + tokens > budget_tokens:
+                continue
+            chosen.append(index)
+            used += tokens
+        return [texts[index] for index in sorted(chosen)]
+
+    async def detect(self, telegram_id: str) -> Dict[str, Any]:
+        if not self.available:
+            raise RuntimeError(f"LLM backends are unavailable: {analyzer.backend_names}")
+
+        version = await asyncio.to_thread(self.db.get_dataset_version, telegram_id)
+        cached = self._cache.get(telegram_id)
+        if cached and cached[0] == version:
+            return cached[1]
+
+        corpus = await asyncio.to_thread(self._corpus, telegram_id)
+        # Блок не должен превышать бюджет промпта, иначе анализатор разделит его еще раз
+        budget = min(settings.TREND_CHUNK_TOKENS, analyzer.input_budget('trend_detection'))
+        sample = self._sample(corpus, budget * settings.TREND_MAX_CALLS, version)
+        chunks = chunk_texts(sample, budget)[:settings.TREND_MAX_CALLS]
+
+        semaphore = asyncio.Semaphore(settings.TREND_CONCURRENCY)
+
+        async def map_chunk(chunk: List[str]) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                result = await analyzer.analyze_text("\n".join(chunk), 'trend_detection', hedge=True)
+            if not isinstance(result, dict) or 'error' in result or 'raw_response' in result:
+                return None
+            return result
+
+        partials = await asyncio.gather(*(map_chunk(chunk) for chunk in chunks))
+        succeeded = [partial for partial in partials if partial]
+
+        result = merge_trends(succeeded)
+        result.update({
+            'publications': len(corpus),
+            'analyzed': sum(len(chunk) for chunk in chunks),
+            'chunks': len(chunks),
+            'failed_chunks': len(chunks) - len(succeeded)
+        })
+        # Прогон с ошибками не кэшируем, чтобы следующий запрос повторил анализ
+        if not result['failed_chunks']:
+            self._cache[telegram_id] = (version, result)
+        logger.info(f"Trends for user {telegram_id}: {len(chunks)} chunks, "
+                    f"{result['analyzed']}/{len(corpus)} publications, {result['failed_chunks']} failed")
+        return result
+
+trend_engine = TrendEngine()
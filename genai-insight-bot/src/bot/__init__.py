@@ -3,6 +3,7 @@ Bot module for Telegram bot functionality
 """
 
 from .bot import GenAIBot
+from .concurrency import KeyedUpdateProcessor
 from .handlers import setup_handlers
 
-__all__ = ['GenAIBot', 'setup_handlers']
\ No newline at end of file
+__all__ = ['GenAIBot', 'KeyedUpdateProcessor', 'setup_handlers']
\ No newline at end of file
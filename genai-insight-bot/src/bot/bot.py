@@ -1,7 +1,17 @@
 import logging
+import signal
+import ssl
+from telegram import Update
 from telegram.ext import Application
 from config.settings import settings
+from analysis.enrichment import publication_enricher
+from analysis.g4f_analyzer import analyzer
+from monitoring.metrics import MetricsServer
+from .concurrency import KeyedUpdateProcessor
 from .handlers import setup_handlers
+from .instrumentation import TracedRequest
+from .import_queue import import_queue
+from .webhook import WebhookServer
 import asyncio
 
 logger = logging.getLogger(__name__)
@@ -9,7 +19,30 @@ logger = logging.getLogger(__name__)
 class GenAIBot:
     def __init__(self):
         self.token = settings.BOT_TOKEN
-        self.application = Application.builder().token(self.token).build()
+        self.mode = settings.BOT_MODE
+        
+        builder = (
+            Application.builder()
+            .token(self.token)
+            .base_url(settings.TELEGRAM_API_URL)
+            .base_file_url(settings.TELEGRAM_FILE_URL)
+            # Разные пользователи обрабатываются параллельно, один пользователь - по порядку
+            .concurrent_updates(KeyedUpdateProcessor(
+                settings.MAX_CONCURRENT_UPDATES, settings.MAX_PENDING_UPDATES
+            ))
+        )
+        if self.mode == 'webhook':
+            # Обновления приходят через собственный aiohttp-сервер, Updater не нужен
+            builder = builder.updater(None)
+        if settings.TRACING_ENABLED:
+            # Тот же пул, что PTB создает по умолчанию, но вызовы Bot API попадают в трассу обновления
+            builder = builder.request(TracedRequest(connection_pool_size=256))
+        self.application = builder.build()
+        self.webhook_server = None
+        self.metrics_server = None
+        if settings.METRICS_ENABLED:
+            self.metrics_server = MetricsServer(settings.METRICS_LISTEN, settings.METRICS_PORT)
+        self._stop_event = asyncio.Event()
         
         # Setup handlers
         setup_handlers(self.application)
@@ -19,9 +52,17 @@ class GenAIBot:
         try:
             await self.application.initialize()
             await self.application.start()
-            await self.application.updater.start_polling()
+            await import_queue.start(self.application.bot)
+            await publication_enricher.start()
+            if self.metrics_server:
+                await self.metrics_server.start()
+            
+            if self.mode == 'webhook':
+                await self._start_webhook()
+            else:
+                await self.application.updater.start_polling()
             
-            logger.info("🤖 GenAI Insight Bot started successfully!")
+            logger.info(f"🤖 GenAI Insight Bot started successfully! Mode: {self.mode}")
             
             # Keep the bot running
             await self._keep_alive()
@@ -30,16 +71,79 @@ class GenAIBot:
             logger.error(f"Failed to start bot: {e}")
             raise
     
+    async def _start_webhook(self):
+        """Start the aiohttp webhook listener and register it in Telegram"""
+        if not settings.WEBHOOK_URL:
+            raise ValueError("WEBHOOK_URL is required when BOT_MODE=webhook")
+        
+        ssl_context = None
+        if settings.WEBHOOK_CERT and settings.WEBHOOK_KEY:
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(settings.WEBHOOK_CERT, settings.WEBHOOK_KEY)
+        
+        self.webhook_server = WebhookServer(
+            self.application,
+            path=settings.WEBHOOK_PATH,
+            listen=settings.WEBHOOK_LISTEN,
+            port=settings.WEBHOOK_PORT,
+            secret_token=settings.WEBHOOK_SECRET,
+            ssl_context=ssl_context
+        )
+        await self.webhook_server.start()
+        
+        certificate = open(settings.WEBHOOK_CERT, 'rb') if ssl_context else None
+        try:
+            await self.application.bot.set_webhook(
+                url=settings.WEBHOOK_URL.rstrip('/') + self.webhook_server.path,
+                certificate=certificate,
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS,
+                secret_token=settings.WEBHOOK_SECRET,
+                allowed_updates=Update.ALL_TYPES
+            )
+        finally:
+            if certificate:
+                certificate.close()
+    
     async def _keep_alive(self):
-        """Keep the bot running"""
+        """Keep the bot running until SIGINT/SIGTERM"""
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self._stop_event.set)
+            except NotImplementedError:
+                # Windows: остается KeyboardInterrupt
+                pass
+        
         try:
-            while True:
-                await asyncio.sleep(86400)  # Sleep for 1 day
-        except KeyboardInterrupt:
+            await self._stop_event.wait()
+        finally:
             await self.stop()
     
     async def stop(self):
-        """Stop the bot"""
-        await self.application.stop()
+        """Stop the bot gracefully: stop intake, drain queued updates, shut down"""
+        if self.webhook_server:
+            # Пока очередь дорабатывается, новые обновления получают 503 и Telegram повторит их позже;
+            # webhook в Telegram не удаляем: недоставленные обновления дождутся перезапуска
+            self.webhook_server.stop_accepting()
+        elif self.application.updater and self.application.updater.running:
+            await self.application.updater.stop()
+        
+        try:
+            await asyncio.wait_for(self.application.update_queue.join(), timeout=settings.SHUTDOWN_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Pending updates were not processed within {settings.SHUTDOWN_TIMEOUT}s")
+        if self.webhook_server:
+            await self.webhook_server.stop()
+        
+        # Незавершенные импорты продолжатся с последнего закоммиченного блока при следующем запуске
+        await import_queue.stop()
+        await publication_enricher.stop()
+        # Закрываем пул HTTP-соединений LLM-бэкенда
+        await analyzer.close()
+        if self.metrics_server:
+            await self.metrics_server.stop()
+        
+        if self.application.running:
+            await self.application.stop()
         await self.application.shutdown()
-        logger.info("Bot stopped")
\ No newline at end of file
+        logger.info("Bot stopped")
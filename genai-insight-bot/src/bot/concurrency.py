@@ -0,0 +1,159 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Dict, Hashable, List, Optional
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor, SimpleUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Параллельная обработка обновлений с сохранением порядка внутри одного пользователя
+
+    Обновления разных пользователей выполняются одновременно (не более max_workers),
+    обновления одного пользователя - строго по очереди, поэтому состояние
+    ConversationHandler не ломается. Семафор базового класса ограничивает число
+    обновлений в работе и в ожидании (max_pending) - это обратное давление на очередь.
+    """
+
+    def __init__(self, max_workers: int, max_pending: Optional[int] = None):
+        super().__init__(max(max_pending or 0, max_workers))
+        self.max_workers = max_workers
+        self._workers = asyncio.BoundedSemaphore(max_workers)
+        # Ключ -> [блокировка, число обновлений ключа в работе или ожидании]
+        self._locks: Dict[Hashable, List[Any]] = {}
+
+    @staticmethod
+    def update_key(update: object) -> Optional[Hashable]:
+        """Ключ упорядочивания: пользователь, иначе чат; None - порядок не важен"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return ('user', update.effective_user.id)
+            if update.effective_chat:
+                return ('chat', update.effective_chat.id)
+        return None
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = self.update_key(update)
+        if key is None:
+            async with self._workers:
+                await coroutine
+            return
+
+        entry = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        entry[1] += 1
+        try:
+            # Сначала очередь пользователя, затем слот исполнителя: ожидающие обновления
+            # одного пользователя не занимают исполнителей, нужных другим
+            async with entry[0]:
+                async with self._workers:
+                    await coroutine
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    @property
+    def pending_keys(self) -> int:
+        return len(self._locks)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+def _synthetic_update(update_id: int, user_id: int) -> Update:
+    return Update.de_json({
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': user_id, 'type': 'private'},
+            'from': {'id': user_id, 'is_bot': False, 'first_name': f'user{user_id}'},
+            'text': f'message {update_id}'
+        }
+    }, None)
+
+async def replay(processor: BaseUpdateProcessor, updates: int = 2000, users: int = 200,
+                 slow_share: float = 0.05, fast_ms: float = 5, slow_ms: float = 500,
+                 rate: float = 400, seed: int = 42) -> Dict[str, float]:
+    """Прогоняет синтетические обновления через процессор так же, как Application._update_fetcher
+
+    Обработчик имитирует ожидание ввода-вывода: обычные сообщения - fast_ms,
+    доля slow_share (загрузки файлов, графики, LLM) - slow_ms. Задержка считается
+    от поступления обновления до завершения его обработчика.
+    """
+    rng = random.Random(seed)
+    latencies: List[float] = []
+    last_seen: Dict[int, int] = {}
+    in_flight: Dict[int, int] = {}
+    order_violations = 0
+
+    async def handler(update: Update, received: float, duration: float):
+        nonlocal order_violations
+        user_id = update.effective_user.id
+        # Нарушение - обгон более раннего обновления или наложение на еще не завершенное
+        if last_seen.get(user_id, -1) > update.update_id or in_flight.get(user_id):
+            order_violations += 1
+        last_seen[user_id] = update.update_id
+        in_flight[user_id] = in_flight.get(user_id, 0) + 1
+        await asyncio.sleep(duration)
+        in_flight[user_id] -= 1
+        latencies.append(time.perf_counter() - received)
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        # Обновления поступают независимо от скорости обработки (открытая модель нагрузки)
+        for update_id in range(updates):
+            update = _synthetic_update(update_id, rng.randrange(users))
+            duration = (slow_ms if rng.random() < slow_share else fast_ms) / 1000
+            await queue.put((update, time.perf_counter(), duration))
+            await asyncio.sleep(rng.expovariate(rate))
+
+    async def fetch():
+        tasks = []
+        for _ in range(updates):
+            update, received, duration = await queue.get()
+            coroutine = handler(update, received, duration)
+            if processor.max_concurrent_updates > 1:
+                tasks.append(asyncio.create_task(processor.process_update(update, coroutine)))
+            else:
+                await processor.process_update(update, coroutine)
+        await asyncio.gather(*tasks)
+
+    await processor.initialize()
+    started = time.perf_counter()
+    await asyncio.gather(produce(), fetch())
+    await processor.shutdown()
+
+    ordered = sorted(latencies)
+    return {
+        'updates': updates,
+        'p50_ms': ordered[len(ordered) // 2] * 1000,
+        'p99_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'elapsed_s': time.perf_counter() - started,
+        'order_violations': order_violations
+    }
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Нагрузочный тест обработки обновлений')
+    parser.add_argument('--updates', type=int, default=1000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--rate', type=float, default=200, help='обновлений в секунду')
+    args = parser.parse_args()
+
+    params = dict(updates=args.updates, users=args.users, rate=args.rate)
+    for title, processor in (
+        ('sequential', SimpleUpdateProcessor(1)),
+        (f'keyed x{args.workers}', KeyedUpdateProcessor(args.workers, args.workers * 32))
+    ):
+        stats = asyncio.run(replay(processor, **params))
+        print(f"{title:>12}: p50={stats['p50_ms']:.1f}ms p99={stats['p99_ms']:.1f}ms "
+              f"max={stats['max_ms']:.1f}ms elapsed={stats['elapsed_s']:.1f}s "
+              f"order_violations={stats['order_violations']}")
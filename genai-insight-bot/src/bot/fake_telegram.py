@@ -0,0 +1,172 @@
+import asyncio
+import json
+import logging
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from aiohttp import ClientSession, web
+from telegram.ext import Application
+from .handlers import setup_handlers
+from .webhook import WebhookServer
+
+TEST_TOKEN = '123456:TEST'
+TEST_SECRET = 'webhook-check-secret'
+
+class FakeTelegramAPI:
+    """Локальная заглушка Bot API: отвечает на getMe, setWebhook, deleteWebhook и sendMessage
+
+    Все вызовы сохраняются в calls, отправленные сообщения - в messages, поэтому бота в режиме
+    webhook можно проверить без Telegram: TELEGRAM_API_URL=http://127.0.0.1:<порт>/bot
+    """
+
+    def __init__(self, listen: str = '127.0.0.1', port: int = 0):
+        self.listen = listen
+        self.port = port
+        self.calls: List[Dict[str, Any]] = []
+        self.messages: List[Dict[str, Any]] = []
+        self.webhook: Dict[str, Any] = {}
+        self._message_id = 0
+        self._runner: Optional[web.AppRunner] = None
+
+        self.app = web.Application()
+        self.app.router.add_post('/bot{token}/{method}', self._handle)
+
+    @property
+    def base_url(self) -> str:
+        return f'http://{self.listen}:{self.port}/bot'
+
+    async def _params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == 'application/json':
+            return await request.json()
+        params = {}
+        for key, value in (await request.post()).items():
+            # Вложенные объекты (reply_markup, allowed_updates) PTB передает строкой JSON
+            try:
+                params[key] = json.loads(value) if isinstance(value, str) else value
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        params = await self._params(request) if request.can_read_body else {}
+        self.calls.append({'method': method, 'params': params})
+
+        if method == 'getMe':
+            result: Any = {'id': int(TEST_TOKEN.split(':')[0]), 'is_bot': True,
+                           'first_name': 'Fake Bot', 'username': 'fake_bot'}
+        elif method == 'setWebhook':
+            self.webhook = params
+            result = True
+        elif method == 'deleteWebhook':
+            self.webhook = {}
+            result = True
+        elif method == 'sendMessage':
+            self._message_id += 1
+            result = {'message_id': self._message_id, 'date': int(time.time()),
+                      'chat': {'id': int(params['chat_id']), 'type': 'private'}, 'text': str(params.get('text', ''))}
+            self.messages.append(result)
+        else:
+            return web.json_response({'ok': False, 'error_code': 404, 'description': f'Not Found: {method}'},
+                                     status=404)
+        return web.json_response({'ok': True, 'result': result})
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port)
+        await site.start()
+        # Порт 0 - свободный порт, выбранный системой
+        self.port = self._runner.addresses[0][1]
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def wait_for_message(self, count: int, timeout: float = 5.0):
+        deadline = time.monotonic() + timeout
+        while len(self.messages) < count:
+            if time.monotonic() > deadline:
+                raise AssertionError(f'Expected {count} sent messages, got {len(self.messages)}')
+            await asyncio.sleep(0.05)
+
+def _command_update(update_id: int, text: str, chat_id: int = 42) -> Dict[str, Any]:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': text,
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+        }
+    }
+
+async def check_webhook() -> None:
+    """Прогоняет режим webhook против FakeTelegramAPI; при расхождении бросает AssertionError"""
+    api = FakeTelegramAPI()
+    await api.start()
+    application = (
+        Application.builder()
+        .token(TEST_TOKEN)
+        .base_url(api.base_url)
+        .base_file_url(api.base_url.replace('/bot', '/file/bot'))
+        .updater(None)
+        .build()
+    )
+    setup_handlers(application)
+    server = WebhookServer(application, '/telegram', '127.0.0.1', 0, secret_token=TEST_SECRET)
+    await application.initialize()
+    await application.start()
+    await server.start()
+    url = f'http://127.0.0.1:{server.port}{server.path}'
+
+    try:
+        await application.bot.set_webhook(url=url, secret_token=TEST_SECRET)
+        assert api.webhook.get('url') == url and api.webhook.get('secret_token') == TEST_SECRET, api.webhook
+
+        async with ClientSession() as session:
+            update = _command_update(1, '/help')
+            async with session.post(url, json=update) as response:
+                assert response.status == 403, f'missing secret: {response.status}'
+            async with session.post(url, json=update, headers={WebhookServer.SECRET_HEADER: 'wrong'}) as response:
+                assert response.status == 403, f'wrong secret: {response.status}'
+            assert not api.messages, 'rejected update reached the handlers'
+
+            signed = {WebhookServer.SECRET_HEADER: TEST_SECRET}
+            async with session.post(url, data='{not json', headers=signed) as response:
+                assert response.status == 400, f'malformed body: {response.status}'
+
+            async with session.post(url, json=update, headers=signed) as response:
+                assert response.status == 200, f'signed update: {response.status}'
+            await api.wait_for_message(1)
+            reply = api.messages[0]
+            assert reply['chat']['id'] == 42 and 'Помощь' in reply['text'], reply
+
+            # Остановка: сервер еще отвечает, но обновления отклоняются, чтобы Telegram их повторил
+            server.stop_accepting()
+            async with session.post(url, json=_command_update(2, '/help'), headers=signed) as response:
+                assert response.status == 503, f'while stopping: {response.status}'
+            async with session.get(f'http://127.0.0.1:{server.port}/healthz') as response:
+                assert (await response.json())['status'] == 'stopping'
+            await asyncio.sleep(0.2)
+            assert len(api.messages) == 1, 'update accepted while stopping'
+
+        await application.bot.delete_webhook()
+        assert not api.webhook
+    finally:
+        await server.stop()
+        await application.stop()
+        await application.shutdown()
+        await api.stop()
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        asyncio.run(check_webhook())
+    except AssertionError as e:
+        print(f'Webhook check failed: {e}', file=sys.stderr)
+        sys.exit(1)
+    print('Webhook check passed: secret rejection, handler round-trip, 503 while stopping')
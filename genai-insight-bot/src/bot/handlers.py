@@ -1,11 +1,26 @@
 from telegram import Update
 from telegram.ext import ContextTypes, CommandHandler, MessageHandler, filters, ConversationHandler
 import logging
-from utils.file_parser import file_parser
 from database.operations import db
 from utils.visualizer import visualizer
+from analysis.semantic_search import semantic_search
+from analysis.comparator import comparator
+from analysis.scoring import expert_scorer
+from analysis.graph import graph_analytics
+from analysis.trends import trend_engine
+from analysis.g4f_analyzer import analyzer
+from analysis.local_extractor import local_extractor
+from utils import columnar
+from utils.exporter import export_user_data, EXPORT_FORMATS
+from .import_queue import import_queue
+from .progressive import ProgressiveMessage
+from .instrumentation import instrument_handlers
+from monitoring.tracing import span
+from config.settings import settings
+import asyncio
 import tempfile
 import os
+import shutil
 from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove
 
 def get_main_keyboard():
@@ -73,6 +88,9 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 🔍 Поиск
 ⚖️ Сравнить
 📊 Статистика
+🔎 /similar [Имя] - похожие эксперты
+🔮 /trends - тренды по публикациям
+🧠 /analyze [текст] - анализ текста или сообщения, на которое вы ответили
 
 👇 Визуализации:
 📈 Визуализации - меню выбора графиков
@@ -83,6 +101,8 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 👇 Управление данными:
 📁 Загрузить данные 
+📤 /export [parquet|ndjson] - выгрузить базу
+🛑 /cancel - отменить фоновый импорт файла
 🛠 Очистка
 
 ❌ Отмена - вернуться в главное меню
@@ -172,6 +192,22 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 👔 **Основные должности:**
 {chr(10).join(f'• {position}: {count}' for position, count in top_positions)}
 """
+        # Аналитика сети: влияние, посредники и сообщества
+        try:
+            # Расчет метрик занимает процессор, поэтому выполняется вне цикла событий
+            network = await asyncio.to_thread(graph_analytics.analyze, telegram_id)
+            if network['edges']:
+                stats_text += f"""
+🕸 **Сеть экспертов:**
+• Связей: {network['edges']}
+• Сообществ: {network['communities_count']}
+• Самые влиятельные (PageRank): {', '.join(network['top_pagerank'][:3])}
+"""
+                if network['top_betweenness']:
+                    stats_text += f"• Связующие звенья: {', '.join(network['top_betweenness'][:3])}\n"
+        except Exception as e:
+            logger.error(f"Error computing graph analytics for user {telegram_id}: {e}")
+        
         # Добавляем предупреждение о дубликатах только если они есть
         if duplicate_count > 0:
             stats_text += f"\n⚠️ **Обнаружено {duplicate_count} дубликатов**\n💡 Используйте `/cleanup` для очистки"
@@ -189,6 +225,26 @@ async def stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup=get_main_keyboard()
         )
 
+def _write_temp_html(html: str) -> str:
+    """Сохраняет HTML графика во временный файл для отправки документом, возвращает путь"""
+    with span('tempfile.write', bytes=len(html)):
+        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
+            f.write(html)
+            return f.name
+
+async def _add_graph_metrics(telegram_id: str, people_data: list):
+    """Добавляет PageRank и сообщество из аналитики сети для размера и цвета узлов графа"""
+    try:
+        metrics = (await asyncio.to_thread(graph_analytics.analyze, telegram_id))['metrics']
+    except Exception as e:
+        logger.error(f"Error computing graph analytics for user {telegram_id}: {e}")
+        return
+    for person in people_data:
+        node = metrics.get(person['name'].lower().strip())
+        if node:
+            person['pagerank'] = node['pagerank']
+            person['community'] = node['community']
+
 async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     telegram_id = str(update.effective_user.id)
     """Рекомендует экспертов по заданной теме"""
@@ -226,95 +282,112 @@ async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return ConversationHandler.END
         
+        # Семантические кандидаты: находят "LLM" в "large language models" без словаря синонимов
+        semantic_scores = {}
+        if settings.SEMANTIC_SEARCH:
+            try:
+                semantic_scores = dict(semantic_search.search(telegram_id, topic, k=settings.SEMANTIC_TOP_K))
+            except Exception as e:
+                logger.error(f"Semantic search failed for user {telegram_id}: {e}")
+        
         # Улучшенный поиск экспертов по теме
         matched_experts = []
         seen_names = set()
         
-        for person in people:
-            # Пропускаем дубликаты
-            if person.name in seen_names:
-                continue
+        with span('recommend.scoring', candidates=len(people)) as scoring:
+            for person in people:
+                # Пропускаем дубликаты
+                if person.name in seen_names:
+                    continue
                 
-            score = 0
-            matches = []
+                score = 0
+                matches = []
             
-            # 1. Поиск по имени (точное совпадение)
-            if topic in person.name.lower():
-                score += 3
-                matches.append("имя")
+                # 1. Поиск по имени (точное совпадение)
+                if topic in person.name.lower():
+                    score += 3
+                    matches.append("имя")
             
-            # 2. Поиск по должности (частичное совпадение)
-            if person.position:
-                position_lower = person.position.lower()
-                # Точное совпадение
-                if topic in position_lower:
-                    score += 2
-                    matches.append("должность")
-                # Поиск по словам
-                elif any(word in position_lower for word in topic.split() if len(word) > 2):
-                    score += 1
-                    matches.append("должность")
+                # 2. Поиск по должности (частичное совпадение)
+                if person.position:
+                    position_lower = person.position.lower()
+                    # Точное совпадение
+                    if topic in position_lower:
+                        score += 2
+                        matches.append("должность")
+                    # Поиск по словам
+                    elif any(word in position_lower for word in topic.split() if len(word) > 2):
+                        score += 1
+                        matches.append("должность")
             
-            # 3. Поиск по компании (частичное совпадение)
-            if person.company:
-                company_lower = person.company.lower()
-                if topic in company_lower:
-                    score += 2
-                    matches.append("компания")
-                elif any(word in company_lower for word in topic.split() if len(word) > 2):
-                    score += 1
-                    matches.append("компания")
+                # 3. Поиск по компании (частичное совпадение)
+                if person.company:
+                    company_lower = person.company.lower()
+                    if topic in company_lower:
+                        score += 2
+                        matches.append("компания")
+                    elif any(word in company_lower for word in topic.split() if len(word) > 2):
+                        score += 1
+                        matches.append("компания")
             
-            # 4. Поиск по навыкам (расширенный)
-            skill_matches = []
-            for skill in person.skills:
-                skill_lower = skill.lower()
-                # Точное совпадение
-                if topic in skill_lower:
-                    skill_matches.append(skill)
-                    score += 2
-                # Поиск по словам
-                elif any(word in skill_lower for word in topic.split() if len(word) > 2):
-                    skill_matches.append(skill)
-                    score += 1
-                # Поиск по синонимам для популярных тем
-                elif await _check_skill_synonyms(topic, skill_lower):
-                    skill_matches.append(skill)
-                    score += 1
+                # 4. Поиск по навыкам (расширенный)
+                skill_matches = []
+                for skill in person.skills:
+                    skill_lower = skill.lower()
+                    # Точное совпадение
+                    if topic in skill_lower:
+                        skill_matches.append(skill)
+                        score += 2
+                    # Поиск по словам
+                    elif any(word in skill_lower for word in topic.split() if len(word) > 2):
+                        skill_matches.append(skill)
+                        score += 1
+                    # Поиск по синонимам для популярных тем
+                    elif await _check_skill_synonyms(topic, skill_lower):
+                        skill_matches.append(skill)
+                        score += 1
             
-            if skill_matches:
-                matches.append(f"навыки: {', '.join(skill_matches[:3])}")
+                if skill_matches:
+                    matches.append(f"навыки: {', '.join(skill_matches[:3])}")
             
-            # 5. Поиск по проектам (расширенный)
-            project_matches = []
-            for project in person.projects:
-                project_lower = project.lower()
-                if topic in project_lower:
-                    project_matches.append(project)
-                    score += 2
-                elif any(word in project_lower for word in topic.split() if len(word) > 2):
-                    project_matches.append(project)
-                    score += 1
+                # 5. Поиск по проектам (расширенный)
+                project_matches = []
+                for project in person.projects:
+                    project_lower = project.lower()
+                    if topic in project_lower:
+                        project_matches.append(project)
+                        score += 2
+                    elif any(word in project_lower for word in topic.split() if len(word) > 2):
+                        project_matches.append(project)
+                        score += 1
             
-            if project_matches:
-                matches.append(f"проекты: {', '.join(project_matches[:2])}")
+                if project_matches:
+                    matches.append(f"проекты: {', '.join(project_matches[:2])}")
             
-            # 6. Поиск по связанным темам
-            if score == 0:
-                # Проверяем связанные темы
-                related_score = await _check_related_topics(topic, person)
-                if related_score > 0:
-                    score = related_score
-                    matches.append("связанная тема")
+                # 6. Поиск по связанным темам
+                if score == 0:
+                    # Проверяем связанные темы
+                    related_score = await _check_related_topics(topic, person)
+                    if related_score > 0:
+                        score = related_score
+                        matches.append("связанная тема")
             
-            # Если нашли совпадения, добавляем эксперта (даже с низким score)
-            if score > 0:
-                matched_experts.append({
-                    'person': person,
-                    'score': score,
-                    'matches': matches
-                })
-                seen_names.add(person.name)
+                # 7. Семантическая близость профиля
+                similarity = semantic_scores.get(person.id)
+                if similarity:
+                    score += max(1, round(similarity * 3))
+                    matches.append(f"семантика ({similarity:.2f})")
+            
+                # Если нашли совпадения, добавляем эксперта (даже с низким score)
+                if score > 0:
+                    matched_experts.append({
+                        'person': person,
+                        'score': score,
+                        'matches': matches
+                    })
+                    seen_names.add(person.name)
+            if scoring:
+                scoring.set(matched=len(matched_experts))
         
         # Сортируем по релевантности
         matched_experts.sort(key=lambda x: x['score'], reverse=True)
@@ -343,9 +416,7 @@ async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 # 1. Визуализация рекомендаций (столбчатая диаграмма)
                 chart_html = visualizer.create_recommendations_chart(recommendations_data)
                 
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(chart_html)
-                    temp_file1 = f.name
+                temp_file1 = _write_temp_html(chart_html)
 
                 await update.message.reply_document(
                     document=open(temp_file1, 'rb'),
@@ -376,11 +447,10 @@ async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                                   people_data_for_graph[i]['company'] != 'Не указана'):
                                 connections.append((i, j))
                     
+                    await _add_graph_metrics(telegram_id, people_data_for_graph)
                     graph_html = visualizer.create_network_graph(people_data_for_graph, connections)
                     
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                        f.write(graph_html)
-                        temp_file2 = f.name
+                    temp_file2 = _write_temp_html(graph_html)
 
                     await update.message.reply_document(
                         document=open(temp_file2, 'rb'),
@@ -402,9 +472,7 @@ async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 if skills_data:
                     heatmap_html = visualizer.create_skills_heatmap(skills_data)
                     
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                        f.write(heatmap_html)
-                        temp_file3 = f.name
+                    temp_file3 = _write_temp_html(heatmap_html)
 
                     await update.message.reply_document(
                         document=open(temp_file3, 'rb'),
@@ -423,9 +491,7 @@ async def recommend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     })
                 
                 company_html = visualizer.create_company_distribution(company_data)
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(company_html)
-                    temp_file4 = f.name
+                temp_file4 = _write_temp_html(company_html)
 
                 await update.message.reply_document(
                     document=open(temp_file4, 'rb'),
@@ -693,55 +759,58 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         matched_experts = []
         seen_names = set()
         
-        for person in people:
-            if person.name in seen_names:
-                continue
+        with span('search.scoring', candidates=len(people)) as scoring:
+            for person in people:
+                if person.name in seen_names:
+                    continue
                 
-            score = 0
-            matches = []
+                score = 0
+                matches = []
             
-            # Поиск по имени
-            if query in person.name.lower():
-                score += 3
-                matches.append(f"имя: {person.name}")
+                # Поиск по имени
+                if query in person.name.lower():
+                    score += 3
+                    matches.append(f"имя: {person.name}")
             
-            # Поиск по должности
-            if person.position and query in person.position.lower():
-                score += 2
-                matches.append(f"должность: {person.position}")
+                # Поиск по должности
+                if person.position and query in person.position.lower():
+                    score += 2
+                    matches.append(f"должность: {person.position}")
             
-            # Поиск по компании
-            if person.company and query in person.company.lower():
-                score += 2
-                matches.append(f"компания: {person.company}")
+                # Поиск по компании
+                if person.company and query in person.company.lower():
+                    score += 2
+                    matches.append(f"компания: {person.company}")
             
-            # Поиск по навыкам
-            skill_matches = []
-            for skill in person.skills:
-                if query in skill.lower():
-                    skill_matches.append(skill)
-                    score += 1
+                # Поиск по навыкам
+                skill_matches = []
+                for skill in person.skills:
+                    if query in skill.lower():
+                        skill_matches.append(skill)
+                        score += 1
             
-            if skill_matches:
-                matches.append(f"навыки: {', '.join(skill_matches[:2])}")
+                if skill_matches:
+                    matches.append(f"навыки: {', '.join(skill_matches[:2])}")
             
-            # Поиск по проектам
-            project_matches = []
-            for project in person.projects:
-                if query in project.lower():
-                    project_matches.append(project)
-                    score += 1
+                # Поиск по проектам
+                project_matches = []
+                for project in person.projects:
+                    if query in project.lower():
+                        project_matches.append(project)
+                        score += 1
             
-            if project_matches:
-                matches.append(f"проекты: {', '.join(project_matches[:2])}")
+                if project_matches:
+                    matches.append(f"проекты: {', '.join(project_matches[:2])}")
             
-            if score > 0:
-                matched_experts.append({
-                    'person': person,
-                    'score': score,
-                    'matches': matches
-                })
-                seen_names.add(person.name)
+                if score > 0:
+                    matched_experts.append({
+                        'person': person,
+                        'score': score,
+                        'matches': matches
+                    })
+                    seen_names.add(person.name)
+            if scoring:
+                scoring.set(matched=len(matched_experts))
         
         # Сортируем по релевантности
         matched_experts.sort(key=lambda x: x['score'], reverse=True)
@@ -773,9 +842,7 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             try:
                 # 1. График результатов поиска
                 chart_html = visualizer.create_recommendations_chart(search_results_data)
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(chart_html)
-                    temp_file1 = f.name
+                temp_file1 = _write_temp_html(chart_html)
 
                 await update.message.reply_document(
                     document=open(temp_file1, 'rb'),
@@ -813,10 +880,9 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                                   people_data_for_graph[i]['position'] != 'Не указана'):
                                 connections.append((i, j))
                     
+                    await _add_graph_metrics(telegram_id, people_data_for_graph)
                     graph_html = visualizer.create_network_graph(people_data_for_graph, connections)
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                        f.write(graph_html)
-                        temp_file2 = f.name
+                    temp_file2 = _write_temp_html(graph_html)
 
                     await update.message.reply_document(
                         document=open(temp_file2, 'rb'),
@@ -837,9 +903,7 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                             })
                     
                     heatmap_html = visualizer.create_skills_heatmap(skills_data)
-                    with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                        f.write(heatmap_html)
-                        temp_file3 = f.name
+                    temp_file3 = _write_temp_html(heatmap_html)
 
                     await update.message.reply_document(
                         document=open(temp_file3, 'rb'),
@@ -858,9 +922,7 @@ async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     })
                 
                 company_html = visualizer.create_company_distribution(company_data)
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(company_html)
-                    temp_file4 = f.name
+                temp_file4 = _write_temp_html(company_html)
 
                 await update.message.reply_document(
                     document=open(temp_file4, 'rb'),
@@ -923,11 +985,11 @@ async def handle_search_query(update: Update, context: ContextTypes.DEFAULT_TYPE
     return await search_command(update, context)
 
 async def compare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Обрабатывает команду сравнения двух экспертов"""
+    """Обрабатывает команду сравнения двух и более экспертов"""
     telegram_id = str(update.effective_user.id)
     if not context.args and update.message.text == '⚖️ Сравнить':
         await update.message.reply_text(
-            "⚖️ **Введите имена экспертов для сравнения:**\n\nФормат: `Имя1 vs Имя2`\nПример: `Sam Altman vs Timnit Gebru`",
+            "⚖️ **Введите имена экспертов для сравнения:**\n\nФормат: `Имя1 vs Имя2` (можно больше: `Имя1 vs Имя2 vs Имя3`)\nПример: `Sam Altman vs Timnit Gebru`",
             reply_markup=get_cancel_keyboard(),
             parse_mode='Markdown'
         )
@@ -935,7 +997,7 @@ async def compare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     if not context.args and update.message.text != '⚖️ Сравнить':
         await update.message.reply_text(
-            "❌ Используйте: /compare [Имя1] vs [Имя2]\nИли кнопку '⚖️ Сравнить'",
+            "❌ Используйте: /compare [Имя1] vs [Имя2] [vs Имя3 ...]\nИли кнопку '⚖️ Сравнить'",
             reply_markup=get_main_keyboard()
         )
         return
@@ -955,82 +1017,80 @@ async def compare_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         await update.message.chat.send_action(action="typing")
         
-        names = query.split(" vs ")
-        person_x = names[0].strip()
-        person_y = names[1].strip()
+        names = [name.strip() for name in query.split(" vs ") if name.strip()]
+        if len(names) < 2:
+            await update.message.reply_text(
+                "❌ Укажите минимум два имени через 'vs'",
+                reply_markup=get_main_keyboard()
+            )
+            return ConversationHandler.END
 
-        logger.info(f"🔄 Сравниваю: {person_x} vs {person_y}")
+        logger.info(f"🔄 Сравниваю: {' vs '.join(names)}")
 
-        expert_x = db.get_person_by_name(telegram_id, person_x)
-        expert_y = db.get_person_by_name(telegram_id, person_y)
+        # Все эксперты находятся одним запросом к базе
+        result = await comparator.compare_many(telegram_id, names)
 
-        if not expert_x or not expert_y:
+        if 'error' in result:
             await update.message.reply_text(
-                "❌ Один или оба эксперта не найдены в базе",
+                f"❌ {result['error']}",
                 reply_markup=get_main_keyboard()
             )
             return ConversationHandler.END
 
+        experts = result['people']
+        matrix = result['matrix']
+
         # Создаем визуализацию
-        person_x_data = {
-            'name': expert_x.name,
-            'position': expert_x.position,
-            'company': expert_x.company,
-            'skills': expert_x.skills,
-            'projects': expert_x.projects
-        }
-
-        person_y_data = {
-            'name': expert_y.name,
-            'position': expert_y.position,
-            'company': expert_y.company,
-            'skills': expert_y.skills,
-            'projects': expert_y.projects
-        }
-
-        scores = {
-            'skills_score_x': len(expert_x.skills),
-            'skills_score_y': len(expert_y.skills),
-            'experience_score_x': 7 if "Senior" in expert_x.position else 5,
-            'experience_score_y': 7 if "Senior" in expert_y.position else 5,
-            'projects_score_x': len(expert_x.projects),
-            'projects_score_y': len(expert_y.projects),
-            'publications_score_x': 6,
-            'publications_score_y': 6,
-            'influence_score_x': 8 if "CEO" in expert_x.position else 5,
-            'influence_score_y': 8 if "CEO" in expert_y.position else 5
-        }
-
-        chart_html = visualizer.create_people_comparison_chart(person_x_data, person_y_data, scores)
-        
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False) as f:
-            f.write(chart_html)
-            temp_file = f.name
+        people_data = [
+            {
+                'name': expert.name,
+                'position': expert.position,
+                'company': expert.company,
+                'skills': expert.skills,
+                'projects': expert.projects
+            }
+            for expert in experts
+        ]
+        # Оценки берутся из предрасчитанной таблицы (перцентили по базе пользователя);
+        # возможный пересчет идет в потоке, чтобы не блокировать другие чаты
+        scores_by_id = await asyncio.to_thread(expert_scorer.get_scores, telegram_id, [expert.id for expert in experts])
+        people_scores = [scores_by_id.get(expert.id, {}) for expert in experts]
+
+        chart_html = visualizer.create_multi_comparison_chart(people_data, people_scores)
+        
+        temp_file = _write_temp_html(chart_html)
 
         try:
             await update.message.reply_document(
                 document=open(temp_file, 'rb'),
-                filename=f"comparison_{person_x}_vs_{person_y}.html",
-                caption=f"📊 Сравнение: {person_x} vs {person_y}"
+                filename=f"comparison_{'_vs_'.join(names)}.html",
+                caption=f"📊 Сравнение: {' vs '.join(names)}"
             )
         finally:
             os.unlink(temp_file)
 
-        report = f"""
-⚖️ **Сравнение экспертов:**
+        report = "\n⚖️ **Сравнение экспертов:**\n"
+        for name, expert in zip(names, experts):
+            report += f"""
+**{name}**
+• Должность: {expert.position}
+• Компания: {expert.company}
+• Навыки: {', '.join(expert.skills[:5])}
+• Проекты: {len(expert.projects)}
+"""
 
-**{person_x}**
-• Должность: {expert_x.position}
-• Компания: {expert_x.company}
-• Навыки: {', '.join(expert_x.skills[:5])}
-• Проекты: {len(expert_x.projects)}
+        report += "\n🔗 **Пересечения:**\n"
+        for i in range(len(experts)):
+            for j in range(i + 1, len(experts)):
+                cell = matrix[i][j]
+                line = f"• {names[i]} ↔ {names[j]}: общих навыков {len(cell['shared_skills'])}"
+                if cell['shared_skills']:
+                    line += f" ({', '.join(cell['shared_skills'][:3])})"
+                line += f", общих проектов {len(cell['shared_projects'])}"
+                if cell['same_company']:
+                    line += f", оба в {experts[i].company}"
+                report += line + "\n"
 
-**{person_y}**
-• Должность: {expert_y.position}
-• Компания: {expert_y.company}
-• Навыки: {', '.join(expert_y.skills[:5])}
-• Проекты: {len(expert_y.projects)}
-"""
         await update.message.reply_text(
             report, 
             parse_mode='Markdown',
@@ -1051,6 +1111,65 @@ async def handle_compare_input(update: Update, context: ContextTypes.DEFAULT_TYP
     context.args = [update.message.text]
     return await compare_command(update, context)
 
+async def similar_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Находит экспертов, похожих на заданного по навыкам и проектам"""
+    telegram_id = str(update.effective_user.id)
+    if not context.args:
+        await update.message.reply_text(
+            "🔎 Используйте: /similar [Имя]\nПример: /similar Yann LeCun",
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    name = " ".join(context.args).strip()
+    
+    try:
+        await update.message.chat.send_action(action="typing")
+        
+        result = await comparator.find_similar(telegram_id, name, k=settings.MAX_RECOMMENDATIONS)
+        
+        if 'error' in result:
+            await update.message.reply_text(
+                f"❌ {result['error']}",
+                reply_markup=get_main_keyboard()
+            )
+            return
+        
+        person = result['person']
+        if not result['similar']:
+            await update.message.reply_text(
+                f"🔎 У {person.name} нет экспертов с общими навыками или проектами",
+                reply_markup=get_main_keyboard()
+            )
+            return
+        
+        response = f"🔎 Похожие на {person.name}:\n\n"
+        for i, item in enumerate(result['similar'], 1):
+            other = item['person']
+            response += f"{i}. {other.name} — сходство {item['score']:.2f}\n"
+            if other.position or other.company:
+                response += f"   🏢 {other.position or 'Должность не указана'}"
+                if other.company:
+                    response += f" в {other.company}"
+                response += "\n"
+            if item['shared_skills']:
+                response += f"   🛠 Общие навыки: {', '.join(item['shared_skills'][:3])}\n"
+            if item['shared_projects']:
+                response += f"   🚀 Общие проекты: {', '.join(item['shared_projects'][:2])}\n"
+            response += "\n"
+        
+        await update.message.reply_text(
+            response,
+            reply_markup=get_main_keyboard()
+        )
+        
+    except Exception as e:
+        logger.error(f"Error in similar_command: {e}")
+        await update.message.reply_text(
+            "❌ Ошибка при поиске похожих экспертов.",
+            reply_markup=get_main_keyboard()
+        )
+
 async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     upload_info = """
 📁 **Загрузка данных экспертов**
@@ -1060,7 +1179,8 @@ async def upload_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 **📊 Форматы**
 • CSV/TSV
 • Excel  
-• JSON
+• JSON / JSON Lines
+• Parquet / Feather
 
 **🎯 Распознавание полей**
 
@@ -1092,72 +1212,196 @@ async def handle_file(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     # Проверяем тип файла
     file_extension = document.file_name.lower().split('.')[-1]
-    if file_extension not in ['csv', 'json', 'xlsx', 'xls']:
-        await update.message.reply_text("❌ Поддерживаются только CSV, JSON и Excel файлы.")
+    if file_extension not in ['csv', 'tsv', 'json', 'jsonl', 'ndjson', 'xlsx', 'xls'] + columnar.COLUMNAR_EXTENSIONS:
+        await update.message.reply_text("❌ Поддерживаются только CSV, JSON/JSON Lines, Excel и Parquet/Feather файлы.")
+        return
+
+    # Тот же документ Telegram не скачиваем повторно: file_unique_id известен до get_file
+    previous = db.get_upload(telegram_id, file_unique_id=document.file_unique_id)
+    if previous:
+        await update.message.reply_text(import_queue.duplicate_text(document.file_name, previous))
+        return
+    if any(job.file_unique_id == document.file_unique_id for job in db.get_active_import_jobs(telegram_id)):
+        await update.message.reply_text(f"⏳ Файл {document.file_name} уже в очереди на импорт.")
         return
 
     try:
-        await update.message.reply_text("📥 Загружаю и анализирую файл...")
+        progress = await update.message.reply_text("📥 Загружаю файл...")
         
-        # Получаем содержимое файла
+        # Сохраняем копию файла: импорт идет в фоне и переживает перезапуск бота
         file = await context.bot.get_file(document.file_id)
-        file_content = await file.download_as_bytearray()
-        
-        # Парсим файл для конкретного пользователя
-        result = await file_parser.parse_file(file_content, document.file_name, telegram_id)
-        
-        # Отправляем результаты
-        if 'error' in result:
-            await update.message.reply_text(f"❌ Ошибка: {result['error']}")
-        else:
-            success_message = f"""
-✅ Файл успешно обработан!
-
-📊 Результаты:
-• Экспертов добавлено: {result.get('experts_added', 0)}
-• Публикаций добавлено: {result.get('publications_added', 0)}
-"""
-            await update.message.reply_text(success_message)
-            
-            if 'analysis' in result and result['analysis']:
-                analysis = result['analysis']
-                await send_analysis_report(update, analysis)
-            
-            if result.get('errors'):
-                errors_text = "\n".join(result['errors'][:3])
-                if len(result['errors']) > 3:
-                    errors_text += f"\n... и еще {len(result['errors']) - 3} ошибок"
-                await update.message.reply_text(f"⚠️ Ошибки:\n{errors_text}")
+        file_path = import_queue.new_file_path(document.file_name)
+        await file.download_to_drive(file_path)
+        
+        await import_queue.submit(
+            telegram_id,
+            update.effective_chat.id,
+            document.file_name,
+            file_path,
+            message_id=progress.message_id,
+            file_unique_id=document.file_unique_id
+        )
             
     except Exception as e:
         logger.error(f"Error handling file for user {telegram_id}: {e}")
         await update.message.reply_text("❌ Произошла ошибка при обработке файла.")
 
-async def send_analysis_report(update: Update, analysis: dict):
-    """Отправляет отчет анализа данных"""
+async def trends_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выявляет тренды по всем публикациям пользователя"""
+    telegram_id = str(update.effective_user.id)
+    if not trend_engine.available:
+        await update.message.reply_text(
+            "❌ Анализ трендов недоступен на сервере.",
+            reply_markup=get_main_keyboard()
+        )
+        return
     
-    if 'insights' in analysis and analysis['insights']:
-        insights_text = "🔍 **Анализ данных выявил:**\n\n" + "\n".join(f"• {insight}" for insight in analysis['insights'])
-        await update.message.reply_text(insights_text, parse_mode='Markdown')
+    try:
+        await update.message.chat.send_action(action="typing")
+        trends = await trend_engine.detect(telegram_id)
+        
+        if not trends['publications']:
+            await update.message.reply_text(
+                "📝 В базе нет публикаций. Загрузите файл со столбцом publications.",
+                reply_markup=get_main_keyboard()
+            )
+            return
+        if not trends['emerging_trends']:
+            await update.message.reply_text(
+                "❌ Не удалось выявить тренды, попробуйте позже.",
+                reply_markup=get_main_keyboard()
+            )
+            return
+        
+        lines = [f"🔮 Тренды по {trends['analyzed']} из {trends['publications']} публикаций:\n"]
+        for index, trend in enumerate(trends['emerging_trends'][:7], 1):
+            lines.append(f"{index}. {trend['trend_name']} - импульс {trend['momentum']}/10, "
+                         f"упоминаний: {trend['mentions']}")
+            if trend['key_players']:
+                lines.append(f"   👥 {', '.join(trend['key_players'][:3])}")
+        if trends['declining_trends']:
+            lines.append(f"\n📉 Угасают: {', '.join(trends['declining_trends'][:3])}")
+        if trends['predictions']:
+            lines.append("\n🔭 Прогнозы:")
+            lines.extend(f"• {prediction}" for prediction in trends['predictions'][:3])
+        if trends['failed_chunks']:
+            lines.append(f"\n⚠️ Не удалось проанализировать {trends['failed_chunks']} из {trends['chunks']} блоков")
+        
+        await update.message.reply_text("\n".join(lines), reply_markup=get_main_keyboard())
     
-    if 'top_companies' in analysis and analysis['top_companies']:
-        companies_text = "🏢 **Топ компаний:**\n" + "\n".join(f"• {company}: {count}" for company, count in list(analysis['top_companies'].items())[:5])
-        await update.message.reply_text(companies_text)
+    except Exception as e:
+        logger.error(f"Error detecting trends for user {telegram_id}: {e}")
+        await update.message.reply_text(
+            "❌ Ошибка при анализе трендов.",
+            reply_markup=get_main_keyboard()
+        )
+
+def _format_insight(result: dict, done: bool) -> str:
+    """Текст ответа /analyze по частично или полностью разобранному JSON"""
+    if 'error' in result:
+        return "❌ Не удалось проанализировать текст, попробуйте позже."
+    if 'raw_response' in result:
+        return f"🧠 Ответ модели:\n\n{result['raw_response']}"
     
-    if 'top_skills' in analysis and analysis['top_skills']:
-        skills_text = "🛠 **Топ навыков:**\n" + "\n".join(f"• {skill}: {count}" for skill, count in list(analysis['top_skills'].items())[:8])
-        await update.message.reply_text(skills_text)
+    lines = ["🧠 Анализ текста" + ("" if done else " ⏳") + "\n"]
+    if result.get('category'):
+        lines.append(f"🏷 Категория: {result['category']}")
+    if isinstance(result.get('confidence'), (int, float)):
+        lines.append(f"🎯 Уверенность: {result['confidence']:.0%}")
+    if result.get('potential_impact'):
+        lines.append(f"💥 Влияние: {result['potential_impact']}")
+    if result.get('timeline'):
+        lines.append(f"🕒 Горизонт: {result['timeline']}")
+    findings = [finding for finding in result.get('key_findings') or [] if finding]
+    if findings:
+        lines.append("\n🔍 Ключевые выводы:")
+        lines.extend(f"• {finding}" for finding in findings)
+    return "\n".join(lines)
+
+async def analyze_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Анализирует текст (аргумент или ответ на сообщение) и показывает результат по мере генерации"""
+    telegram_id = str(update.effective_user.id)
+    reply = update.message.reply_to_message
+    text = ' '.join(context.args) if context.args else (reply.text or reply.caption or '') if reply else ''
+    if not text.strip():
+        await update.message.reply_text(
+            "📝 Использование: /analyze <текст> или ответьте командой /analyze на сообщение с текстом.",
+            reply_markup=get_main_keyboard()
+        )
+        return
+    if not analyzer.available:
+        await update.message.reply_text(
+            "❌ Анализ текста недоступен на сервере.",
+            reply_markup=get_main_keyboard()
+        )
+        return
     
-    if 'stats' in analysis and analysis['stats']:
-        stats = analysis['stats']
-        stats_text = f"""
-📈 **Статистика датасета:**
-• Всего экспертов: {stats.get('total_experts', 0)}
-• Уникальных компаний: {stats.get('companies_count', 0)}
-• Навыков на эксперта: {stats.get('avg_skills_per_expert', 0):.1f}
-• Основная должность: {stats.get('most_common_position', 'N/A')}
-"""
-        await update.message.reply_text(stats_text, parse_mode='Markdown')
+    try:
+        # Редактировать можно только сообщения без reply-клавиатуры: основная клавиатура у пользователя уже есть
+        message = await update.message.reply_text("⏳ Анализирую текст...")
+        progressive = ProgressiveMessage(message, settings.STREAM_EDIT_INTERVAL)
+        result = {}
+        async for result in analyzer.analyze_stream(text, 'insight_classification'):
+            await progressive.update(_format_insight(result, done=False))
+        await progressive.update(_format_insight(result, done=True), final=True)
+    
+    except Exception as e:
+        logger.error(f"Error analyzing text for user {telegram_id}: {e}")
+        await update.message.reply_text(
+            "❌ Ошибка при анализе текста.",
+            reply_markup=get_main_keyboard()
+        )
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Выгружает экспертов и публикации пользователя в Parquet или сжатый NDJSON"""
+    telegram_id = str(update.effective_user.id)
+    default_format = 'parquet' if columnar.available() else 'ndjson'
+    export_format = context.args[0].lower() if context.args else default_format
+    
+    if export_format not in EXPORT_FORMATS:
+        await update.message.reply_text(
+            "❌ Формат выгрузки: /export parquet или /export ndjson",
+            reply_markup=get_main_keyboard()
+        )
+        return
+    if export_format == 'parquet' and not columnar.available():
+        await update.message.reply_text(
+            "❌ Выгрузка в Parquet недоступна на сервере. Используйте /export ndjson",
+            reply_markup=get_main_keyboard()
+        )
+        return
+    
+    directory = tempfile.mkdtemp(prefix='export_')
+    try:
+        await update.message.chat.send_action(action="upload_document")
+        # Строки читаются из базы курсором и пишутся в файл блоками - вне event loop
+        files = await asyncio.to_thread(export_user_data, telegram_id, export_format, directory)
+        
+        if not files[0][1]:
+            await update.message.reply_text(
+                "📊 База данных пуста. Используйте /upload для добавления данных.",
+                reply_markup=get_main_keyboard()
+            )
+            return
+        
+        for (path, rows), title in zip(files, ['👥 Эксперты', '📝 Публикации']):
+            if not rows:
+                continue
+            with open(path, 'rb') as f:
+                await update.message.reply_document(
+                    document=f,
+                    filename=os.path.basename(path),
+                    caption=f"{title}: {rows}"
+                )
+    
+    except Exception as e:
+        logger.error(f"Error exporting data for user {telegram_id}: {e}")
+        await update.message.reply_text(
+            "❌ Ошибка при выгрузке данных.",
+            reply_markup=get_main_keyboard()
+        )
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
 
 async def visualize_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Показывает визуализации базы данных"""
@@ -1198,6 +1442,8 @@ async def visualize_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                       people_data[i]['company'] != 'Не указана'):
                     connections.append((i, j))
         
+        await _add_graph_metrics(telegram_id, people_data[:15])
+        
         # Создаем все 4 типа визуализаций
         visualizations = [
             ("📊 График экспертов", visualizer.create_recommendations_chart(people_data[:10])),
@@ -1209,9 +1455,7 @@ async def visualize_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         sent_count = 0
         for title, chart_html in visualizations:
             try:
-                with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                    f.write(chart_html)
-                    temp_file = f.name
+                temp_file = _write_temp_html(chart_html)
 
                 await update.message.reply_document(
                     document=open(temp_file, 'rb'),
@@ -1305,11 +1549,10 @@ async def create_network_graph(update: Update, context: ContextTypes.DEFAULT_TYP
                     connections.append((i, j))
         
         # Создаем граф
+        await _add_graph_metrics(telegram_id, people_data)
         graph_html = visualizer.create_network_graph(people_data, connections)
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(graph_html)
-            temp_file = f.name
+        temp_file = _write_temp_html(graph_html)
 
         await update.message.reply_document(
             document=open(temp_file, 'rb'),
@@ -1363,9 +1606,7 @@ async def create_skills_heatmap(update: Update, context: ContextTypes.DEFAULT_TY
         
         heatmap_html = visualizer.create_skills_heatmap(skills_data)
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(heatmap_html)
-            temp_file = f.name
+        temp_file = _write_temp_html(heatmap_html)
 
         await update.message.reply_document(
             document=open(temp_file, 'rb'),
@@ -1411,9 +1652,7 @@ async def create_company_chart(update: Update, context: ContextTypes.DEFAULT_TYP
         
         company_html = visualizer.create_company_distribution(company_data)
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(company_html)
-            temp_file = f.name
+        temp_file = _write_temp_html(company_html)
 
         await update.message.reply_document(
             document=open(temp_file, 'rb'),
@@ -1456,29 +1695,32 @@ async def handle_recommendations_chart(update: Update, context: ContextTypes.DEF
         matched_experts = []
         seen_names = set()
         
-        for person in people:
-            if person.name in seen_names:
-                continue
+        with span('recommendations_chart.scoring', candidates=len(people)) as scoring:
+            for person in people:
+                if person.name in seen_names:
+                    continue
                 
-            score = 0
+                score = 0
             
-            # Простая логика подсчета очков
-            if topic.lower() in person.name.lower():
-                score += 3
-            if person.position and topic.lower() in person.position.lower():
-                score += 2
-            if person.company and topic.lower() in person.company.lower():
-                score += 2
-            for skill in person.skills:
-                if topic.lower() in skill.lower():
-                    score += 1
+                # Простая логика подсчета очков
+                if topic.lower() in person.name.lower():
+                    score += 3
+                if person.position and topic.lower() in person.position.lower():
+                    score += 2
+                if person.company and topic.lower() in person.company.lower():
+                    score += 2
+                for skill in person.skills:
+                    if topic.lower() in skill.lower():
+                        score += 1
             
-            if score > 0:
-                matched_experts.append({
-                    'person': person,
-                    'score': score
-                })
-                seen_names.add(person.name)
+                if score > 0:
+                    matched_experts.append({
+                        'person': person,
+                        'score': score
+                    })
+                    seen_names.add(person.name)
+            if scoring:
+                scoring.set(matched=len(matched_experts))
         
         matched_experts.sort(key=lambda x: x['score'], reverse=True)
         
@@ -1503,9 +1745,7 @@ async def handle_recommendations_chart(update: Update, context: ContextTypes.DEF
         # Создаем график
         chart_html = visualizer.create_recommendations_chart(recommendations_data)
         
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-            f.write(chart_html)
-            temp_file = f.name
+        temp_file = _write_temp_html(chart_html)
 
         await update.message.reply_document(
             document=open(temp_file, 'rb'),
@@ -1625,6 +1865,8 @@ async def confirm_clear(update: Update, context: ContextTypes.DEFAULT_TYPE):
             success = db.clear_database(telegram_id)
             
             if success:
+                # Термины удаленных экспертов не должны находиться в новых публикациях
+                local_extractor.forget(telegram_id)
                 await update.message.reply_text(
                     f"✅ **База данных успешно очищена!**\n\n"
                     f"📊 **Удалено:**\n"
@@ -1755,9 +1997,7 @@ async def handle_visualization_options(update: Update, context: ContextTypes.DEF
                 })
             
             heatmap_html = visualizer.create_skills_heatmap(people_data)
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                f.write(heatmap_html)
-                temp_file = f.name
+            temp_file = _write_temp_html(heatmap_html)
 
             await update.message.reply_document(
                 document=open(temp_file, 'rb'),
@@ -1789,9 +2029,7 @@ async def handle_visualization_options(update: Update, context: ContextTypes.DEF
                 })
             
             company_html = visualizer.create_company_distribution(people_data)
-            with tempfile.NamedTemporaryFile(mode='w', suffix='.html', delete=False, encoding='utf-8') as f:
-                f.write(company_html)
-                temp_file = f.name
+            temp_file = _write_temp_html(company_html)
 
             await update.message.reply_document(
                 document=open(temp_file, 'rb'),
@@ -1814,9 +2052,15 @@ async def handle_visualization_options(update: Update, context: ContextTypes.DEF
     return ConversationHandler.END
 
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Отменяет текущую операцию и возвращает в главное меню"""
+    """Отменяет текущую операцию и фоновые импорты, возвращает в главное меню"""
+    cancelled_imports = await import_queue.cancel(str(update.effective_user.id))
+    
+    message = "✅ Операция отменена. Возвращаемся в главное меню."
+    if cancelled_imports:
+        message = f"🛑 Отменено импортов: {cancelled_imports}. Возвращаемся в главное меню."
+    
     await update.message.reply_text(
-        "✅ Операция отменена. Возвращаемся в главное меню.",
+        message,
         reply_markup=get_main_keyboard()
     )
     return ConversationHandler.END
@@ -1930,10 +2174,14 @@ def setup_handlers(application):
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("stats", stats_command))
     application.add_handler(CommandHandler("upload", upload_command))
+    application.add_handler(CommandHandler("export", export_command))
     application.add_handler(CommandHandler("visualize", visualize_command))
     application.add_handler(CommandHandler("cleanup", cleanup_command))
     application.add_handler(CommandHandler("force_cleanup", force_cleanup_command))
     application.add_handler(CommandHandler("mystats", my_stats_command))
+    application.add_handler(CommandHandler("similar", similar_command))
+    application.add_handler(CommandHandler("trends", trends_command))
+    application.add_handler(CommandHandler("analyze", analyze_command))
     
     # ConversationHandler для рекомендаций
     recommend_conv_handler = ConversationHandler(
@@ -2004,10 +2252,16 @@ def setup_handlers(application):
     )
     application.add_handler(clear_conv_handler)
     
+    # /cancel вне диалогов - отмена фоновых импортов
+    application.add_handler(CommandHandler("cancel", cancel_command))
+    
     # Обработчик текстовых сообщений (кнопки)
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
     
     # Обработчик файлов
     application.add_handler(MessageHandler(filters.Document.ALL, handle_file))
     
+    # Время и ошибки каждого обработчика для /metrics
+    instrument_handlers(application)
+    
     logger.info("✅ Bot handlers configured with keyboards")
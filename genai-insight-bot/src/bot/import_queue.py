@@ -0,0 +1,303 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+import uuid
+from datetime import datetime
+from typing import List, Optional, Set
+from telegram import Bot
+from telegram.error import TelegramError
+from database.operations import db
+from database.models import ImportJob
+from utils.file_parser import file_parser, AnalysisAccumulator
+from analysis.scoring import expert_scorer
+from analysis.enrichment import publication_enricher
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class ImportQueue:
+    """Постоянная очередь импорта файлов: задачи в таблице import_jobs, обработка asyncio-воркерами
+
+    Каждый блок строк сохраняется в одной транзакции с прогрессом задачи, поэтому
+    прерванный перезапуском импорт продолжается с последнего закоммиченного блока.
+    """
+
+    def __init__(self):
+        self.bot: Optional[Bot] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._cancelled: Set[int] = set()
+        self._stopping = False
+
+    async def start(self, bot: Bot, workers: int = None):
+        """Запускает воркеры и возвращает в очередь незавершенные задачи"""
+        self.bot = bot
+        self._queue = asyncio.Queue()
+        self._stopping = False
+        os.makedirs(settings.IMPORT_DIR, exist_ok=True)
+
+        unfinished = db.get_unfinished_import_jobs()
+        for job in unfinished:
+            if job.status == 'running':
+                await self._edit(job, f"♻️ Импорт {job.filename} возобновляется после перезапуска "
+                                      f"со строки {job.rows_done or 0}...")
+            self._queue.put_nowait(job.id)
+        if unfinished:
+            logger.info(f"Resuming {len(unfinished)} unfinished import jobs")
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(workers or settings.IMPORT_WORKERS)]
+
+    async def stop(self):
+        """Останавливает воркеры после текущего блока; задачи продолжатся при следующем запуске"""
+        self._stopping = True
+        for _ in self._workers:
+            self._queue.put_nowait(None)
+        # Блок, который уже пишется в базу, дописываем: иначе его коммит может прийти после
+        # того, как новый запуск прочитал прогресс задачи
+        _, pending = await asyncio.wait(self._workers, timeout=settings.SHUTDOWN_TIMEOUT)
+        for worker in pending:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    @staticmethod
+    def new_file_path(filename: str) -> str:
+        extension = filename.lower().split('.')[-1]
+        return os.path.join(settings.IMPORT_DIR, f"{uuid.uuid4().hex}.{extension}")
+
+    async def submit(self, telegram_id: str, chat_id: int, filename: str, file_path: str,
+                     message_id: int = None, file_unique_id: str = None) -> ImportJob:
+        """Ставит загруженный файл в очередь импорта"""
+        job = db.create_import_job(telegram_id, str(chat_id), filename, file_path, file_unique_id=file_unique_id)
+        if message_id:
+            db.update_import_job(job.id, message_id=message_id)
+            job.message_id = message_id
+
+        await self._edit(job, f"⏳ Файл {filename} в очереди на импорт (позиция {self._queue.qsize() + 1}).\n"
+                              f"Отменить: /cancel")
+        self._queue.put_nowait(job.id)
+        return job
+
+    async def cancel(self, telegram_id: str) -> int:
+        """Отменяет ожидающие и выполняющиеся импорты пользователя; возвращает число задач"""
+        jobs = db.get_active_import_jobs(telegram_id)
+        for job in jobs:
+            self._cancelled.add(job.id)
+            if job.status == 'queued':
+                self._finish(job, 'cancelled')
+                await self._edit(job, f"🛑 Импорт {job.filename} отменен.")
+        return len(jobs)
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            if job_id is None or self._stopping:
+                self._queue.task_done()
+                return
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Import job {job_id} failed: {e}")
+                job = db.get_import_job(job_id)
+                if job:
+                    self._finish(job, 'failed', errors=(job.errors or []) + [str(e)])
+                    await self._edit(job, "❌ Произошла ошибка при обработке файла.")
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: int):
+        job = db.get_import_job(job_id)
+        if not job or job.status not in ('queued', 'running') or job_id in self._cancelled:
+            return
+
+        telegram_id = job.user.telegram_id
+        db.update_import_job(job_id, status='running')
+        
+        # Тот же файл мог прийти с другим file_unique_id (переслан, выгружен заново) - сверяем содержимое
+        try:
+            content_hash = await asyncio.to_thread(self._content_hash, job.file_path)
+        except OSError as e:
+            self._finish(job, 'failed', errors=(job.errors or []) + [str(e)])
+            await self._edit(job, f"❌ Ошибка: {e}")
+            return
+        previous = db.get_upload(telegram_id, content_hash=content_hash)
+        if previous and not job.rows_done:
+            self._finish(job, 'duplicate')
+            await self._edit(job, self.duplicate_text(job.filename, previous))
+            return
+
+        chunks = file_parser.iter_chunks(job.file_path, job.filename, settings.IMPORT_CHUNK_SIZE)
+        analysis = AnalysisAccumulator(file_parser)
+        rows_done = resumed_from = job.rows_done or 0
+        started = time.monotonic()
+        # Доля файла до первого сохраняемого блока: от нее считается оставшееся время
+        start_share = 0.0
+        last_edit = 0.0
+
+        try:
+            while True:
+                try:
+                    # pandas, разбор файла и SQLite - блокирующие операции, выполняем их вне event loop
+                    item = await asyncio.to_thread(next, chunks, None)
+                except (OSError, ValueError) as e:
+                    self._finish(job, 'failed', errors=(job.errors or []) + [str(e)])
+                    await self._edit(job, f"❌ Ошибка: {e}")
+                    return
+                if item is None:
+                    break
+                if self._stopping:
+                    # Задача остается в статусе running и продолжится после перезапуска
+                    return
+                chunk, share = item
+                analysis.update(chunk)
+
+                if job_id in self._cancelled:
+                    self._finish(job, 'cancelled')
+                    await self._edit(job, f"🛑 Импорт {job.filename} отменен.\n"
+                                          f"Уже сохранено строк: {rows_done}")
+                    return
+
+                start, end = int(chunk.index[0]), int(chunk.index[-1]) + 1
+                if end <= resumed_from:
+                    # Блок сохранен до перезапуска: только учитываем его в анализе
+                    start_share = share
+                    continue
+                if start < resumed_from:
+                    chunk = chunk.loc[resumed_from:]
+
+                _, publications_added, _ = await asyncio.to_thread(
+                    file_parser.import_chunk, chunk, telegram_id, job_id, end
+                )
+                rows_done = end
+                if publications_added:
+                    # Анализ публикаций идет в фоне и не задерживает импорт
+                    publication_enricher.notify()
+
+                now = time.monotonic()
+                if now - last_edit >= settings.IMPORT_PROGRESS_INTERVAL and share < 1:
+                    await self._edit(job, self._progress_text(
+                        job.filename, rows_done, resumed_from, share, start_share, now - started
+                    ))
+                    last_edit = now
+        finally:
+            # Закрываем файл; если поток с next() еще работает после отмены, он закроется сборщиком
+            try:
+                chunks.close()
+            except ValueError:
+                pass
+
+        db.update_import_job(job_id, total_rows=rows_done)
+
+        job = db.get_import_job(job_id)
+        self._finish(job, 'done')
+        db.add_upload(telegram_id, content_hash, job.filename, file_unique_id=job.file_unique_id,
+                      job_id=job_id, experts_added=job.experts_added or 0)
+
+        success_message = f"""
+✅ Файл успешно обработан!
+
+📊 Результаты:
+• Экспертов добавлено: {job.experts_added or 0}
+• Публикаций добавлено: {job.publications_added or 0}
+"""
+        if job.duplicates_skipped:
+            success_message += f"• Пропущено уже загруженных строк: {job.duplicates_skipped}\n"
+        await self._edit(job, success_message)
+
+        # Досчитываем оценки для сравнения только по новым экспертам
+        try:
+            await asyncio.to_thread(expert_scorer.refresh, telegram_id)
+        except Exception as e:
+            logger.error(f"Error refreshing expert scores for user {telegram_id}: {e}")
+
+        await self._send_analysis_report(job.chat_id, analysis.result(job.experts_added or 0))
+
+        if job.errors:
+            errors_text = "\n".join(job.errors[:3])
+            if len(job.errors) > 3:
+                errors_text += f"\n... и еще {len(job.errors) - 3} ошибок"
+            await self._send(job.chat_id, f"⚠️ Ошибки:\n{errors_text}")
+
+    @staticmethod
+    def _content_hash(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 ** 2), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def duplicate_text(filename: str, upload) -> str:
+        return (f"♻️ Файл {filename} уже импортирован {upload.created_at:%d.%m.%Y %H:%M} UTC "
+                f"(экспертов: {upload.experts_added or 0}). Повторный импорт не нужен.")
+
+    @staticmethod
+    def _progress_text(filename: str, rows_done: int, resumed_from: int, share: float,
+                       start_share: float, elapsed: float) -> str:
+        """Прогресс по доле прочитанного файла: при потоковом чтении число строк заранее неизвестно"""
+        filled = int(share * 10)
+        rate = (rows_done - resumed_from) / max(elapsed, 1e-6)
+        eta = elapsed * (1 - share) / (share - start_share) if share > start_share else 0
+        return (
+            f"📥 Импорт {filename}\n"
+            f"{'▓' * filled}{'░' * (10 - filled)} {share * 100:.0f}%\n"
+            f"Строк обработано: {rows_done}\n"
+            f"Скорость: {rate:.0f} строк/с\n"
+            f"Осталось: ~{eta:.0f} с\n"
+            f"Отменить: /cancel"
+        )
+
+    def _finish(self, job: ImportJob, status: str, **fields):
+        """Фиксирует итоговый статус задачи и удаляет сохраненную копию файла"""
+        db.update_import_job(job.id, status=status, finished_at=datetime.utcnow(), **fields)
+        self._cancelled.discard(job.id)
+        try:
+            os.remove(job.file_path)
+        except OSError:
+            pass
+
+    async def _edit(self, job: ImportJob, text: str):
+        if not job.message_id:
+            return
+        try:
+            await self.bot.edit_message_text(text, chat_id=job.chat_id, message_id=job.message_id)
+        except TelegramError as e:
+            logger.warning(f"Could not update progress of import job {job.id}: {e}")
+
+    async def _send(self, chat_id: str, text: str, parse_mode: str = None):
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+        except TelegramError as e:
+            logger.warning(f"Could not send import report to chat {chat_id}: {e}")
+
+    async def _send_analysis_report(self, chat_id: str, analysis: dict):
+        """Отправляет отчет анализа данных"""
+
+        if 'insights' in analysis and analysis['insights']:
+            insights_text = "🔍 **Анализ данных выявил:**\n\n" + "\n".join(f"• {insight}" for insight in analysis['insights'])
+            await self._send(chat_id, insights_text, parse_mode='Markdown')
+
+        if 'top_companies' in analysis and analysis['top_companies']:
+            companies_text = "🏢 **Топ компаний:**\n" + "\n".join(f"• {company}: {count}" for company, count in list(analysis['top_companies'].items())[:5])
+            await self._send(chat_id, companies_text)
+
+        if 'top_skills' in analysis and analysis['top_skills']:
+            skills_text = "🛠 **Топ навыков:**\n" + "\n".join(f"• {skill}: {count}" for skill, count in list(analysis['top_skills'].items())[:8])
+            await self._send(chat_id, skills_text)
+
+        if 'stats' in analysis and analysis['stats']:
+            stats = analysis['stats']
+            stats_text = f"""
+📈 **Статистика датасета:**
+• Всего экспертов: {stats.get('total_experts', 0)}
+• Уникальных компаний: {stats.get('companies_count', 0)}
+• Навыков на эксперта: {stats.get('avg_skills_per_expert', 0):.1f}
+• Основная должность: {stats.get('most_common_position', 'N/A')}
+"""
+            await self._send(chat_id, stats_text, parse_mode='Markdown')
+
+import_queue = ImportQueue()
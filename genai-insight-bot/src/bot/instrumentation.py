@@ -0,0 +1,60 @@
+import functools
+import time
+from telegram.ext import Application, BaseHandler, ConversationHandler
+from telegram.request import HTTPXRequest
+from monitoring.metrics import registry
+from monitoring.tracing import span
+
+HANDLER_SECONDS = registry.histogram(
+    'bot_handler_duration_seconds', 'Время обработки обновления обработчиком', ['handler'])
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Необработанные исключения в обработчиках', ['handler'])
+
+def _wrap(callback):
+    if getattr(callback, '_instrumented', False):
+        return callback
+    name = getattr(callback, '__name__', callback.__class__.__name__)
+
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        user = getattr(update, 'effective_user', None)
+        try:
+            # Обновление - корень трассы: все вложенные спаны (БД, анализ, графики, Telegram) попадают в нее
+            with span(f'handler.{name}', root=True, user_id=str(user.id) if user else ''):
+                # Возвращаемое значение - следующее состояние ConversationHandler, его нужно сохранить
+                return await callback(update, context)
+        except Exception:
+            HANDLER_ERRORS.inc(handler=name)
+            raise
+        finally:
+            HANDLER_SECONDS.observe(time.perf_counter() - started, handler=name)
+
+    wrapper._instrumented = True
+    return wrapper
+
+def _instrument(handler: BaseHandler):
+    if isinstance(handler, ConversationHandler):
+        for nested in handler.entry_points + handler.fallbacks:
+            _instrument(nested)
+        for state_handlers in handler.states.values():
+            for nested in state_handlers:
+                _instrument(nested)
+        return
+    handler.callback = _wrap(handler.callback)
+
+def instrument_handlers(application: Application):
+    """Оборачивает все зарегистрированные обработчики замером времени (метка - имя функции)"""
+    for handlers in application.handlers.values():
+        for handler in handlers:
+            _instrument(handler)
+
+class TracedRequest(HTTPXRequest):
+    """HTTPXRequest, оформляющий каждый вызов Bot API спаном telegram.<метод>"""
+
+    async def do_request(self, url, method, request_data=None, **kwargs):
+        with span(f"telegram.{url.rsplit('/', 1)[-1]}") as current:
+            code, payload = await super().do_request(url, method, request_data, **kwargs)
+            if current:
+                current.set(http_status=code, response_bytes=len(payload))
+            return code, payload
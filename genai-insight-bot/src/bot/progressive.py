@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import time
+from telegram import Message
+from telegram.error import BadRequest, RetryAfter, TelegramError
+
+logger = logging.getLogger(__name__)
+
+# Лимит длины текста сообщения Telegram
+MESSAGE_LIMIT = 4096
+
+class ProgressiveMessage:
+    """Одно сообщение, которое дописывается по мере ответа модели
+
+    Промежуточные правки не чаще раза в interval секунд: Telegram ограничивает частоту
+    edit_message_text в чате, а при RetryAfter правки пропускаются до конца паузы.
+    Последний промежуточный текст не теряется - финальная правка дожидается окна и отправляется всегда,
+    а если правка невозможна, результат приходит отдельным сообщением.
+    """
+
+    def __init__(self, message: Message, interval: float):
+        self.message = message
+        self.interval = interval
+        self.edits = 0
+        self._text = message.text
+        self._last_edit = 0.0
+        self._blocked_until = 0.0
+
+    async def update(self, text: str, final: bool = False):
+        text = text[:MESSAGE_LIMIT]
+        if text == self._text:
+            return
+        ready_at = max(self._last_edit + self.interval, self._blocked_until)
+        if not final and time.monotonic() < ready_at:
+            return
+        if final:
+            await asyncio.sleep(max(0.0, ready_at - time.monotonic()))
+
+        for _ in range(2 if final else 1):
+            try:
+                await self.message.edit_text(text)
+                self._text = text
+                self.edits += 1
+                self._last_edit = time.monotonic()
+                return
+            except RetryAfter as e:
+                self._blocked_until = time.monotonic() + e.retry_after
+                if final:
+                    await asyncio.sleep(e.retry_after)
+            except BadRequest as e:
+                # "Message is not modified" - текст уже такой, остальные ошибки только логируем
+                if 'not modified' in str(e).lower():
+                    return
+                logger.warning(f"Could not edit streaming message: {e}")
+                break
+            except TelegramError as e:
+                logger.warning(f"Could not edit streaming message: {e}")
+                break
+        if final:
+            await self._send_new(text)
+
+    async def _send_new(self, text: str):
+        """Финальный ответ не теряется: если сообщение не удалось отредактировать, он уходит новым сообщением"""
+        try:
+            self.message = await self.message.reply_text(text)
+            self._text = text
+        except TelegramError as e:
+            logger.error(f"Could not deliver streaming result: {e}")
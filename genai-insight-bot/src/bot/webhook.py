@@ -0,0 +1,78 @@
+import logging
+import secrets
+import ssl
+from typing import Optional
+from aiohttp import web
+from telegram import Update
+from telegram.ext import Application
+
+logger = logging.getLogger(__name__)
+
+class WebhookServer:
+    """HTTP-сервер aiohttp, принимающий обновления Telegram вместо long polling"""
+
+    SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+    def __init__(self, application: Application, path: str, listen: str, port: int,
+                 secret_token: Optional[str] = None, ssl_context: Optional[ssl.SSLContext] = None):
+        self.application = application
+        self.path = path if path.startswith('/') else f'/{path}'
+        self.listen = listen
+        self.port = port
+        self.secret_token = secret_token
+        self.ssl_context = ssl_context
+        self._runner: Optional[web.AppRunner] = None
+        self._accepting = False
+
+        self.app = web.Application()
+        self.app.router.add_post(self.path, self._handle_update)
+        self.app.router.add_get('/healthz', self._handle_health)
+
+    async def _handle_update(self, request: web.Request) -> web.Response:
+        """Принимает обновление и ставит его в очередь приложения, не дожидаясь обработки"""
+        if self.secret_token and not secrets.compare_digest(
+            request.headers.get(self.SECRET_HEADER, ''), self.secret_token
+        ):
+            return web.Response(status=403)
+
+        # Во время остановки просим Telegram повторить доставку позже
+        if not self._accepting:
+            return web.Response(status=503)
+
+        try:
+            data = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        update = Update.de_json(data, self.application.bot)
+        await self.application.update_queue.put(update)
+        return web.Response()
+
+    async def _handle_health(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            'status': 'ok' if self._accepting else 'stopping',
+            'pending_updates': self.application.update_queue.qsize()
+        })
+
+    async def start(self):
+        self._runner = web.AppRunner(self.app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.listen, self.port, ssl_context=self.ssl_context)
+        await site.start()
+        # При port=0 система выбирает свободный порт
+        self.port = self._runner.addresses[0][1]
+        self._accepting = True
+        scheme = 'https' if self.ssl_context else 'http'
+        logger.info(f"🌐 Webhook server listening on {scheme}://{self.listen}:{self.port}{self.path}")
+
+    def stop_accepting(self):
+        """Сервер продолжает отвечать, но новые обновления получают 503 и будут доставлены повторно"""
+        self._accepting = False
+
+    async def stop(self):
+        """Перестает принимать обновления и закрывает сервер"""
+        self.stop_accepting()
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
+        logger.info("Webhook server stopped")
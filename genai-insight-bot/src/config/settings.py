@@ -6,12 +6,84 @@ load_dotenv()
 class Settings:
     # Telegram Bot
     BOT_TOKEN = os.getenv('BOT_TOKEN')
+    # Адрес Bot API можно переопределить, например на локальный фейковый сервер для тестов
+    TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+    TELEGRAM_FILE_URL = os.getenv('TELEGRAM_FILE_URL', 'https://api.telegram.org/file/bot')
+    
+    # Режим получения обновлений: polling или webhook
+    BOT_MODE = os.getenv('BOT_MODE', 'polling')
+    WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Публичный адрес, например https://bot.example.com
+    WEBHOOK_PATH = os.getenv('WEBHOOK_PATH', '/telegram')
+    WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8443'))
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40'))
+    # Сертификат для прямого HTTPS; за reverse proxy оставьте пустым
+    WEBHOOK_CERT = os.getenv('WEBHOOK_CERT')
+    WEBHOOK_KEY = os.getenv('WEBHOOK_KEY')
+    SHUTDOWN_TIMEOUT = float(os.getenv('SHUTDOWN_TIMEOUT', '30'))
+    
+    # Concurrency: обновления разных пользователей обрабатываются параллельно
+    MAX_CONCURRENT_UPDATES = int(os.getenv('MAX_CONCURRENT_UPDATES', '8'))
+    MAX_PENDING_UPDATES = int(os.getenv('MAX_PENDING_UPDATES', '256'))
+    
+    # Метрики в формате Prometheus на локальном /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    METRICS_LISTEN = os.getenv('METRICS_LISTEN', '127.0.0.1')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '9108'))
+
+    # Трассировка обновлений: спаны обработчик -> БД -> анализ -> графики -> Telegram в локальный файл
+    TRACING_ENABLED = os.getenv('TRACING_ENABLED', 'false').lower() in ('1', 'true', 'yes')
+    TRACE_FILE = os.getenv('TRACE_FILE', './traces.jsonl')
+    TRACE_FORMAT = os.getenv('TRACE_FORMAT', 'jsonl')  # jsonl или otlp (OTLP/JSON, по строке на трассу)
+    TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', '1.0'))
+    
+    # Фоновый импорт файлов
+    IMPORT_DIR = os.getenv('IMPORT_DIR', './imports')
+    IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', '2'))
+    IMPORT_CHUNK_SIZE = int(os.getenv('IMPORT_CHUNK_SIZE', '500'))
+    IMPORT_PROGRESS_INTERVAL = float(os.getenv('IMPORT_PROGRESS_INTERVAL', '2'))
+    EXCEL_PROCESSES = int(os.getenv('EXCEL_PROCESSES', '0'))  # 0 - по числу ядер
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '5000'))
     
     # Database - теперь только SQLite
     DATABASE_URL = os.getenv('DATABASE_URL', 'sqlite:///./genai_experts.db')
     
-    # G4F Configuration
-    G4F_PROVIDER = os.getenv('G4F_PROVIDER', 'g4f.Provider.Bing')
+    # LLM: g4f или любой OpenAI-совместимый сервер (vLLM, llama.cpp); через запятую - несколько бэкендов
+    LLM_BACKEND = os.getenv('LLM_BACKEND', 'g4f')
+    G4F_PROVIDER = os.getenv('G4F_PROVIDER', 'g4f.Provider.OpenaiChat')
+    G4F_MODEL = os.getenv('G4F_MODEL', 'gpt-4')
+    LLM_BASE_URL = os.getenv('LLM_BASE_URL', 'http://localhost:8000/v1')
+    LLM_MODEL = os.getenv('LLM_MODEL', 'local-model')
+    LLM_API_KEY = os.getenv('LLM_API_KEY')
+    LLM_TEMPERATURE = float(os.getenv('LLM_TEMPERATURE', '0.2'))
+    LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', '60'))
+    LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', '5'))
+    LLM_MAX_CONNECTIONS = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+    LLM_KEEPALIVE = float(os.getenv('LLM_KEEPALIVE', '60'))  # Сколько секунд держать простаивающее соединение
+    STREAM_EDIT_INTERVAL = float(os.getenv('STREAM_EDIT_INTERVAL', '1.5'))  # Пауза между правками потокового ответа
+    LLM_HEDGING = os.getenv('LLM_HEDGING', 'true').lower() in ('1', 'true', 'yes')
+    LLM_HEDGE_DELAY = float(os.getenv('LLM_HEDGE_DELAY', '10'))  # Задержка дубля, пока не накоплена статистика p95
+    ENRICH_PUBLICATIONS = os.getenv('ENRICH_PUBLICATIONS', 'true').lower() in ('1', 'true', 'yes')
+    ENRICH_BATCH_SIZE = int(os.getenv('ENRICH_BATCH_SIZE', '10'))
+    ENRICH_RETRY_DELAY = float(os.getenv('ENRICH_RETRY_DELAY', '60'))  # Пауза, если LLM недоступна
+    LLM_MAX_PROMPT_TOKENS = int(os.getenv('LLM_MAX_PROMPT_TOKENS', '3000'))  # Длиннее - текст делится на блоки
+    LLM_MAX_CHUNKS = int(os.getenv('LLM_MAX_CHUNKS', '8'))  # Сколько блоков одного текста анализировать максимум
+    LOCAL_EXTRACTION = os.getenv('LOCAL_EXTRACTION', 'true').lower() in ('1', 'true', 'yes')
+    LOCAL_MIN_MATCHES = int(os.getenv('LOCAL_MIN_MATCHES', '2'))  # Меньше совпадений словаря - текст уходит в LLM
+    LLM_PACKING = os.getenv('LLM_PACKING', 'true').lower() in ('1', 'true', 'yes')
+    LLM_PACK_TOKENS = int(os.getenv('LLM_PACK_TOKENS', '2000'))  # Бюджет текстов в одном упакованном запросе
+    LLM_PACK_MAX_ITEMS = int(os.getenv('LLM_PACK_MAX_ITEMS', '10'))
+    TREND_CHUNK_TOKENS = int(os.getenv('TREND_CHUNK_TOKENS', '3000'))  # Размер блока публикаций на один запрос
+    TREND_MAX_CALLS = int(os.getenv('TREND_MAX_CALLS', '16'))
+    TREND_CONCURRENCY = int(os.getenv('TREND_CONCURRENCY', '4'))
+    COMPETITION_CONCURRENCY = int(os.getenv('COMPETITION_CONCURRENCY', '3'))
+    COMPETITION_SECTION_TIMEOUT = float(os.getenv('COMPETITION_SECTION_TIMEOUT', '90'))
+    
+    # Semantic Search
+    SEMANTIC_SEARCH = os.getenv('SEMANTIC_SEARCH', 'false').lower() in ('1', 'true', 'yes')
+    VECTOR_STORE_DIR = os.getenv('VECTOR_STORE_DIR', './vector_store')
+    SEMANTIC_TOP_K = int(os.getenv('SEMANTIC_TOP_K', '50'))
     
     # App Settings
     MAX_RECOMMENDATIONS = 5
@@ -1,4 +1,4 @@
-from .models import Base, Person, Publication
+from .models import Base, Person, Publication, ExpertScore, ImportJob, Upload
 from .operations import DatabaseManager, db
 
-__all__ = ['Base', 'Person', 'Publication', 'DatabaseManager', 'db']
\ No newline at end of file
+__all__ = ['Base', 'Person', 'Publication', 'ExpertScore', 'ImportJob', 'Upload', 'DatabaseManager', 'db']
\ No newline at end of file
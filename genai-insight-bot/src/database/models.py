@@ -1,11 +1,15 @@
-from sqlalchemy import Column, Integer, String, Text, JSON, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, JSON, DateTime, ForeignKey
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import relationship
+from sqlalchemy.orm import relationship, validates
 from datetime import datetime
 import json
 
 Base = declarative_base()
 
+def normalize_name(name: str) -> str:
+    """Приводит имя эксперта к ключу для поиска и дедупликации"""
+    return (name or "").lower().strip()
+
 class User(Base):
     __tablename__ = 'users'
     
@@ -26,15 +30,22 @@ class Person(Base):
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
     name = Column(String(200), nullable=False)
+    normalized_name = Column(String(200), index=True)  # lower(strip(name)) для поиска по имени
     position = Column(String(200))
     company = Column(String(200))
     skills = Column(JSON, default=list)  # Список навыков
     projects = Column(JSON, default=list)  # Список проектов
     social_links = Column(JSON, default=dict)  # Соцсети
+    row_hash = Column(String(32), index=True)  # Хеш исходной строки импорта: повторы не вставляются
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Связь с пользователем
     user = relationship("User", back_populates="people")
+    
+    @validates('name')
+    def _set_normalized_name(self, key, name):
+        self.normalized_name = normalize_name(name)
+        return name
 
 class Publication(Base):
     __tablename__ = 'publications'
@@ -45,7 +56,70 @@ class Publication(Base):
     content = Column(Text)
     source = Column(String(100))
     g4f_analysis = Column(JSON, default=dict)
+    analyzed_at = Column(DateTime, index=True)  # NULL - публикация еще ждет фонового анализа
+    row_hash = Column(String(32), index=True)  # Хеш строки импорта, из которой взята публикация
     created_at = Column(DateTime, default=datetime.utcnow)
     
     # Связь с пользователем
-    user = relationship("User", back_populates="publications")
\ No newline at end of file
+    user = relationship("User", back_populates="publications")
+
+class ExpertScore(Base):
+    __tablename__ = 'expert_scores'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    person_id = Column(Integer, ForeignKey('people.id'), nullable=False, unique=True, index=True)
+    
+    # Исходные метрики
+    skills_count = Column(Integer, default=0)
+    projects_count = Column(Integer, default=0)
+    publications_count = Column(Integer, default=0)
+    centrality = Column(Integer, default=0)  # Степень узла в графе общих навыков
+    
+    # Перцентили по базе пользователя, шкала 0-10
+    skills_score = Column(Float, default=0)
+    experience_score = Column(Float, default=0)
+    projects_score = Column(Float, default=0)
+    publications_score = Column(Float, default=0)
+    influence_score = Column(Float, default=0)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+class ImportJob(Base):
+    __tablename__ = 'import_jobs'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    chat_id = Column(String(100), nullable=False)
+    message_id = Column(Integer)  # Сообщение с прогрессом, которое редактирует воркер
+    filename = Column(String(255), nullable=False)
+    file_path = Column(String(500), nullable=False)  # Копия файла для возобновления после перезапуска
+    file_unique_id = Column(String(100))  # Telegram file_unique_id загруженного документа
+    status = Column(String(20), default='queued', index=True)  # queued, running, done, failed, cancelled, duplicate
+    
+    total_rows = Column(Integer)
+    rows_done = Column(Integer, default=0)  # Строки последнего закоммиченного блока
+    experts_added = Column(Integer, default=0)
+    publications_added = Column(Integer, default=0)
+    duplicates_skipped = Column(Integer, default=0)  # Строки, уже импортированные раньше
+    errors = Column(JSON, default=list)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+    
+    # Воркеру нужен telegram_id владельца, поэтому пользователь загружается вместе с задачей
+    user = relationship("User", lazy='joined')
+
+class Upload(Base):
+    """Журнал импортированных файлов: повторная загрузка того же файла не импортируется заново"""
+    __tablename__ = 'uploads'
+    
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey('users.id'), nullable=False, index=True)
+    file_unique_id = Column(String(100), index=True)
+    content_hash = Column(String(64), nullable=False, index=True)  # sha256 содержимого
+    filename = Column(String(255))
+    job_id = Column(Integer, ForeignKey('import_jobs.id'))
+    experts_added = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
@@ -1,19 +1,83 @@
-from sqlalchemy import create_engine, and_
+from sqlalchemy import create_engine, and_, or_, event, func, inspect, select, text, update
 from sqlalchemy.orm import sessionmaker
-from .models import Base, Person, Publication, User
+from .models import Base, Person, Publication, User, ExpertScore, ImportJob, Upload, normalize_name
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
 from config.settings import settings
+from monitoring.metrics import registry
+from monitoring.tracing import current_span, trace_methods
 import json
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
+QUERY_SECONDS = registry.histogram('db_query_duration_seconds', 'Время выполнения SQL-запроса', ['operation'])
+QUERY_ERRORS = registry.counter('db_query_errors_total', 'SQL-запросы, завершившиеся ошибкой', ['operation'])
+
+def _operation(statement: str) -> str:
+    words = statement.split(None, 1)
+    return words[0].upper() if words else 'OTHER'
+
+def _escape_like(value: str) -> str:
+    """Экранирует спецсимволы LIKE (%, _ и обратную косую черту), чтобы они искались в имени буквально"""
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+# Вызовы менеджера - спаны трассы; get_session отдает сессию наружу, время ее запросов - в спане вызывающего
+@trace_methods('db', exclude=('get_session', 'init_db'))
 class DatabaseManager:
     def __init__(self):
         self.engine = create_engine(settings.DATABASE_URL)
         self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+        self._instrument_engine()
+    
+    def _instrument_engine(self):
+        """Число и время SQL-запросов по типу операции (SELECT, INSERT, ...) для /metrics"""
+        @event.listens_for(self.engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_started', []).append(time.perf_counter())
+        
+        @event.listens_for(self.engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info['query_started'].pop()
+            QUERY_SECONDS.observe(time.perf_counter() - started, operation=_operation(statement))
+            span = current_span()
+            if span:
+                span.incr('db.queries')
+        
+        @event.listens_for(self.engine, 'handle_error')
+        def handle_error(context):
+            started = context.connection.info.get('query_started') if context.connection is not None else None
+            if started:
+                started.pop()
+            QUERY_ERRORS.inc(operation=_operation(context.statement or ''))
     
     def init_db(self):
         Base.metadata.create_all(bind=self.engine)
+        self._upgrade_schema()
+    
+    def _upgrade_schema(self):
+        """Добавляет в существующие таблицы новые столбцы и индексы (create_all их не создает)"""
+        inspector = inspect(self.engine)
+        with self.engine.begin() as connection:
+            for table in Base.metadata.sorted_tables:
+                existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+                for column in table.columns:
+                    if column.name not in existing_columns:
+                        column_type = column.type.compile(dialect=self.engine.dialect)
+                        connection.execute(text(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}'))
+                        logger.info(f"Added column {table.name}.{column.name}")
+                for index in table.indexes:
+                    index.create(bind=connection, checkfirst=True)
+            
+            # SQLite lower() не понимает кириллицу, поэтому нормализуем имена в Python
+            rows = connection.execute(text('SELECT id, name FROM people WHERE normalized_name IS NULL')).fetchall()
+            if rows:
+                connection.execute(
+                    text('UPDATE people SET normalized_name = :normalized_name WHERE id = :id'),
+                    [{'id': row.id, 'normalized_name': normalize_name(row.name)} for row in rows]
+                )
+                logger.info(f"Backfilled normalized_name for {len(rows)} people")
     
     def get_session(self):
         return self.SessionLocal()
@@ -86,6 +150,40 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_people_by_names(self, telegram_id: str, names: List[str]) -> Dict[str, Person]:
+        """Находит нескольких экспертов: индексный IN по точному имени, частичное совпадение - только для ненайденных"""
+        normalized = [normalize_name(name) for name in names]
+        result = {name: None for name in names}
+        keys = sorted({key for key in normalized if key})
+        if not keys:
+            return result
+        
+        session = self.get_session()
+        try:
+            people = session.query(Person).join(User, Person.user_id == User.id).filter(
+                User.telegram_id == str(telegram_id)
+            )
+            found: Dict[str, Person] = {}
+            for person in people.filter(Person.normalized_name.in_(keys)).order_by(Person.id).all():
+                found.setdefault(person.normalized_name, person)
+            
+            missing = [key for key in keys if key not in found]
+            if missing:
+                # LIKE с ведущим % не использует индекс, поэтому выполняется только для имен без точного совпадения
+                candidates = people.filter(
+                    or_(*(Person.normalized_name.like(f"%{_escape_like(key)}%", escape='\\') for key in missing))
+                ).order_by(Person.id).all()
+                for key in missing:
+                    partial = next((p for p in candidates if key in (p.normalized_name or '')), None)
+                    if partial:
+                        found[key] = partial
+            
+            for name, key in zip(names, normalized):
+                result[name] = found.get(key) if key else None
+            return result
+        finally:
+            session.close()
+    
     def get_all_people(self, telegram_id: str):
         """Получает всех экспертов пользователя"""
         return self.get_user_people(telegram_id)
@@ -113,7 +211,8 @@ class DatabaseManager:
                 expert_name=expert_name,
                 content=content,
                 source=source,
-                g4f_analysis=g4f_analysis or {}
+                g4f_analysis=g4f_analysis or {},
+                analyzed_at=datetime.utcnow() if g4f_analysis else None
             )
             session.add(publication)
             session.commit()
@@ -137,16 +236,311 @@ class DatabaseManager:
         finally:
             session.close()
     
+    def get_user_publications(self, telegram_id: str):
+        """Получает все публикации пользователя"""
+        session = self.get_session()
+        try:
+            user = session.query(User).filter(User.telegram_id == str(telegram_id)).first()
+            if user:
+                return session.query(Publication).filter(Publication.user_id == user.id).all()
+            return []
+        finally:
+            session.close()
+
+    def iter_user_rows(self, telegram_id: str, columns: list, batch_size: int = 1000) -> Iterator[List[dict]]:
+        """Отдает строки пользователя блоками через курсор (yield_per), не загружая таблицу в память"""
+        session = self.get_session()
+        try:
+            user = session.query(User).filter(User.telegram_id == str(telegram_id)).first()
+            if not user:
+                return
+            
+            model = columns[0].class_
+            result = session.execute(
+                select(*columns).where(model.user_id == user.id).order_by(model.id)
+                .execution_options(yield_per=batch_size)
+            )
+            for rows in result.partitions():
+                yield [dict(row._mapping) for row in rows]
+        finally:
+            session.close()
+
+    def get_dataset_version(self, telegram_id: str) -> str:
+        """Возвращает отпечаток текущей версии данных пользователя для инвалидации кэшей"""
+        session = self.get_session()
+        try:
+            user = session.query(User).filter(User.telegram_id == str(telegram_id)).first()
+            if not user:
+                return "empty"
+
+            parts = []
+            for model in (Person, Publication):
+                count, max_id, last_created = session.query(
+                    func.count(model.id), func.max(model.id), func.max(model.created_at)
+                ).filter(model.user_id == user.id).one()
+                parts.append(f"{count}:{max_id or 0}:{last_created.isoformat() if last_created else ''}")
+            return "|".join(parts)
+        finally:
+            session.close()
+
+    def get_publication_counts(self, telegram_id: str) -> Dict[str, int]:
+        """Считает публикации по нормализованному имени эксперта"""
+        session = self.get_session()
+        try:
+            rows = session.query(Publication.expert_name, func.count(Publication.id)).join(
+                User, Publication.user_id == User.id
+            ).filter(User.telegram_id == str(telegram_id)).group_by(Publication.expert_name).all()
+            
+            counts = {}
+            for expert_name, count in rows:
+                key = normalize_name(expert_name)
+                counts[key] = counts.get(key, 0) + count
+            return counts
+        finally:
+            session.close()
+    
+    def get_expert_scores(self, telegram_id: str, person_ids: List[int] = None) -> Dict[int, ExpertScore]:
+        """Возвращает предрасчитанные оценки экспертов пользователя"""
+        session = self.get_session()
+        try:
+            query = session.query(ExpertScore).join(User, ExpertScore.user_id == User.id).filter(
+                User.telegram_id == str(telegram_id)
+            )
+            if person_ids is not None:
+                query = query.filter(ExpertScore.person_id.in_(person_ids))
+            return {score.person_id: score for score in query.all()}
+        finally:
+            session.close()
+    
+    def replace_expert_scores(self, telegram_id: str, rows: List[dict]):
+        """Перезаписывает таблицу оценок пользователя одной транзакцией"""
+        session = self.get_session()
+        try:
+            user = self.get_or_create_user(telegram_id)
+            session.query(ExpertScore).filter(ExpertScore.user_id == user.id).delete()
+            session.bulk_insert_mappings(ExpertScore, [dict(row, user_id=user.id) for row in rows])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def create_import_job(self, telegram_id: str, chat_id: str, filename: str, file_path: str,
+                          file_unique_id: str = None) -> ImportJob:
+        """Создает задачу фонового импорта файла"""
+        session = self.get_session()
+        try:
+            user = self.get_or_create_user(telegram_id)
+            job = ImportJob(
+                user_id=user.id,
+                chat_id=str(chat_id),
+                filename=filename,
+                file_path=file_path,
+                file_unique_id=file_unique_id,
+                errors=[]
+            )
+            session.add(job)
+            session.commit()
+            session.refresh(job)
+            return job
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def get_import_job(self, job_id: int) -> Optional[ImportJob]:
+        session = self.get_session()
+        try:
+            return session.get(ImportJob, job_id)
+        finally:
+            session.close()
+    
+    def update_import_job(self, job_id: int, **fields):
+        """Обновляет поля задачи импорта"""
+        session = self.get_session()
+        try:
+            fields['updated_at'] = datetime.utcnow()
+            session.query(ImportJob).filter(ImportJob.id == job_id).update(fields)
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def get_unfinished_import_jobs(self) -> List[ImportJob]:
+        """Задачи, прерванные перезапуском или ожидающие в очереди, в порядке создания"""
+        session = self.get_session()
+        try:
+            return session.query(ImportJob).filter(
+                ImportJob.status.in_(['queued', 'running'])
+            ).order_by(ImportJob.id).all()
+        finally:
+            session.close()
+    
+    def get_active_import_jobs(self, telegram_id: str) -> List[ImportJob]:
+        session = self.get_session()
+        try:
+            return session.query(ImportJob).join(User, ImportJob.user_id == User.id).filter(
+                and_(User.telegram_id == str(telegram_id), ImportJob.status.in_(['queued', 'running']))
+            ).order_by(ImportJob.id).all()
+        finally:
+            session.close()
+    
+    def add_import_chunk(self, telegram_id: str, people: List[dict], publications: List[dict],
+                         job_id: int = None, rows_done: int = None, errors: List[str] = None) -> Tuple[int, int, int]:
+        """Сохраняет блок строк импорта и продвигает задачу одной транзакцией
+        
+        Прогресс задачи фиксируется вместе с данными, поэтому после перезапуска
+        импорт продолжается ровно с первой незакоммиченной строки. Строки, чей
+        row_hash уже есть у пользователя, пропускаются. Возвращает число
+        добавленных экспертов, публикаций и пропущенных повторов.
+        """
+        session = self.get_session()
+        try:
+            user = self.get_or_create_user(telegram_id)
+            
+            received = len(people)
+            hashes = [person['row_hash'] for person in people if person.get('row_hash')]
+            if hashes:
+                existing = {row_hash for row_hash, in session.query(Person.row_hash).filter(
+                    Person.user_id == user.id, Person.row_hash.in_(hashes)
+                )}
+                publications = [pub for pub in publications if pub.get('row_hash') not in existing]
+                # Повторы внутри блока тоже пропускаем: остается первое вхождение строки
+                unique = []
+                for person in people:
+                    row_hash = person.get('row_hash')
+                    if row_hash in existing:
+                        continue
+                    if row_hash:
+                        existing.add(row_hash)
+                    unique.append(person)
+                people = unique
+            skipped = received - len(people)
+            
+            session.add_all(Person(user_id=user.id, **person) for person in people)
+            session.add_all(Publication(user_id=user.id, **publication) for publication in publications)
+            
+            if job_id is not None:
+                job = session.get(ImportJob, job_id)
+                job.rows_done = rows_done
+                job.experts_added = (job.experts_added or 0) + len(people)
+                job.publications_added = (job.publications_added or 0) + len(publications)
+                job.duplicates_skipped = (job.duplicates_skipped or 0) + skipped
+                if errors:
+                    job.errors = (job.errors or []) + errors
+                job.updated_at = datetime.utcnow()
+            
+            session.commit()
+            return len(people), len(publications), skipped
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def get_pending_publications(self, limit: int) -> List[Tuple[int, str, str]]:
+        """Публикации, еще не прошедшие фоновый анализ: (id, текст, telegram_id владельца) в порядке добавления"""
+        session = self.get_session()
+        try:
+            return [tuple(row) for row in session.query(Publication.id, Publication.content, User.telegram_id).join(
+                User, Publication.user_id == User.id
+            ).filter(Publication.analyzed_at.is_(None)).order_by(Publication.id).limit(limit)]
+        finally:
+            session.close()
+    
+    def save_publication_analyses(self, analyses: Dict[int, dict]):
+        """Записывает результаты анализа публикаций одним пакетным UPDATE по первичному ключу"""
+        if not analyses:
+            return
+        session = self.get_session()
+        try:
+            analyzed_at = datetime.utcnow()
+            session.execute(update(Publication), [
+                {'id': publication_id, 'g4f_analysis': analysis, 'analyzed_at': analyzed_at}
+                for publication_id, analysis in analyses.items()
+            ])
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
+    def get_vocabulary_since(self, telegram_id: str, last_id: int = 0,
+                             batch_size: int = 1000) -> Iterator[List[Tuple[int, str, str, list]]]:
+        """Имена, компании и навыки экспертов пользователя с id больше last_id блоками: словарь локального извлечения"""
+        session = self.get_session()
+        try:
+            result = session.execute(
+                select(Person.id, Person.name, Person.company, Person.skills)
+                .join(User, Person.user_id == User.id)
+                .where(and_(User.telegram_id == str(telegram_id), Person.id > last_id))
+                .order_by(Person.id).execution_options(yield_per=batch_size)
+            )
+            for rows in result.partitions():
+                yield [tuple(row) for row in rows]
+        finally:
+            session.close()
+    
+    def get_upload(self, telegram_id: str, file_unique_id: str = None, content_hash: str = None) -> Optional[Upload]:
+        """Ищет в журнале загрузок файл пользователя по file_unique_id или хешу содержимого"""
+        session = self.get_session()
+        try:
+            query = session.query(Upload).join(User, Upload.user_id == User.id).filter(
+                User.telegram_id == str(telegram_id)
+            )
+            if file_unique_id:
+                query = query.filter(Upload.file_unique_id == file_unique_id)
+            elif content_hash:
+                query = query.filter(Upload.content_hash == content_hash)
+            else:
+                return None
+            return query.order_by(Upload.id.desc()).first()
+        finally:
+            session.close()
+    
+    def add_upload(self, telegram_id: str, content_hash: str, filename: str, file_unique_id: str = None,
+                   job_id: int = None, experts_added: int = 0) -> Upload:
+        """Записывает полностью импортированный файл в журнал загрузок"""
+        session = self.get_session()
+        try:
+            user = self.get_or_create_user(telegram_id)
+            upload = Upload(
+                user_id=user.id,
+                file_unique_id=file_unique_id,
+                content_hash=content_hash,
+                filename=filename,
+                job_id=job_id,
+                experts_added=experts_added
+            )
+            session.add(upload)
+            session.commit()
+            session.refresh(upload)
+            return upload
+        except Exception as e:
+            session.rollback()
+            raise e
+        finally:
+            session.close()
+    
     def clear_database(self, telegram_id: str):
         """Очищает базу данных для конкретного пользователя"""
         session = self.get_session()
         try:
             user = session.query(User).filter(User.telegram_id == str(telegram_id)).first()
             if user:
+                # Удаляем предрасчитанные оценки (ссылаются на экспертов)
+                session.query(ExpertScore).filter(ExpertScore.user_id == user.id).delete()
                 # Удаляем всех экспертов пользователя
                 session.query(Person).filter(Person.user_id == user.id).delete()
                 # Удаляем все публикации пользователя
                 session.query(Publication).filter(Publication.user_id == user.id).delete()
+                # Журнал загрузок тоже сбрасываем: после очистки те же файлы можно загрузить заново
+                session.query(Upload).filter(Upload.user_id == user.id).delete()
                 session.commit()
                 return True
             return False
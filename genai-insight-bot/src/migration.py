@@ -29,8 +29,10 @@ def run_migration():
         print("✅ Миграция успешно завершена!")
         print("📊 Новая структура базы:")
         print("   • Таблица users - данные пользователей")
-        print("   • Таблица people - эксперты (с привязкой к пользователю)")
+        print("   • Таблица people - эксперты (с привязкой к пользователю и индексом по имени)")
         print("   • Таблица publications - публикации (с привязкой к пользователю)")
+        print("   • Таблица import_jobs - очередь фонового импорта файлов")
+        print("   • Таблица uploads - журнал загруженных файлов для пропуска повторов")
         print("   • Полная изоляция данных между пользователями")
         
     except Exception as e:
@@ -0,0 +1,9 @@
+"""
+Monitoring module: metrics exported in Prometheus format and request tracing
+"""
+
+from .metrics import MetricsRegistry, MetricsServer, registry, timed
+from .tracing import Tracer, current_span, span, traced, tracer
+
+__all__ = ['MetricsRegistry', 'MetricsServer', 'registry', 'timed',
+           'Tracer', 'current_span', 'span', 'traced', 'tracer']
@@ -0,0 +1,134 @@
+import argparse
+import json
+import sys
+import time
+from typing import Any, Dict, List, Optional
+from config.settings import settings
+
+def load_traces(path: str) -> Dict[str, List[Dict[str, Any]]]:
+    """Спаны из файла (JSONL или OTLP), сгруппированные по trace_id"""
+    traces: Dict[str, List[Dict[str, Any]]] = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'resourceSpans' not in record:
+                traces.setdefault(record['trace_id'], []).append(record)
+                continue
+            for resource in record['resourceSpans']:
+                for scope in resource.get('scopeSpans', []):
+                    for item in scope.get('spans', []):
+                        start = int(item['startTimeUnixNano'])
+                        traces.setdefault(item['traceId'], []).append({
+                            'trace_id': item['traceId'],
+                            'span_id': item['spanId'],
+                            'parent_id': item.get('parentSpanId'),
+                            'name': item['name'],
+                            'start': start / 1e9,
+                            'duration': (int(item['endTimeUnixNano']) - start) / 1e9,
+                            'status': item.get('status', {}).get('message') or 'ok',
+                            'attributes': {attr['key']: next(iter(attr['value'].values()))
+                                           for attr in item.get('attributes', [])}
+                        })
+    return traces
+
+class StageNode:
+    """Узел flame-сводки: одноименные спаны одного родителя складываются"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self.children: Dict[str, 'StageNode'] = {}
+
+    @property
+    def self_time(self) -> float:
+        return max(0.0, self.total - sum(child.total for child in self.children.values()))
+
+def _build_tree(spans: List[Dict[str, Any]]) -> StageNode:
+    by_parent: Dict[Optional[str], List[Dict[str, Any]]] = {}
+    ids = {span['span_id'] for span in spans}
+    for span in spans:
+        parent = span['parent_id'] if span['parent_id'] in ids else None
+        by_parent.setdefault(parent, []).append(span)
+
+    root = StageNode('trace')
+
+    def add(node: StageNode, span: Dict[str, Any]):
+        child = node.children.setdefault(span['name'], StageNode(span['name']))
+        child.count += 1
+        child.total += span['duration']
+        for nested in by_parent.get(span['span_id'], []):
+            add(child, nested)
+
+    for span in by_parent.get(None, []):
+        add(root, span)
+    root.total = sum(child.total for child in root.children.values())
+    return root
+
+def _render_tree(node: StageNode, scale: float, depth: int = 0, width: int = 30) -> List[str]:
+    lines = []
+    for child in sorted(node.children.values(), key=lambda item: item.total, reverse=True):
+        bar = '█' * max(1, round(child.total / scale * width)) if scale else ''
+        count = f' ×{child.count}' if child.count > 1 else ''
+        label = f"{'  ' * depth}{child.name}{count}"
+        lines.append(f"  {label:<48} {child.total * 1000:9.1f} ms  self {child.self_time * 1000:8.1f} ms  {bar}")
+        lines.extend(_render_tree(child, scale, depth + 1, width))
+    return lines
+
+def summarize(traces: Dict[str, List[Dict[str, Any]]], top: int = 5, name: str = None) -> str:
+    """Самые медленные трассы по длительности корневого спана, у каждой - дерево этапов"""
+    roots = []
+    for trace_id, spans in traces.items():
+        root = next((span for span in spans if not span['parent_id']), None)
+        if root and (not name or root['name'] == name):
+            roots.append((root, spans))
+    roots.sort(key=lambda item: item[0]['duration'], reverse=True)
+    if not roots:
+        return 'No traces found'
+
+    lines = []
+    stages: Dict[str, List[float]] = {}
+    for root, spans in roots[:top]:
+        started = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(root['start']))
+        lines.append(f"{root['name']}  {root['duration'] * 1000:.1f} ms  {started}  "
+                     f"trace={root['trace_id']}  status={root['status']}")
+        tree = _build_tree(spans)
+        lines.extend(_render_tree(tree, tree.total))
+        lines.append('')
+
+        def collect(node: StageNode):
+            for child in node.children.values():
+                stage = stages.setdefault(child.name, [0, 0.0])
+                stage[0] += child.count
+                stage[1] += child.self_time
+                collect(child)
+        collect(tree)
+
+    total_self = sum(stage[1] for stage in stages.values()) or 1.0
+    lines.append(f'Self time by stage across {min(top, len(roots))} slowest of {len(roots)} traces:')
+    for stage_name, (count, self_time) in sorted(stages.items(), key=lambda item: item[1][1], reverse=True):
+        lines.append(f"  {stage_name:<48} {self_time * 1000:9.1f} ms  {self_time / total_self:6.1%}  calls {count}")
+    return '\n'.join(lines)
+
+def main(argv: List[str] = None):
+    parser = argparse.ArgumentParser(description='Flame summary of the slowest request traces')
+    parser.add_argument('file', nargs='?', default=settings.TRACE_FILE, help='trace file (JSONL or OTLP JSON lines)')
+    parser.add_argument('--top', type=int, default=5, help='number of slowest traces to show')
+    parser.add_argument('--name', help='only traces with this root span, e.g. handler.recommend_command')
+    args = parser.parse_args(argv)
+    try:
+        traces = load_traces(args.file)
+    except FileNotFoundError:
+        print(f'Trace file not found: {args.file}', file=sys.stderr)
+        return 1
+    print(summarize(traces, args.top, args.name))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
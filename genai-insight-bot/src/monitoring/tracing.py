@@ -0,0 +1,205 @@
+import asyncio
+import functools
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = 'genai-insight-bot'
+TRACE_FORMATS = ('jsonl', 'otlp')
+
+class Span:
+    """Участок обработки обновления: время, родитель и атрибуты"""
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], sampled: bool = True,
+                 attributes: Dict[str, Any] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.status = 'ok'
+        self.start = time.time()
+        self.duration = 0.0
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def incr(self, key: str, value: int = 1):
+        self.attributes[key] = self.attributes.get(key, 0) + value
+
+    def finish(self):
+        self.duration = time.perf_counter() - self._started
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'name': self.name,
+            'start': round(self.start, 6),
+            'duration': round(self.duration, 6),
+            'status': self.status,
+            'attributes': self.attributes
+        }
+
+    def to_otlp(self) -> Dict[str, Any]:
+        start = int(self.start * 1e9)
+        span = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': 1,
+            'startTimeUnixNano': str(start),
+            'endTimeUnixNano': str(start + int(self.duration * 1e9)),
+            'attributes': [{'key': key, 'value': _otlp_value(value)} for key, value in self.attributes.items()],
+            'status': {'code': 2 if self.status == 'error' else 1, 'message': '' if self.status == 'ok' else self.status}
+        }
+        if self.parent_id:
+            span['parentSpanId'] = self.parent_id
+        return span
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+_current_span: ContextVar[Optional[Span]] = ContextVar('current_span', default=None)
+
+def current_span() -> Optional[Span]:
+    """Активный записываемый спан текущей задачи или потока (None вне трассы)"""
+    span = _current_span.get()
+    return span if span is not None and span.sampled else None
+
+class Tracer:
+    """Трассировка обновлений: спаны наследуются через contextvars, в том числе в задачи и asyncio.to_thread
+
+    Трасса начинается с корневого спана (обработчик обновления); спаны вне трассы не создаются,
+    поэтому фоновые задачи ничего не пишут. Спаны трассы копятся в памяти и записываются в файл
+    одной порцией, когда завершается корневой спан.
+    """
+
+    def __init__(self, enabled: bool, path: str, fmt: str = 'jsonl', sample_rate: float = 1.0):
+        if fmt not in TRACE_FORMATS:
+            raise ValueError(f"Unknown trace format '{fmt}', expected one of: {', '.join(TRACE_FORMATS)}")
+        self.enabled = enabled
+        self.path = path
+        self.format = fmt
+        self.sample_rate = sample_rate
+        self._pending: Dict[str, List[Span]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name: str, root: bool = False, **attributes) -> Iterator[Optional[Span]]:
+        """Спан вокруг блока кода; вне трассы и при выключенной трассировке ничего не делает и отдает None"""
+        parent = _current_span.get()
+        if not self.enabled or (parent is None and not root) or (parent is not None and not parent.sampled):
+            yield None
+            return
+
+        if parent is None:
+            sampled = random.random() < self.sample_rate
+            span = Span(name, os.urandom(16).hex(), None, sampled, attributes)
+            if sampled:
+                self._start_trace(span.trace_id)
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, True, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span if span.sampled else None
+        except asyncio.CancelledError:
+            span.status = 'cancelled'
+            raise
+        except BaseException as e:
+            span.status = 'error'
+            span.attributes.setdefault('error', f'{e.__class__.__name__}: {e}'[:200])
+            raise
+        finally:
+            _current_span.reset(token)
+            span.finish()
+            if span.sampled:
+                self._finish(span)
+
+    def traced(self, name: str = None, root: bool = False):
+        """Декоратор: вызов синхронной или асинхронной функции оформляется спаном"""
+        def decorator(func):
+            span_name = name or func.__qualname__
+            if asyncio.iscoroutinefunction(func):
+                @functools.wraps(func)
+                async def async_wrapper(*args, **kwargs):
+                    with self.span(span_name, root=root):
+                        return await func(*args, **kwargs)
+                return async_wrapper
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(span_name, root=root):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def trace_methods(self, prefix: str, exclude=()):
+        """Декоратор класса: публичные методы получают спаны '<prefix>.<метод>'
+
+        Генераторы не оборачиваются - они отдают данные порциями уже после выхода из вызова.
+        """
+        def decorator(cls):
+            for attr, method in list(vars(cls).items()):
+                if attr.startswith('_') or attr in exclude or not inspect.isfunction(method):
+                    continue
+                if inspect.isgeneratorfunction(method) or inspect.isasyncgenfunction(method):
+                    continue
+                setattr(cls, attr, self.traced(f'{prefix}.{attr}')(method))
+            return cls
+        return decorator
+
+    def _finish(self, span: Span):
+        with self._lock:
+            if span.parent_id is not None:
+                if span.trace_id in self._pending:
+                    self._pending[span.trace_id].append(span)
+                    return
+                # Спан фоновой задачи, пережившей корневой спан, пишется отдельно
+                spans = [span]
+            else:
+                spans = self._pending.pop(span.trace_id, []) + [span]
+        self._export(spans)
+
+    def _start_trace(self, trace_id: str):
+        with self._lock:
+            self._pending.setdefault(trace_id, [])
+
+    def _export(self, spans: List[Span]):
+        if self.format == 'otlp':
+            lines = [json.dumps({'resourceSpans': [{
+                'resource': {'attributes': [{'key': 'service.name', 'value': {'stringValue': SERVICE_NAME}}]},
+                'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in spans]}]
+            }]}, ensure_ascii=False)]
+        else:
+            lines = [json.dumps(span.to_dict(), ensure_ascii=False) for span in spans]
+        try:
+            with self._lock:
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write('\n'.join(lines) + '\n')
+        except OSError as e:
+            logger.error(f"Failed to write traces to {self.path}: {e}")
+
+tracer = Tracer(settings.TRACING_ENABLED, settings.TRACE_FILE, settings.TRACE_FORMAT, settings.TRACE_SAMPLE_RATE)
+span = tracer.span
+traced = tracer.traced
+trace_methods = tracer.trace_methods
@@ -0,0 +1,82 @@
+from typing import Any, Dict, Iterator, List, Tuple, Union
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow необязателен: без него Parquet/Feather недоступны, экспорт - только NDJSON
+    pa = None
+
+COLUMNAR_EXTENSIONS = ['parquet', 'feather', 'arrow']
+
+Source = Union[bytes, str]
+
+def available() -> bool:
+    return pa is not None
+
+def _require():
+    if pa is None:
+        raise ValueError('Для Parquet/Feather на сервере нужен пакет pyarrow')
+
+def _open(source: Source):
+    return pa.BufferReader(source) if isinstance(source, (bytes, bytearray)) else source
+
+def batch_to_frame(batch, start: int = 0) -> pd.DataFrame:
+    """RecordBatch в DataFrame; столбцы-списки остаются списками Python, а не массивами numpy"""
+    columns = {}
+    for field, column in zip(batch.schema, batch.columns):
+        if pa.types.is_list(field.type) or pa.types.is_large_list(field.type):
+            columns[field.name] = column.to_pylist()
+        else:
+            columns[field.name] = column.to_pandas()
+    frame = pd.DataFrame(columns)
+    frame.index = range(start, start + batch.num_rows)
+    return frame
+
+def iter_batches(source: Source, filename: str, batch_size: int) -> Iterator[Tuple[pd.DataFrame, float]]:
+    """Блоки строк Parquet/Feather и доля прочитанных строк
+
+    Parquet читается по row group, Feather - через memory map: в памяти только текущий блок.
+    """
+    _require()
+    kind = 'Parquet' if filename.lower().endswith('.parquet') else 'Feather'
+    start = 0
+    try:
+        if kind == 'Parquet':
+            parquet_file = pq.ParquetFile(_open(source))
+            total = parquet_file.metadata.num_rows
+            batches = parquet_file.iter_batches(batch_size=batch_size)
+        else:
+            table = feather.read_table(_open(source), memory_map=isinstance(source, str))
+            total = table.num_rows
+            batches = table.to_batches(max_chunksize=batch_size)
+
+        for batch in batches:
+            if not batch.num_rows:
+                continue
+            yield batch_to_frame(batch, start), (start + batch.num_rows) / total
+            start += batch.num_rows
+    except pa.ArrowException as e:
+        raise ValueError(f'Ошибка чтения {kind}: {str(e)}')
+
+def read_frame(source: Source, filename: str) -> pd.DataFrame:
+    frames = [frame for frame, _ in iter_batches(source, filename, 64 * 1024)]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames) if len(frames) > 1 else frames[0]
+
+def _schema(columns: Dict[str, str]):
+    types = {'string': pa.string(), 'list': pa.list_(pa.string()), 'timestamp': pa.timestamp('us')}
+    return pa.schema([(name, types[kind]) for name, kind in columns.items()])
+
+def write_parquet(batches: Iterator[List[Dict[str, Any]]], path: str, columns: Dict[str, str]) -> int:
+    """Пишет блоки записей в Parquet по row group на блок; возвращает число строк"""
+    _require()
+    schema = _schema(columns)
+    rows = 0
+    with pq.ParquetWriter(path, schema, compression='zstd') as writer:
+        for batch in batches:
+            writer.write_batch(pa.RecordBatch.from_pylist(batch, schema=schema))
+            rows += len(batch)
+    return rows
@@ -0,0 +1,147 @@
+import io
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Union
+import pandas as pd
+
+try:
+    from python_calamine import CalamineWorkbook
+except ImportError:  # calamine необязателен, без него читаем через openpyxl
+    CalamineWorkbook = None
+
+logger = logging.getLogger(__name__)
+
+Source = Union[bytes, str]
+
+def _open(source: Source):
+    """Путь к файлу или содержимое в памяти"""
+    return io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source
+
+def _calamine(source: Source):
+    if isinstance(source, (bytes, bytearray)):
+        return CalamineWorkbook.from_filelike(io.BytesIO(source))
+    return CalamineWorkbook.from_path(source)
+
+def _engine(filename: str) -> str:
+    if CalamineWorkbook is not None:
+        return 'calamine'
+    # read_only-режим openpyxl понимает только xlsx; старый xls читает pandas (нужен xlrd)
+    return 'openpyxl' if not filename.lower().endswith('.xls') else 'pandas'
+
+def sheet_names(source: Source, filename: str) -> List[str]:
+    engine = _engine(filename)
+    if engine == 'calamine':
+        return _calamine(source).sheet_names
+    if engine == 'openpyxl':
+        from openpyxl import load_workbook
+        workbook = load_workbook(_open(source), read_only=True)
+        try:
+            return workbook.sheetnames
+        finally:
+            workbook.close()
+    return pd.ExcelFile(_open(source)).sheet_names
+
+def _rows_to_frame(rows) -> pd.DataFrame:
+    """Первая непустая строка - заголовок, полностью пустые строки пропускаются"""
+    header = None
+    data = []
+    for row in rows:
+        if all(value is None or value == '' for value in row):
+            continue
+        if header is None:
+            header = list(row)
+            continue
+        data.append(row)
+
+    if header is None:
+        return pd.DataFrame()
+
+    columns = []
+    seen: Dict[str, int] = {}
+    for position, name in enumerate(header):
+        name = f'Unnamed: {position}' if name is None or name == '' else str(name)
+        # Повторяющиеся заголовки переименовываем как pandas: name, name.1, ...
+        if name in seen:
+            seen[name] += 1
+            name = f'{name}.{seen[name]}'
+        else:
+            seen[name] = 0
+        columns.append(name)
+
+    width = len(columns)
+    data = [tuple(row[:width]) + (None,) * (width - len(row)) for row in data]
+    frame = pd.DataFrame.from_records(data, columns=columns)
+    # calamine отдает пустые ячейки как '', openpyxl - как None
+    return frame.mask(frame == '')
+
+def read_sheet(source: Source, filename: str, sheet: str) -> pd.DataFrame:
+    """Потоково читает один лист; функция верхнего уровня, чтобы ее можно было запустить в другом процессе"""
+    engine = _engine(filename)
+    if engine == 'calamine':
+        workbook = _calamine(source)
+        return _rows_to_frame(workbook.get_sheet_by_name(sheet).to_python(skip_empty_area=True))
+    if engine == 'openpyxl':
+        from openpyxl import load_workbook
+        workbook = load_workbook(_open(source), read_only=True, data_only=True)
+        try:
+            return _rows_to_frame(workbook[sheet].iter_rows(values_only=True))
+        finally:
+            workbook.close()
+    return pd.read_excel(_open(source), sheet_name=sheet)
+
+def read_workbook(source: Source, filename: str, processes: Optional[int] = None,
+                  parallel_min_bytes: int = 1024 ** 2) -> List[pd.DataFrame]:
+    """Читает все непустые листы книги, крупные многолистовые книги - параллельно по процессам
+
+    Лист в xlsx - один XML-поток, поэтому параллелизм возможен только между листами.
+    Процессы запускаются через spawn: fork из многопоточного бота небезопасен.
+    """
+    names = sheet_names(source, filename)
+    size = len(source) if isinstance(source, (bytes, bytearray)) else os.path.getsize(source)
+    processes = min(processes or os.cpu_count() or 1, len(names))
+
+    if processes > 1 and size >= parallel_min_bytes:
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context('spawn')) as pool:
+            frames = list(pool.map(read_sheet, [source] * len(names), [filename] * len(names), names))
+    else:
+        frames = [read_sheet(source, filename, name) for name in names]
+
+    logger.info(f"Read {filename}: {len(names)} sheets, engine {_engine(filename)}, processes {processes}")
+    return [frame for frame in frames if not frame.empty]
+
+def benchmark(rows: int = 200000, sheets: int = 4, path: str = None) -> Dict[str, float]:
+    """Сравнивает pd.read_excel со streaming-чтением на синтетической книге"""
+    from openpyxl import Workbook
+
+    path = path or os.path.join(os.getcwd(), 'excel_benchmark.xlsx')
+    workbook = Workbook(write_only=True)
+    per_sheet = rows // sheets
+    for index in range(sheets):
+        sheet = workbook.create_sheet(f'Sheet{index + 1}')
+        sheet.append(['name', 'position', 'company', 'skills', 'projects'])
+        for row in range(per_sheet):
+            number = index * per_sheet + row
+            sheet.append([f'Expert {number}', 'ML Engineer', f'Company {number % 500}',
+                          'Python, PyTorch, LLM', 'Project A; Project B'])
+    workbook.save(path)
+
+    results = {'rows': per_sheet * sheets, 'file_mb': os.path.getsize(path) / 1024 ** 2}
+    try:
+        started = time.perf_counter()
+        pd.read_excel(path, sheet_name=None, engine='openpyxl')
+        results['pandas_read_excel_s'] = time.perf_counter() - started
+
+        for label, processes in (('streaming_1_process_s', 1), ('streaming_parallel_s', None)):
+            started = time.perf_counter()
+            read_workbook(path, path, processes=processes)
+            results[label] = time.perf_counter() - started
+        results['engine'] = _engine(path)
+    finally:
+        os.remove(path)
+    return results
+
+if __name__ == '__main__':
+    print(benchmark())
@@ -0,0 +1,83 @@
+import gzip
+import json
+import logging
+import os
+from typing import Any, Dict, Iterator, List, Tuple
+from database.operations import db
+from database.models import Person, Publication
+from config.settings import settings
+from . import columnar
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = ['parquet', 'ndjson']
+SOCIAL_FIELDS = ['twitter', 'linkedin', 'github']
+
+# Столбцы выгрузки совпадают с полями импорта, поэтому файл загружается обратно без потерь
+PEOPLE_COLUMNS = {
+    'name': 'string', 'position': 'string', 'company': 'string',
+    'skills': 'list', 'projects': 'list',
+    'twitter': 'string', 'linkedin': 'string', 'github': 'string',
+    'created_at': 'timestamp'
+}
+PUBLICATION_COLUMNS = {
+    'expert_name': 'string', 'content': 'string', 'source': 'string',
+    'g4f_analysis': 'string', 'created_at': 'timestamp'
+}
+
+def _people(telegram_id: str) -> Iterator[List[Dict[str, Any]]]:
+    columns = [Person.name, Person.position, Person.company, Person.skills, Person.projects,
+               Person.social_links, Person.created_at]
+    for rows in db.iter_user_rows(telegram_id, columns, settings.EXPORT_BATCH_SIZE):
+        batch = []
+        for row in rows:
+            social_links = row.pop('social_links') or {}
+            row['skills'] = [str(skill) for skill in row['skills'] or []]
+            row['projects'] = [str(project) for project in row['projects'] or []]
+            for field in SOCIAL_FIELDS:
+                row[field] = social_links.get(field)
+            batch.append(row)
+        yield batch
+
+def _publications(telegram_id: str, as_text: bool) -> Iterator[List[Dict[str, Any]]]:
+    columns = [Publication.expert_name, Publication.content, Publication.source,
+               Publication.g4f_analysis, Publication.created_at]
+    for rows in db.iter_user_rows(telegram_id, columns, settings.EXPORT_BATCH_SIZE):
+        if as_text:
+            # Произвольный JSON анализа в Parquet хранится строкой: у записей разная структура
+            for row in rows:
+                row['g4f_analysis'] = json.dumps(row['g4f_analysis'] or {}, ensure_ascii=False)
+        yield rows
+
+def _write_ndjson(batches: Iterator[List[Dict[str, Any]]], path: str) -> int:
+    rows = 0
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        for batch in batches:
+            for record in batch:
+                f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+            rows += len(batch)
+    return rows
+
+def export_user_data(telegram_id: str, export_format: str, directory: str) -> List[Tuple[str, int]]:
+    """Выгружает экспертов и публикации пользователя в directory; возвращает пути и число строк
+
+    Строки читаются из базы блоками и сразу пишутся в файл: Parquet - по row group на блок,
+    NDJSON - со сжатием gzip.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f'Неподдерживаемый формат выгрузки: {export_format}')
+
+    files = []
+    for name, batches in (('experts', _people(telegram_id)),
+                          ('publications', _publications(telegram_id, export_format == 'parquet'))):
+        if export_format == 'parquet':
+            path = os.path.join(directory, f'{name}.parquet')
+            columns = PEOPLE_COLUMNS if name == 'experts' else PUBLICATION_COLUMNS
+            rows = columnar.write_parquet(batches, path, columns)
+        else:
+            path = os.path.join(directory, f'{name}.ndjson.gz')
+            rows = _write_ndjson(batches, path)
+        files.append((path, rows))
+
+    logger.info(f"Exported data of user {telegram_id} as {export_format}: {files}")
+    return files
@@ -1,12 +1,28 @@
 import pandas as pd
+import hashlib
+import itertools
 import json
 import logging
-from typing import Dict, List, Any
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, Iterator, List, Any, Tuple, Union
 import io
 from database.operations import db
+from config.settings import settings
+from .excel_reader import read_workbook
+from .json_stream import iter_json_records
+from . import columnar
 
 logger = logging.getLogger(__name__)
 
+JSON_EXTENSIONS = ['json', 'jsonl', 'ndjson']
+SOCIAL_FIELDS = ['twitter', 'linkedin', 'github']
+# Элементы списка в ячейке разделяются любым из , ; | и переводом строки
+LIST_SEPARATORS = r'\s*[,;|\n]\s*'
+EMPTY_LIST_ITEM = r'(?:^|[,;|\n])\s*(?:[,;|\n]|$)'
+
 class FileParser:
     def __init__(self):
         self.field_mapping = {
@@ -33,117 +49,259 @@ class FileParser:
     
     async def parse_file(self, file_content: bytes, filename: str, telegram_id: str) -> Dict[str, Any]:
         """Универсальный парсер файлов для конкретного пользователя"""
-        file_extension = filename.lower().split('.')[-1]
-        
         try:
-            if file_extension in ['csv', 'tsv']:
-                return await self._parse_delimited(file_content, filename, telegram_id)
-            elif file_extension in ['xlsx', 'xls']:
-                return await self._parse_excel(file_content, filename, telegram_id)
-            elif file_extension == 'json':
-                return await self._parse_json(file_content, filename, telegram_id)
-            else:
-                return {'error': f'Неподдерживаемый формат: {file_extension}'}
-                
+            df = self.load_dataframe(file_content, filename)
+            return await self._process_dataframe(df, filename, telegram_id)
+        except ValueError as e:
+            return {'error': str(e)}
         except Exception as e:
             logger.error(f"Error parsing file {filename} for user {telegram_id}: {e}")
             return {'error': f'Ошибка парсинга: {str(e)}'}
     
-    async def _parse_delimited(self, file_content: bytes, filename: str, telegram_id: str) -> Dict[str, Any]:
-        """Парсит CSV/TSV файлы"""
+    def load_dataframe(self, file_content: Union[bytes, str], filename: str) -> pd.DataFrame:
+        """Читает файл (содержимое или путь) в DataFrame с нормализованными названиями столбцов
+        
+        ValueError - понятная пользователю ошибка формата.
+        """
+        file_extension = filename.lower().split('.')[-1]
+        
+        if file_extension in ['xlsx', 'xls']:
+            # Excel читается по пути напрямую: процессам-читателям не нужно копировать содержимое
+            return self._read_excel(file_content, filename)
+        
+        if file_extension in columnar.COLUMNAR_EXTENSIONS:
+            # Parquet/Feather читаются по блокам, столбцы-списки сохраняются как списки
+            df = columnar.read_frame(file_content, filename)
+            df.columns = [self._normalize_column_name(col) for col in df.columns]
+            return df
+        
+        if isinstance(file_content, str):
+            with open(file_content, 'rb') as f:
+                file_content = f.read()
+        
+        if file_extension in ['csv', 'tsv']:
+            df = self._read_delimited(file_content, filename)
+        elif file_extension in JSON_EXTENSIONS:
+            df = self._read_json(file_content)
+        else:
+            raise ValueError(f'Неподдерживаемый формат: {file_extension}')
+        
+        df.columns = [self._normalize_column_name(col) for col in df.columns]
+        return df
+    
+    def _read_delimited(self, file_content: bytes, filename: str) -> pd.DataFrame:
+        """Читает CSV/TSV файлы"""
         delimiter = ',' if filename.lower().endswith('.csv') else '\t'
         
         for encoding in ['utf-8', 'windows-1251', 'cp1251']:
             try:
-                df = pd.read_csv(io.BytesIO(file_content), delimiter=delimiter, encoding=encoding)
-                break
+                return pd.read_csv(io.BytesIO(file_content), delimiter=delimiter, encoding=encoding)
             except UnicodeDecodeError:
                 continue
-        else:
-            return {'error': 'Не удалось определить кодировку файла'}
-        
-        return await self._process_dataframe(df, filename, telegram_id)
+        raise ValueError('Не удалось определить кодировку файла')
     
-    async def _parse_excel(self, file_content: bytes, filename: str, telegram_id: str) -> Dict[str, Any]:
-        """Парсит Excel файлы"""
+    def _read_excel(self, file_content: Union[bytes, str], filename: str) -> pd.DataFrame:
+        """Читает все листы Excel; столбцы нормализуются по каждому листу до объединения"""
         try:
-            df = pd.read_excel(io.BytesIO(file_content))
-            return await self._process_dataframe(df, filename, telegram_id)
+            sheets = read_workbook(file_content, filename, processes=settings.EXCEL_PROCESSES or None)
         except Exception as e:
-            return {'error': f'Ошибка чтения Excel: {str(e)}'}
+            raise ValueError(f'Ошибка чтения Excel: {str(e)}')
+        
+        for sheet in sheets:
+            sheet.columns = [self._normalize_column_name(col) for col in sheet.columns]
+        if not sheets:
+            return pd.DataFrame()
+        return pd.concat(sheets, ignore_index=True) if len(sheets) > 1 else sheets[0]
     
-    async def _parse_json(self, file_content: bytes, filename: str, telegram_id: str) -> Dict[str, Any]:
-        """Парсит JSON файлы"""
+    def _read_json(self, file_content: bytes) -> pd.DataFrame:
+        """Читает JSON и JSON Lines файлы"""
         try:
-            data = json.loads(file_content.decode('utf-8'))
-            
-            if isinstance(data, list):
-                df = pd.DataFrame(data)
-            elif isinstance(data, dict) and 'experts' in data:
-                df = pd.DataFrame(data['experts'])
-            elif isinstance(data, dict) and 'data' in data:
-                df = pd.DataFrame(data['data'])
-            else:
-                df = pd.DataFrame([data])
-            
-            return await self._process_dataframe(df, filename, telegram_id)
+            return pd.DataFrame(list(iter_json_records(io.BytesIO(file_content))))
+        except ValueError as e:
+            raise ValueError(f'Ошибка парсинга JSON: {str(e)}')
+    
+    def iter_chunks(self, path: str, filename: str, chunk_size: int) -> Iterator[Tuple[pd.DataFrame, float]]:
+        """Блоки нормализованных строк файла и доля уже прочитанного файла
+        
+        JSON, Parquet и Feather читаются потоково, в памяти держится только текущий блок;
+        остальные форматы читаются целиком и режутся на блоки. Индекс блока -
+        абсолютный номер строки в файле.
+        """
+        file_extension = filename.lower().split('.')[-1]
+        
+        if file_extension in columnar.COLUMNAR_EXTENSIONS:
+            for chunk, share in columnar.iter_batches(path, filename, chunk_size):
+                chunk.columns = [self._normalize_column_name(col) for col in chunk.columns]
+                yield chunk, share
+            return
+        
+        if file_extension not in JSON_EXTENSIONS:
+            df = self.load_dataframe(path, filename)
+            for start in range(0, len(df), chunk_size):
+                end = min(start + chunk_size, len(df))
+                yield df.iloc[start:end], end / len(df)
+            return
+        
+        size = os.path.getsize(path) or 1
+        with open(path, 'rb') as f:
+            records = iter_json_records(f)
+            start = 0
+            while True:
+                try:
+                    batch = list(itertools.islice(records, chunk_size))
+                except ValueError as e:
+                    raise ValueError(f'Ошибка парсинга JSON: {str(e)}')
+                if not batch:
+                    return
+                chunk = pd.DataFrame(batch, index=range(start, start + len(batch)))
+                chunk.columns = [self._normalize_column_name(col) for col in chunk.columns]
+                start += len(batch)
+                yield chunk, min(f.tell() / size, 1.0)
+    
+    def prepare_chunk(self, df: pd.DataFrame) -> Tuple[List[dict], List[dict], List[str]]:
+        """Готовит блок строк к сохранению: эксперты, публикации и ошибки
+        
+        Нормализация идет по столбцам (notna-маски, str.strip, str.split по одному
+        регулярному выражению), а не по строкам через iterrows.
+        """
+        if df.columns.duplicated().any():
+            # Несколько исходных столбцов могли сопоставиться одному полю - берем первый
+            df = df.loc[:, ~df.columns.duplicated()]
+        
+        names = self._text_column(df, 'name')
+        valid = (names.notna() & (names != '')).to_numpy()
+        errors = [f"Строка {index+1}: отсутствует имя" for index in df.index[~valid]]
+        if not valid.any():
+            return [], [], errors
+        
+        names = names[valid].tolist()
+        positions = self._text_column(df, 'position')[valid].tolist()
+        companies = self._text_column(df, 'company')[valid].tolist()
+        skills = self._list_column(df, 'skills')[valid].tolist()
+        projects = self._list_column(df, 'projects')[valid].tolist()
+        publication_lists = self._list_column(df, 'publications', keep_dicts=True)[valid].tolist()
+        socials = {
+            field: self._text_column(df, field)[valid].tolist()
+            for field in SOCIAL_FIELDS if field in df.columns
+        }
+        
+        people = []
+        publications = []
+        seen = set()
+        for i, name in enumerate(names):
+            person = {
+                'name': name,
+                'position': positions[i] or '',
+                'company': companies[i] or '',
+                'skills': skills[i] if isinstance(skills[i], list) else [],
+                'projects': projects[i] if isinstance(projects[i], list) else [],
+                'social_links': {field: values[i] for field, values in socials.items() if values[i] is not None}
+            }
+            row_publications = [
+                {
+                    'expert_name': name,
+                    'content': pub.get('title', '') if isinstance(pub, dict) else pub,
+                    'source': pub.get('type', 'unknown') if isinstance(pub, dict) else 'unknown',
+                    'g4f_analysis': {}
+                }
+                for pub in (publication_lists[i] if isinstance(publication_lists[i], list) else [])
+            ]
             
-        except Exception as e:
-            return {'error': f'Ошибка парсинга JSON: {str(e)}'}
+            # Хеш нормализованной строки: по нему база пропускает уже импортированные строки
+            row_hash = self._row_hash(person, row_publications)
+            person['row_hash'] = row_hash
+            people.append(person)
+            if row_hash in seen:
+                # Повтор строки в блоке: эксперта отбросит база, публикации не дублируем
+                continue
+            seen.add(row_hash)
+            for pub in row_publications:
+                pub['row_hash'] = row_hash
+            publications.extend(row_publications)
+        
+        return people, publications, errors
+    
+    @staticmethod
+    def _row_hash(person: dict, publications: List[dict]) -> str:
+        payload = json.dumps(
+            [person, [(pub['content'], pub['source']) for pub in publications]],
+            ensure_ascii=False, sort_keys=True, default=str
+        )
+        return hashlib.blake2b(payload.encode('utf-8'), digest_size=16).hexdigest()
+    
+    @staticmethod
+    def _text_column(df: pd.DataFrame, field: str) -> pd.Series:
+        """Строковый столбец без пробелов по краям; None там, где значения нет"""
+        if field not in df.columns:
+            # pd.Series(None, ...) заполняется NaN, а не None - нужен явный список
+            return pd.Series([None] * len(df), index=df.index, dtype=object)
+        column = df[field]
+        return column.astype(str).str.strip().where(column.notna(), None)
+    
+    @staticmethod
+    def _list_column(df: pd.DataFrame, field: str, keep_dicts: bool = False) -> pd.Series:
+        """Столбец списков: строки режутся по любому из разделителей, списки из JSON чистятся
+        
+        Там, где значения нет или оно не строка и не список, остается NaN.
+        """
+        if field not in df.columns or df[field].dtype != object:
+            return pd.Series(float('nan'), index=df.index, dtype=object)
+        column = df[field]
+        
+        # .str недоступен для столбца только из списков (JSON), поэтому строки выделяем маской
+        text_mask = column.map(type).eq(str)
+        texts = column[text_mask].str.strip()
+        parts = texts.str.split(LIST_SEPARATORS, regex=True)
+        # Пустые элементы дают только пустая строка и подряд идущие или крайние разделители
+        dirty = texts.str.contains(EMPTY_LIST_ITEM, regex=True)
+        if dirty.any():
+            parts[dirty] = parts[dirty].map(lambda items: [item for item in items if item])
+        
+        def clean_list(value):
+            if not isinstance(value, list):
+                return float('nan')
+            items = []
+            for item in value:
+                if keep_dicts and isinstance(item, dict):
+                    items.append(item)
+                elif item is not None:
+                    item = str(item).strip()
+                    if item:
+                        items.append(item)
+            return items
+        
+        other = column[~text_mask & column.notna()].map(clean_list)
+        return pd.concat([parts, other]).reindex(df.index)
+    
+    def import_chunk(self, chunk: pd.DataFrame, telegram_id: str, job_id: int = None,
+                     rows_done: int = None) -> Tuple[int, int, List[str]]:
+        """Сохраняет блок одной транзакцией; возвращает число новых экспертов, публикаций и ошибки"""
+        people, publications, errors = self.prepare_chunk(chunk)
+        experts_added, publications_added, _ = db.add_import_chunk(
+            telegram_id, people, publications, job_id=job_id, rows_done=rows_done, errors=errors
+        )
+        return experts_added, publications_added, errors
     
     async def _process_dataframe(self, df: pd.DataFrame, filename: str, telegram_id: str) -> Dict[str, Any]:
         """Обрабатывает DataFrame с автоматическим определением структуры"""
         try:
-            # Нормализуем названия столбцов
-            df.columns = [self._normalize_column_name(col) for col in df.columns]
-            
             # Анализ структуры данных
             structure_analysis = self._analyze_structure(df)
             
-            # Обрабатываем данные
+            # Обрабатываем данные блоками
             experts_added = 0
             publications_added = 0
             errors = []
             
-            for index, row in df.iterrows():
-                try:
-                    person_data = self._extract_person_data(row)
-                    
-                    if not person_data.get('name'):
-                        errors.append(f"Строка {index+1}: отсутствует имя")
-                        continue
-                    
-                    # Сохраняем в базу для конкретного пользователя
-                    person_id = db.add_person(
-                        telegram_id=telegram_id,
-                        name=person_data['name'],
-                        position=person_data.get('position', ''),
-                        company=person_data.get('company', ''),
-                        skills=person_data.get('skills', []),
-                        projects=person_data.get('projects', []),
-                        social_links=person_data.get('social_links', {})
-                    )
-                    
-                    if person_id:
-                        experts_added += 1
-                        
-                        # Обрабатываем публикации если есть
-                        if 'publications' in person_data and person_data['publications']:
-                            publications = self._parse_publications(person_data['publications'])
-                            for pub in publications:
-                                db.add_publication(
-                                    telegram_id=telegram_id,
-                                    expert_name=person_data['name'],
-                                    content=pub.get('title', ''),
-                                    source=pub.get('type', 'unknown')
-                                )
-                                publications_added += 1
-                    
-                except Exception as e:
-                    errors.append(f"Строка {index+1}: {str(e)}")
+            for start in range(0, len(df), settings.IMPORT_CHUNK_SIZE):
+                end = min(start + settings.IMPORT_CHUNK_SIZE, len(df))
+                chunk_experts, chunk_publications, chunk_errors = self.import_chunk(df.iloc[start:end], telegram_id)
+                experts_added += chunk_experts
+                publications_added += chunk_publications
+                errors.extend(chunk_errors)
             
             # Генерируем анализ данных
-            analysis = await self._generate_analysis(df, experts_added)
+            analysis = await self.generate_analysis(df, experts_added)
             
             return {
                 'experts_added': experts_added,
@@ -196,108 +354,149 @@ class FileParser:
             'data_quality': f"{(len([f for f in required_fields if f in df.columns])/len(required_fields))*100:.1f}%"
         }
     
-    def _extract_person_data(self, row) -> Dict[str, Any]:
-        """Извлекает данные человека из строки"""
-        data = {}
-        
-        for field in ['name', 'position', 'company', 'twitter', 'linkedin', 'github']:
-            if field in row and pd.notna(row[field]):
-                data[field] = str(row[field]).strip()
-        
-        for field in ['skills', 'projects', 'publications']:
-            if field in row and pd.notna(row[field]):
-                data[field] = self._parse_list_field(row[field])
-        
-        # Собираем социальные ссылки
-        social_links = {}
-        for field in ['twitter', 'linkedin', 'github']:
-            if field in data:
-                social_links[field] = data[field]
-                del data[field]
-        
-        if social_links:
-            data['social_links'] = social_links
-        
-        return data
-    
     def _parse_list_field(self, value) -> List[str]:
         """Парсит поля со списками значений"""
         if isinstance(value, list):
-            return [str(item).strip() for item in value]
+            return [str(item).strip() for item in value if str(item).strip()]
         elif isinstance(value, str):
-            separators = [',', ';', '|', '\n']
-            for sep in separators:
-                if sep in value:
-                    return [item.strip() for item in value.split(sep) if item.strip()]
-            return [value.strip()]
+            return [item for item in re.split(LIST_SEPARATORS, value.strip()) if item]
         return []
     
-    def _parse_publications(self, publications_data) -> List[Dict[str, str]]:
-        """Парсит публикации"""
-        publications = []
-        
-        if isinstance(publications_data, list):
-            for pub in publications_data:
-                if isinstance(pub, str):
-                    publications.append({'title': pub, 'type': 'unknown'})
-                elif isinstance(pub, dict):
-                    publications.append(pub)
-        
-        return publications
-    
-    async def _generate_analysis(self, df: pd.DataFrame, experts_added: int) -> Dict[str, Any]:
+    async def generate_analysis(self, df: pd.DataFrame, experts_added: int) -> Dict[str, Any]:
         """Генерирует анализ данных"""
-        analysis = {
-            'stats': {},
-            'insights': [],
-            'top_companies': {},
-            'top_skills': {},
-            'warnings': []
-        }
-        
+        accumulator = AnalysisAccumulator(self)
+        accumulator.update(df)
+        return accumulator.result(experts_added)
+
+class AnalysisAccumulator:
+    """Собирает анализ датасета по блокам строк, не держа весь файл в памяти"""
+    
+    def __init__(self, parser: FileParser):
+        self.parser = parser
+        self.rows = 0
+        self.missing_name = 0
+        self.companies = Counter()
+        self.skills = Counter()
+        self.failed = False
+    
+    def update(self, df: pd.DataFrame):
+        self.rows += len(df)
         try:
-            analysis['stats'] = {
-                'total_experts': experts_added,
-                'total_rows': len(df),
-                'success_rate': f"{(experts_added/len(df))*100:.1f}%" if len(df) > 0 else "0%"
-            }
-            
             if 'company' in df.columns:
-                companies_analysis = df['company'].value_counts()
-                analysis['top_companies'] = companies_analysis.head(10).to_dict()
-                
-                if len(companies_analysis) > 0:
-                    top_company = companies_analysis.index[0]
-                    analysis['insights'].append(f"Наибольшее количество экспертов из {top_company}")
+                self.companies.update(df['company'].dropna())
             
             if 'skills' in df.columns:
-                all_skills = []
                 for skills in df['skills'].dropna():
                     if isinstance(skills, list):
-                        all_skills.extend(skills)
+                        self.skills.update(skills)
                     elif isinstance(skills, str):
-                        all_skills.extend(self._parse_list_field(skills))
-                
-                from collections import Counter
-                skills_count = Counter(all_skills)
-                analysis['top_skills'] = dict(skills_count.most_common(10))
-                
-                if analysis['top_skills']:
-                    top_skill = list(analysis['top_skills'].keys())[0]
-                    analysis['insights'].append(f"Самый популярный навык: {top_skill}")
-            
-            missing_name = df['name'].isna().sum() if 'name' in df.columns else len(df)
-            if missing_name > 0:
-                analysis['warnings'].append(f"Обнаружено {missing_name} записей без имени")
-            
-            if experts_added < len(df):
-                analysis['warnings'].append(f"Обработано {experts_added} из {len(df)} записей")
+                        self.skills.update(self.parser._parse_list_field(skills))
             
+            self.missing_name += int(df['name'].isna().sum()) if 'name' in df.columns else len(df)
         except Exception as e:
             logger.error(f"Error generating analysis: {e}")
+            self.failed = True
+    
+    def result(self, experts_added: int) -> Dict[str, Any]:
+        analysis = {
+            'stats': {
+                'total_experts': experts_added,
+                'total_rows': self.rows,
+                'success_rate': f"{(experts_added/self.rows)*100:.1f}%" if self.rows > 0 else "0%"
+            },
+            'insights': [],
+            'top_companies': dict(self.companies.most_common(10)),
+            'top_skills': dict(self.skills.most_common(10)),
+            'warnings': []
+        }
+        
+        if self.failed:
             analysis['warnings'].append("Ошибка при анализе данных")
+            return analysis
+        
+        if analysis['top_companies']:
+            top_company = next(iter(analysis['top_companies']))
+            analysis['insights'].append(f"Наибольшее количество экспертов из {top_company}")
+        
+        if analysis['top_skills']:
+            top_skill = next(iter(analysis['top_skills']))
+            analysis['insights'].append(f"Самый популярный навык: {top_skill}")
+        
+        if self.missing_name > 0:
+            analysis['warnings'].append(f"Обнаружено {self.missing_name} записей без имени")
+        
+        if experts_added < self.rows:
+            analysis['warnings'].append(f"Обработано {experts_added} из {self.rows} записей")
         
         return analysis
 
+def benchmark(rows: int = 100000, chunk_size: int = 500) -> Dict[str, Any]:
+    """Скорость подготовки строк к сохранению (строк/с) на синтетическом CSV: построчный эталон и prepare_chunk"""
+    lines = ['name,position,company,skills,projects,publications,github']
+    for number in range(rows):
+        name = f'Expert {number}' if number % 50 else ''
+        lines.append(f'{name},ML Engineer,Company {number % 500},"Python, PyTorch; LLM",'
+                     f'Project A|Project B,,gh/expert{number}')
+    df = file_parser.load_dataframe('\n'.join(lines).encode(), 'benchmark.csv')
+    
+    def parse_list(value) -> List[str]:
+        if isinstance(value, list):
+            return [str(item).strip() for item in value]
+        # Те же правила, что у prepare_chunk (любой из разделителей), чтобы результаты можно было сравнить
+        return [item for item in re.split(LIST_SEPARATORS, value.strip()) if item]
+    
+    def iterrows_chunk(chunk: pd.DataFrame) -> Tuple[List[dict], List[dict], List[str]]:
+        """Прежняя реализация prepare_chunk (iterrows и разбор каждой ячейки) - эталон для сравнения"""
+        people, publications, errors = [], [], []
+        for index, row in chunk.iterrows():
+            data = {}
+            for field in ['name', 'position', 'company'] + SOCIAL_FIELDS:
+                if field in row and pd.notna(row[field]):
+                    data[field] = str(row[field]).strip()
+            for field in ['skills', 'projects', 'publications']:
+                if field in row and (isinstance(row[field], list) or pd.notna(row[field])):
+                    data[field] = parse_list(row[field])
+            if not data.get('name'):
+                errors.append(f"Строка {index+1}: отсутствует имя")
+                continue
+            people.append({
+                'name': data['name'],
+                'position': data.get('position', ''),
+                'company': data.get('company', ''),
+                'skills': data.get('skills', []),
+                'projects': data.get('projects', []),
+                'social_links': {field: data[field] for field in SOCIAL_FIELDS if field in data}
+            })
+            for title in data.get('publications', []):
+                publications.append({'expert_name': data['name'], 'content': title,
+                                     'source': 'unknown', 'g4f_analysis': {}})
+        return people, publications, errors
+    
+    result: Dict[str, Any] = {'rows': rows}
+    for label, prepare in (('iterrows', iterrows_chunk), ('vectorized', file_parser.prepare_chunk)):
+        started = time.perf_counter()
+        people = 0
+        for start in range(0, len(df), chunk_size):
+            people += len(prepare(df.iloc[start:start + chunk_size])[0])
+        elapsed = time.perf_counter() - started
+        result[label] = {'people': people, 'elapsed_s': round(elapsed, 3), 'rows_per_s': round(rows / elapsed)}
+    
+    # Ускорение засчитывается только при совпадающем результате (хеш строки в эталоне не считается),
+    # в том числе для файла без части столбцов
+    sample = df.iloc[:chunk_size * 4]
+    for frame in (sample, sample.drop(columns=['position', 'company', 'github'])):
+        for start in range(0, len(frame), chunk_size):
+            chunk = frame.iloc[start:start + chunk_size]
+            expected, actual = iterrows_chunk(chunk), file_parser.prepare_chunk(chunk)
+            people = [{key: value for key, value in person.items() if key != 'row_hash'} for person in actual[0]]
+            publications = [{key: value for key, value in pub.items() if key != 'row_hash'} for pub in actual[1]]
+            assert (people, publications, actual[2]) == expected, \
+                f'prepare_chunk differs from iterrows in block {start} (columns: {", ".join(frame.columns)})'
+    result['speedup'] = round(result['vectorized']['rows_per_s'] / result['iterrows']['rows_per_s'], 1)
+    return result
+
 # Создаем экземпляр парсера
-file_parser = FileParser()
\ No newline at end of file
+file_parser = FileParser()
+
+if __name__ == '__main__':
+    print(benchmark())
\ No newline at end of file
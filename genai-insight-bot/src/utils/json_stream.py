@@ -0,0 +1,112 @@
+import codecs
+import json
+from typing import Any, BinaryIO, Iterator, Sequence
+
+_WHITESPACE = ' \t\n\r'
+# Символы, которыми может продолжаться число: '1.' на границе буфера - еще не конец числа
+_NUMBER_TAIL = '0123456789.eE+-'
+
+class _StreamReader:
+    """Буфер над бинарным потоком для пошагового разбора JSON без загрузки файла целиком"""
+
+    def __init__(self, stream: BinaryIO, read_size: int = 1 << 16):
+        self.stream = stream
+        self.read_size = read_size
+        # utf-8-sig убирает BOM, который добавляют выгрузки из Excel и Windows
+        self.decoder = codecs.getincrementaldecoder('utf-8-sig')()
+        self.json = json.JSONDecoder()
+        self.buffer = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size: int = None) -> bool:
+        if self.eof:
+            return False
+        chunk = self.stream.read(size or self.read_size)
+        # Прочитанное отбрасываем: в памяти остается только текущий элемент
+        self.buffer = self.buffer[self.pos:] + self.decoder.decode(chunk, final=not chunk)
+        self.pos = 0
+        self.eof = not chunk
+        return True
+
+    def peek(self) -> str:
+        """Следующий значимый символ ('' в конце потока)"""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                return ''
+
+    def expect(self, char: str):
+        if self.peek() != char:
+            raise ValueError(f"Ожидался символ '{char}' в позиции {self.stream.tell()}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Разбирает одно JSON-значение; дочитывает поток, пока значение не поместится в буфер"""
+        self.peek()
+        size = self.read_size
+        while True:
+            try:
+                value, end = self.json.raw_decode(self.buffer, self.pos)
+                # Число на границе буфера может продолжаться в следующем блоке
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in _NUMBER_TAIL):
+                    self.pos = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            # Размер чтения растет, чтобы крупный элемент не разбирался квадратично
+            self._fill(size)
+            size *= 2
+
+    def array_items(self) -> Iterator[Any]:
+        self.expect('[')
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.value()
+            char = self.peek()
+            self.pos += 1
+            if char == ']':
+                return
+            if char != ',':
+                raise ValueError(f"Ожидалась ',' или ']' в позиции {self.stream.tell()}")
+
+def iter_json_records(stream: BinaryIO, keys: Sequence[str] = ('experts', 'data')) -> Iterator[Any]:
+    """Потоково перебирает записи JSON: элементы массива верхнего уровня или массива по ключу
+
+    Поддерживаются массив, объект с массивом под одним из keys, одиночный объект-запись
+    и последовательность объектов (NDJSON / JSON Lines, в том числе в файле .json).
+    """
+    reader = _StreamReader(stream)
+    char = reader.peek()
+
+    if char == '[':
+        yield from reader.array_items()
+    elif char == '{':
+        reader.pos += 1
+        fields = {}
+        found = False
+        while reader.peek() != '}':
+            if fields or found:
+                reader.expect(',')
+            key = reader.value()
+            reader.expect(':')
+            if key in keys and not found and reader.peek() == '[':
+                found = True
+                yield from reader.array_items()
+            else:
+                fields[key] = reader.value()
+        reader.pos += 1
+        if not found:
+            yield fields
+    elif char:
+        raise ValueError('Файл не похож на JSON: ожидался массив или объект')
+
+    # Остальные значения верхнего уровня - записи JSON Lines
+    while reader.peek():
+        yield reader.value()
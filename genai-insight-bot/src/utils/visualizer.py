@@ -4,9 +4,14 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 from typing import Dict, List, Any
+from monitoring.metrics import registry, timed
+from monitoring.tracing import trace_methods
 
 logger = logging.getLogger(__name__)
 
+RENDER_SECONDS = registry.histogram('chart_render_duration_seconds', 'Время построения графика', ['chart'])
+
+@trace_methods('render')
 class GraphVisualizer:
     def __init__(self):
         self.colors = {
@@ -16,42 +21,36 @@ class GraphVisualizer:
             'background': '#f8f9fa'
         }
     
+    @timed(RENDER_SECONDS, chart='people_comparison')
     def create_people_comparison_chart(self, person_x_data: Dict, person_y_data: Dict, scores: Dict) -> str:
         """Создает сравнительную диаграмму двух экспертов"""
+        axes = ['skills_score', 'experience_score', 'projects_score', 'publications_score', 'influence_score']
+        return self.create_multi_comparison_chart(
+            [person_x_data, person_y_data],
+            [
+                {axis: scores.get(f'{axis}_x', 0) for axis in axes},
+                {axis: scores.get(f'{axis}_y', 0) for axis in axes}
+            ]
+        )
+    
+    @timed(RENDER_SECONDS, chart='multi_comparison')
+    def create_multi_comparison_chart(self, people_data: List[Dict], people_scores: List[Dict]) -> str:
+        """Создает сравнительную диаграмму произвольного числа экспертов"""
         try:
             categories = ['Навыки', 'Опыт', 'Проекты', 'Публикации', 'Влияние']
-            person_x_scores = [
-                scores.get('skills_score_x', 0),
-                scores.get('experience_score_x', 0), 
-                scores.get('projects_score_x', 0),
-                scores.get('publications_score_x', 0),
-                scores.get('influence_score_x', 0)
-            ]
-            person_y_scores = [
-                scores.get('skills_score_y', 0),
-                scores.get('experience_score_y', 0),
-                scores.get('projects_score_y', 0), 
-                scores.get('publications_score_y', 0),
-                scores.get('influence_score_y', 0)
-            ]
+            axes = ['skills_score', 'experience_score', 'projects_score', 'publications_score', 'influence_score']
+            palette = [self.colors['primary'], self.colors['secondary'], self.colors['accent']] + px.colors.qualitative.Plotly
 
             fig = go.Figure()
 
-            fig.add_trace(go.Scatterpolar(
-                r=person_x_scores,
-                theta=categories,
-                fill='toself',
-                name=person_x_data.get('name', 'Эксперт X'),
-                line_color=self.colors['primary']
-            ))
-
-            fig.add_trace(go.Scatterpolar(
-                r=person_y_scores,
-                theta=categories,
-                fill='toself', 
-                name=person_y_data.get('name', 'Эксперт Y'),
-                line_color=self.colors['secondary']
-            ))
+            for i, (person, scores) in enumerate(zip(people_data, people_scores)):
+                fig.add_trace(go.Scatterpolar(
+                    r=[scores.get(axis, 0) for axis in axes],
+                    theta=categories,
+                    fill='toself',
+                    name=person.get('name', f'Эксперт {i + 1}'),
+                    line_color=palette[i % len(palette)]
+                ))
 
             fig.update_layout(
                 polar=dict(
@@ -60,7 +59,7 @@ class GraphVisualizer:
                         range=[0, 10]
                     )),
                 showlegend=True,
-                title=f"Сравнение: {person_x_data.get('name', 'X')} vs {person_y_data.get('name', 'Y')}",
+                title=f"Сравнение: {' vs '.join(p.get('name', '?') for p in people_data)}",
                 template="plotly_white"
             )
 
@@ -70,12 +69,18 @@ class GraphVisualizer:
             logger.error(f"Error creating comparison chart: {e}")
             return "<div>Ошибка при создании диаграммы сравнения</div>"
     
+    @timed(RENDER_SECONDS, chart='network')
     def create_network_graph(self, people_data: List[Dict], connections: List[tuple]) -> str:
         """Создает граф связей между экспертами"""
         try:
             if not people_data:
                 return "<div>Нет данных для построения графа</div>"
 
+            # Метрики сети (PageRank и сообщества) приходят из analysis.graph, если посчитаны
+            use_graph_metrics = all('pagerank' in person for person in people_data)
+            max_pagerank = max((person['pagerank'] for person in people_data), default=0) if use_graph_metrics else 0
+            max_pagerank = max_pagerank or 1.0
+
             # Создаем узлы
             node_x = []
             node_y = []
@@ -103,9 +108,15 @@ class GraphVisualizer:
                     f"Навыки: {skills_text}"
                 )
                 
-                # Размер узла зависит от количества навыков
-                node_size.append(20 + len(person.get('skills', [])) * 3)
-                node_color.append(len(person.get('skills', [])))  # Цвет по количеству навыков
+                if use_graph_metrics:
+                    # Размер узла - PageRank, цвет - сообщество
+                    node_size.append(15 + 45 * person['pagerank'] / max_pagerank)
+                    node_color.append(person.get('community', 0))
+                    node_text[-1] += f"<br>PageRank: {person['pagerank']:.3f}<br>Сообщество: {person.get('community', 0) + 1}"
+                else:
+                    # Размер узла зависит от количества навыков
+                    node_size.append(20 + len(person.get('skills', [])) * 3)
+                    node_color.append(len(person.get('skills', [])))  # Цвет по количеству навыков
                 node_names.append(person.get('name', 'Unknown'))
 
             # Создаем ребра
@@ -156,10 +167,10 @@ class GraphVisualizer:
                 marker=dict(
                     size=node_size,
                     color=node_color,
-                    colorscale='Viridis',
+                    colorscale='Turbo' if use_graph_metrics else 'Viridis',
                     line=dict(width=3, color='white'),
                     showscale=True,
-                    colorbar=dict(title="Кол-во навыков")
+                    colorbar=dict(title="Сообщество" if use_graph_metrics else "Кол-во навыков")
                 ),
                 name='Эксперты'
             ))
@@ -170,7 +181,8 @@ class GraphVisualizer:
                 hovermode='closest',
                 margin=dict(b=20, l=5, r=5, t=40),
                 annotations=[dict(
-                    text="💡 Размер узла = количество навыков<br>Цвет = интенсивность навыков",
+                    text=("💡 Размер узла = влияние (PageRank)<br>Цвет = сообщество" if use_graph_metrics
+                          else "💡 Размер узла = количество навыков<br>Цвет = интенсивность навыков"),
                     showarrow=False,
                     xref="paper", yref="paper",
                     x=0.02, y=0.98,
@@ -190,6 +202,7 @@ class GraphVisualizer:
             logger.error(f"Error creating network graph: {e}")
             return f"<div>Ошибка при создании графа связей: {str(e)}</div>"
     
+    @timed(RENDER_SECONDS, chart='recommendations')
     def create_recommendations_chart(self, recommendations: List[Dict]) -> str:
         """Создает диаграмму рекомендаций экспертов"""
         try:
@@ -223,6 +236,7 @@ class GraphVisualizer:
             logger.error(f"Error creating recommendations chart: {e}")
             return "<div>Ошибка при создании диаграммы рекомендаций</div>"
 
+    @timed(RENDER_SECONDS, chart='skills_heatmap')
     def create_skills_heatmap(self, people_data: List[Dict]) -> str:
         """Создает тепловую карту навыков экспертов"""
         try:
@@ -267,6 +281,7 @@ class GraphVisualizer:
             logger.error(f"Error creating skills heatmap: {e}")
             return "<div>Ошибка при создании тепловой карты</div>"
 
+    @timed(RENDER_SECONDS, chart='company_distribution')
     def create_company_distribution(self, people_data: List[Dict]) -> str:
         """Создает диаграмму распределения экспертов по компаниям"""
         try: